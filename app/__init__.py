@@ -1,8 +1,12 @@
 from flask import Flask
 from .config import Config
 from .extensions import db, login_manager, migrate
-from flask import redirect, url_for, request
+from .cache import fragment_cache
+from .live import live_hub
+from .database import engine_options, replica_binds, install_engine_events, mark_write_request
+from flask import redirect, url_for, request, jsonify
 from flask_login import current_user
+from sqlalchemy.orm import configure_mappers, joinedload
 from datetime import datetime
 
 
@@ -10,16 +14,37 @@ from datetime import datetime
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
+    app.config.setdefault("SQLALCHEMY_BINDS", replica_binds(app.config))
 
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_engine_events(engine, app.config)
+        live_hub.init_app(app, db.engine)
+    mark_write_request(app)
+    fragment_cache.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
     from .models import User  # importante para el user_loader
 
+    # User.business es un backref: existe recién al configurar los mappers. Se
+    # hace aquí y no en la primera consulta, donde dos requests concurrentes
+    # pueden llegar a load_user antes de que termine
+    configure_mappers()
+
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        # el negocio viene en el mismo SELECT (enforce_billing, navbar)
+        return db.session.get(User, int(user_id), options=[joinedload(User.business)])
+
+    from .api.tokens import user_from_request
+
+    @login_manager.request_loader
+    def load_user_from_request(req):
+        # API: Authorization: Bearer <token>
+        return user_from_request(req)
 
     # Blueprints
     from .auth import auth_bp
@@ -38,6 +63,8 @@ def create_app():
     app.register_blueprint(admin_bp)
     from .inventory import inventory_bp
     app.register_blueprint(inventory_bp)
+    from .api import api_bp
+    app.register_blueprint(api_bp)
 
 
     @app.before_request
@@ -50,15 +77,13 @@ def create_app():
         if getattr(current_user, "is_admin", False):
             return
             
-        biz = current_user.business
-
-        # Si es Pro, no bloqueamos
-        if biz.is_pro:
+        # Pro o trial vigente (el negocio ya viene cargado con el usuario)
+        if current_user.business.has_access():
             return
 
-        # Si aún está en trial, no bloqueamos
-        if biz.trial_ends_at and biz.trial_ends_at > datetime.utcnow():
-            return
+        # API: sin redirecciones, error JSON
+        if request.blueprint == "api":
+            return jsonify(error="Plan vencido. Renueva tu suscripción."), 402
 
         # Rutas permitidas aun si expiró
         allowed_endpoints = {
@@ -85,10 +110,23 @@ def create_app():
         from datetime import datetime
         return {"now": datetime.utcnow()}
 
+    from .idempotency import idempotency_cli, new_idempotency_key
+    app.cli.add_command(idempotency_cli)
+
+    from .partitions import partitions_cli
+    app.cli.add_command(partitions_cli)
+
+    from .archive import archive_cli
+    app.cli.add_command(archive_cli)
+
+    @app.context_processor
+    def inject_idempotency_key():
+        return {"idempotency_key": new_idempotency_key}
+
 
     if app.config.get("ENV") == "development":
         with app.app_context():
-            db.create_all()
+            db.create_all(bind_key=None)  # nunca DDL sobre la réplica
 
     return app
 
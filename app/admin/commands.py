@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+
+from . import admin_bp
+from ..extensions import db
+from ..metrics import rebuild_tenant_stats, rollup_day
+
+
+def _parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+@admin_bp.cli.command("rollup-metrics")
+@click.option("--day", "day_str", default=None, help="Día YYYY-MM-DD (por defecto: ayer, UTC).")
+@click.option("--days", type=int, default=1, show_default=True, help="Cuántos días hacia atrás desde --day.")
+def rollup_metrics_command(day_str, days):
+    """Calcula las métricas diarias de la plataforma (correr cada noche)."""
+    last = _parse_day(day_str) if day_str else datetime.utcnow().date() - timedelta(days=1)
+    cfg = current_app.config
+
+    for offset in range(days - 1, -1, -1):
+        day = last - timedelta(days=offset)
+        metric = rollup_day(
+            day,
+            active_days=cfg["METRICS_ACTIVE_DAYS"],
+            trial_days=cfg["METRICS_TRIAL_DAYS"],
+            price=cfg["PRO_MONTHLY_PRICE"]
+        )
+        db.session.commit()
+        click.echo(f"{day}: negocios={metric.tenants_total} pro={metric.tenants_pro} "
+                   f"activos={metric.tenants_active} ventas={metric.sales_count} total={metric.sales_total}")
+
+
+@admin_bp.cli.command("rebuild-tenant-stats")
+@click.option("--since", "since_str", default=None, help="Desde YYYY-MM-DD (por defecto: todo el historial).")
+def rebuild_tenant_stats_command(since_str):
+    """Recalcula los contadores diarios por negocio desde las ventas."""
+    rows = rebuild_tenant_stats(_parse_day(since_str) if since_str else None)
+    db.session.commit()
+    click.echo(f"Filas de contadores: {rows}")
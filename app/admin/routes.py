@@ -1,10 +1,18 @@
 from datetime import datetime, timedelta
-from flask import render_template, redirect, url_for, flash, abort, request
+from flask import render_template, redirect, url_for, flash, abort, request, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import and_, func, literal, select, union_all
+from sqlalchemy.orm import joinedload
 
 from . import admin_bp
 from ..extensions import db
-from ..models import Business, User, PaymentProof
+from ..database import use_replica, write_transaction
+from ..cache import fragment_cache
+from ..metrics import sales_today
+from ..models import Business, User, PaymentProof, PlatformDailyMetric, Product, Sale
+
+SALES_WINDOW_DAYS = 30  # "ventas recientes" en el directorio de negocios
+METRICS_HISTORY_DAYS = 14
 
 
 def admin_required():
@@ -12,41 +20,115 @@ def admin_required():
         abort(403)
 
 
+# ===== directorios paginados =====
+
+def _page_args():
+    """(q, before, tamaño): `before` es el último id de la página anterior (keyset)."""
+    q = (request.args.get("q") or "").strip()
+    before = request.args.get("before", type=int)
+    return q, before, current_app.config["ADMIN_PAGE_SIZE"]
+
+
+def _keyset_page(query, id_column, before, size):
+    # por id descendente; se pide una fila de más para saber si hay siguiente
+    if before:
+        query = query.filter(id_column < before)
+    rows = query.order_by(id_column.desc()).limit(size + 1).all()
+    next_before = rows[size - 1].id if len(rows) > size else None
+    return rows[:size], next_before
+
+
+def _prefix(column, prefix: str):
+    # rango en vez de LIKE 'q%': en SQLite LIKE no usa el índice (no distingue mayúsculas)
+    return and_(column >= prefix, column < prefix + "\uffff")
+
+
+def _business_search(q: str):
+    needle = q.lower()
+    if db.engine.dialect.name == "postgresql":
+        # substring con ix_business_name_trgm (pg_trgm)
+        return func.lower(Business.name).contains(needle, autoescape=True)
+    # resto: prefijo sobre ix_business_name_lower
+    return _prefix(func.lower(Business.name), needle)
+
+
+def _business_counts(ids):
+    """{business_id: {"users": n, "products": n, "sales": n}} de una página, en una consulta."""
+    if not ids:
+        return {}
+
+    since = datetime.utcnow() - timedelta(days=SALES_WINDOW_DAYS)
+    rows = union_all(
+        select(User.business_id.label("business_id"), literal("users").label("kind"))
+        .where(User.business_id.in_(ids)),
+        select(Product.business_id, literal("products"))
+        .where(Product.business_id.in_(ids), Product.is_active.is_(True)),
+        select(Sale.business_id, literal("sales"))
+        .where(Sale.business_id.in_(ids), Sale.created_at >= since),
+    ).subquery()
+
+    counts = {biz_id: {"users": 0, "products": 0, "sales": 0} for biz_id in ids}
+    grouped = db.session.execute(
+        select(rows.c.business_id, rows.c.kind, func.count())
+        .group_by(rows.c.business_id, rows.c.kind)
+    )
+    for biz_id, kind, n in grouped:
+        counts[biz_id][kind] = n
+    return counts
+
+
 @admin_bp.get("/")
 @login_required
+@use_replica
 def dashboard():
     admin_required()
 
-    # métricas simples
-    total_business = Business.query.count()
-    pro_business = Business.query.filter_by(is_pro=True).count()
+    # filas precalculadas por `flask admin rollup-metrics`; hoy sale de los contadores
+    history = PlatformDailyMetric.query.order_by(PlatformDailyMetric.day.desc()).limit(METRICS_HISTORY_DAYS).all()
+    today_count, today_total = sales_today()
     pending_payments = PaymentProof.query.filter_by(status="pending").count()
 
     return render_template(
         "admin/dashboard.html",
-        total_business=total_business,
-        pro_business=pro_business,
-        pending_payments=pending_payments
+        latest=history[0] if history else None,
+        history=history,
+        today_count=today_count,
+        today_total=today_total,
+        pending_payments=pending_payments,
+        active_days=current_app.config["METRICS_ACTIVE_DAYS"],
+        trial_days=current_app.config["METRICS_TRIAL_DAYS"],
+        cache_stats=fragment_cache.stats()
     )
 
 
 @admin_bp.get("/businesses")
 @login_required
+@use_replica
 def businesses():
     admin_required()
 
-    q = (request.args.get("q") or "").strip()
+    q, before, size = _page_args()
     query = Business.query
 
     if q:
-        query = query.filter(Business.name.ilike(f"%{q}%"))
+        query = query.filter(_business_search(q))
 
-    businesses = query.order_by(Business.id.desc()).all()
-    return render_template("admin/businesses.html", businesses=businesses, q=q, now=datetime.utcnow())
+    businesses, next_before = _keyset_page(query, Business.id, before, size)
+    return render_template(
+        "admin/businesses.html",
+        businesses=businesses,
+        counts=_business_counts([b.id for b in businesses]),
+        sales_window_days=SALES_WINDOW_DAYS,
+        q=q,
+        before=before,
+        next_before=next_before,
+        now=datetime.utcnow()
+    )
 
 
 @admin_bp.post("/businesses/<int:biz_id>/activate-pro")
 @login_required
+@write_transaction
 def activate_pro(biz_id):
     admin_required()
 
@@ -62,6 +144,7 @@ def activate_pro(biz_id):
 
 @admin_bp.post("/businesses/<int:biz_id>/deactivate-pro")
 @login_required
+@write_transaction
 def deactivate_pro(biz_id):
     admin_required()
 
@@ -75,6 +158,7 @@ def deactivate_pro(biz_id):
 
 @admin_bp.post("/businesses/<int:biz_id>/extend-trial")
 @login_required
+@write_transaction
 def extend_trial(biz_id):
     admin_required()
 
@@ -90,6 +174,7 @@ def extend_trial(biz_id):
 
 @admin_bp.get("/payments")
 @login_required
+@use_replica
 def payments():
     admin_required()
 
@@ -99,6 +184,7 @@ def payments():
 
 @admin_bp.post("/payments/<int:proof_id>/approve")
 @login_required
+@write_transaction
 def approve_payment(proof_id):
     admin_required()
 
@@ -117,6 +203,7 @@ def approve_payment(proof_id):
 
 @admin_bp.post("/payments/<int:proof_id>/reject")
 @login_required
+@write_transaction
 def reject_payment(proof_id):
     admin_required()
 
@@ -134,8 +221,17 @@ def reject_payment(proof_id):
 
 @admin_bp.get("/users")
 @login_required
+@use_replica
 def users():
     admin_required()
 
-    users = User.query.order_by(User.id.desc()).limit(200).all()
-    return render_template("admin/users.html", users=users)
+    q, before, size = _page_args()
+    # el negocio de cada fila en el mismo SELECT (antes, una consulta por usuario)
+    query = User.query.options(joinedload(User.business))
+
+    if q:
+        # emails se guardan en minúsculas: prefijo sobre el índice único
+        query = query.filter(_prefix(User.email, q.lower()))
+
+    users, next_before = _keyset_page(query, User.id, before, size)
+    return render_template("admin/users.html", users=users, q=q, before=before, next_before=next_before)
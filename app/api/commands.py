@@ -0,0 +1,41 @@
+import click
+
+from . import api_bp
+from ..extensions import db
+from ..models import User, ApiToken
+from .tokens import create_token, revoke_token
+
+
+@api_bp.cli.command("create-token")
+@click.argument("email")
+@click.option("--name", default=None, help="Nombre para identificar el token (ej: tienda online).")
+def create_token_command(email, name):
+    """Crea un token de API para el usuario EMAIL."""
+    user = User.query.filter_by(email=email.strip().lower()).first()
+    if not user:
+        raise click.ClickException("Usuario no encontrado.")
+
+    click.echo(create_token(user, name=name))
+    click.echo("Guarda este token: no se vuelve a mostrar.", err=True)
+
+
+@api_bp.cli.command("list-tokens")
+@click.argument("email")
+def list_tokens_command(email):
+    """Lista los tokens del usuario EMAIL."""
+    tokens = db.session.query(ApiToken).join(User, User.id == ApiToken.user_id).filter(
+        User.email == email.strip().lower()
+    ).order_by(ApiToken.id).all()
+
+    for t in tokens:
+        state = f"revocado {t.revoked_at:%Y-%m-%d}" if t.revoked_at else "activo"
+        click.echo(f"#{t.id} {t.name or '-'} creado {t.created_at:%Y-%m-%d} {state}")
+
+
+@api_bp.cli.command("revoke-token")
+@click.argument("token_id", type=int)
+def revoke_token_command(token_id):
+    """Revoca el token TOKEN_ID."""
+    if not revoke_token(token_id):
+        raise click.ClickException("Token no encontrado o ya revocado.")
+    click.echo("Token revocado.")
@@ -0,0 +1,436 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import wraps
+import base64
+import json
+
+from flask import Response, abort, request
+from flask_login import current_user
+
+from . import api_bp
+from ..extensions import db
+from ..database import use_replica, write_transaction
+from ..idempotency import idempotent
+from ..archive import sale_items_for, sales_for
+from ..models import Product, Sale, SaleArchive, SaleItem, SaleItemArchive, InventoryMovement
+from ..inventory.kardex import MovementError, register_movement, transfer_stock
+from ..reports.queries import sales_summary, top_products, low_stock_products
+from ..sales.receipts import send_receipt
+from ..sales.services import TicketError, register_ticket
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class ApiError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+@api_bp.errorhandler(ApiError)
+def _api_error(e):
+    return _json({"error": str(e)}, e.status)
+
+
+@api_bp.errorhandler(404)
+def _not_found(e):
+    return _json({"error": "No encontrado"}, 404)
+
+
+# ===== helpers =====
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"No serializable: {type(value).__name__}")
+
+
+def _json(payload, status: int = 200) -> Response:
+    # JSON compacto (sin espacios) para clientes máquina
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=_encode)
+    return Response(body, status=status, mimetype="application/json")
+
+
+def _conditional(payload) -> Response:
+    # ETag del cuerpo: si el cliente ya lo tiene, 304 sin cuerpo
+    response = _json(payload)
+    response.add_etag()
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
+def token_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return _json({"error": "Token inválido o ausente."}, 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _limit() -> int:
+    limit = request.args.get("limit", default=DEFAULT_LIMIT, type=int)
+    return max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+
+def _encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+def _decode_cursor():
+    cursor = request.args.get("cursor")
+    if not cursor:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError("Cursor inválido")
+
+
+def _fields(serializers: dict, default) -> list:
+    # ?fields=id,name,price  (selección parcial de campos)
+    raw = request.args.get("fields")
+    if not raw:
+        return list(default)
+
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in serializers]
+    if unknown:
+        raise ApiError(f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(serializers)}")
+    return fields
+
+
+def _serialize(obj, serializers: dict, fields: list) -> dict:
+    return {f: serializers[f](obj) for f in fields}
+
+
+def _page(query, id_column, serializers: dict, fields: list, newest_first: bool = True):
+    # paginación por cursor (keyset sobre id): sin OFFSET, costo constante por página
+    limit = _limit()
+    cursor = _decode_cursor()
+
+    if cursor is not None:
+        query = query.filter(id_column < cursor if newest_first else id_column > cursor)
+
+    order = id_column.desc() if newest_first else id_column.asc()
+    rows = query.order_by(order).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # serializers puede depender de la página (p. ej. cargar relaciones en lote)
+    if callable(serializers):
+        serializers = serializers(rows)
+
+    return {
+        "data": [_serialize(r, serializers, fields) for r in rows],
+        "next_cursor": _encode_cursor(rows[-1].id) if has_more else None,
+    }
+
+
+def _parse_datetime(name: str):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f"Fecha inválida en '{name}' (usa ISO 8601: YYYY-MM-DD o YYYY-MM-DDTHH:MM:SS)")
+
+
+def _json_body() -> dict:
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ApiError("Se espera un objeto JSON")
+    return payload
+
+
+# ===== productos =====
+
+PRODUCT_FIELDS = {
+    "id": lambda p: p.id,
+    "name": lambda p: p.name,
+    "price": lambda p: p.price,
+    "stock": lambda p: int(p.stock or 0),
+    "is_active": lambda p: bool(p.is_active),
+}
+
+
+@api_bp.get("/products")
+@token_required
+@use_replica
+def list_products():
+    fields = _fields(PRODUCT_FIELDS, PRODUCT_FIELDS)
+
+    q = Product.query.filter(Product.business_id == current_user.business_id)
+
+    active = request.args.get("active")
+    if active in ("0", "1"):
+        q = q.filter(Product.is_active == (active == "1"))
+
+    return _conditional(_page(q, Product.id, PRODUCT_FIELDS, fields, newest_first=False))
+
+
+@api_bp.get("/products/<int:product_id>")
+@token_required
+@use_replica
+def get_product(product_id):
+    fields = _fields(PRODUCT_FIELDS, PRODUCT_FIELDS)
+    p = Product.query.filter_by(id=product_id, business_id=current_user.business_id).first_or_404()
+    return _conditional(_serialize(p, PRODUCT_FIELDS, fields))
+
+
+# ===== ventas =====
+
+def _item_dicts(items):
+    return [{
+        "product_id": it.product_id,
+        "product_name": it.product_name,
+        "unit_price": it.unit_price,
+        "quantity": it.quantity,
+        "total": it.total,
+    } for it in items]
+
+
+SALE_FIELDS = {
+    "id": lambda s: s.id,
+    "created_at": lambda s: s.created_at,
+    "total": lambda s: s.total,
+    "client_ref": lambda s: s.client_ref,
+    "items_count": lambda s: s.items_count,
+    "units_count": lambda s: s.units_count,
+    "items": None,  # ver _sale_serializers
+}
+
+
+def _sale_serializers(items, sale_ids) -> dict:
+    """SALE_FIELDS con los ítems de `sale_ids` cargados en una consulta
+    (`items` puede ser SaleItem o caliente ∪ archivo)."""
+    by_sale = {}
+    if sale_ids:
+        for it in db.session.query(items).filter(items.sale_id.in_(sale_ids)).order_by(items.id):
+            by_sale.setdefault(it.sale_id, []).append(it)
+    return dict(SALE_FIELDS, items=lambda s: _item_dicts(by_sale.get(s.id, [])))
+
+
+@api_bp.get("/sales")
+@token_required
+@use_replica
+def list_sales():
+    fields = _fields(SALE_FIELDS, SALE_FIELDS)
+
+    since = _parse_datetime("since")
+    until = _parse_datetime("until")
+
+    # sin `since` (o si cae en un mes archivado) se lee también el archivo
+    sales = sales_for(since)
+    q = db.session.query(sales).filter(sales.business_id == current_user.business_id)
+    if since:
+        q = q.filter(sales.created_at >= since)
+    if until:
+        q = q.filter(sales.created_at <= until)
+
+    # ítems en una consulta por página, solo si se piden
+    def serializers(rows):
+        if "items" not in fields:
+            return SALE_FIELDS
+        return _sale_serializers(sale_items_for(since), [r.id for r in rows])
+
+    return _conditional(_page(q, sales.id, serializers, fields))
+
+
+@api_bp.get("/sales/<int:sale_id>")
+@token_required
+@use_replica
+def get_sale(sale_id):
+    fields = _fields(SALE_FIELDS, SALE_FIELDS)
+
+    # la venta puede estar en un mes ya archivado
+    for sale_model, item_model in ((Sale, SaleItem), (SaleArchive, SaleItemArchive)):
+        s = sale_model.query.filter_by(id=sale_id, business_id=current_user.business_id).first()
+        if s is not None:
+            serializers = _sale_serializers(item_model, [s.id]) if "items" in fields else SALE_FIELDS
+            return _conditional(_serialize(s, serializers, fields))
+    abort(404)
+
+
+@api_bp.get("/sales/<int:sale_id>/receipt.<fmt>")
+@token_required
+def get_sale_receipt(sale_id, fmt):
+    # fmt: escpos (bytes para la impresora térmica) o pdf
+    return send_receipt(current_user.business, sale_id, fmt)
+
+
+@api_bp.post("/sales")
+@token_required
+@idempotent
+@write_transaction
+def create_sale():
+    # {"items": [{"product_id", "quantity", "unit_price"}], "location_id"?}
+    payload = _json_body()
+
+    try:
+        sale = register_ticket(
+            current_user.business_id,
+            current_user.id,
+            payload.get("items"),
+            location_id=payload.get("location_id")
+        )
+    except TicketError as e:
+        db.session.rollback()
+        raise ApiError(str(e), 422)
+
+    db.session.commit()
+    return _json(_serialize(sale, _sale_serializers(SaleItem, [sale.id]), SALE_FIELDS), 201)
+
+
+# ===== kardex =====
+
+MOVEMENT_FIELDS = {
+    "id": lambda m: m.id,
+    "product_id": lambda m: m.product_id,
+    "user_id": lambda m: m.user_id,
+    "movement_type": lambda m: m.movement_type,
+    "quantity": lambda m: m.quantity,
+    "stock_before": lambda m: m.stock_before,
+    "stock_after": lambda m: m.stock_after,
+    "location_id": lambda m: m.location_id,
+    "location_stock_before": lambda m: m.location_stock_before,
+    "location_stock_after": lambda m: m.location_stock_after,
+    "transfer_pair_id": lambda m: m.transfer_pair_id,
+    "unit_cost": lambda m: m.unit_cost,
+    "note": lambda m: m.note,
+    "created_at": lambda m: m.created_at,
+}
+
+
+@api_bp.get("/movements")
+@token_required
+@use_replica
+def list_movements():
+    fields = _fields(MOVEMENT_FIELDS, MOVEMENT_FIELDS)
+
+    q = InventoryMovement.query.filter(InventoryMovement.business_id == current_user.business_id)
+
+    product_id = request.args.get("product_id", type=int)
+    if product_id:
+        q = q.filter(InventoryMovement.product_id == product_id)
+
+    movement_type = request.args.get("movement_type")
+    if movement_type in {"in", "out", "adjust", "transfer_out", "transfer_in"}:
+        q = q.filter(InventoryMovement.movement_type == movement_type)
+
+    location_id = request.args.get("location_id", type=int)
+    if location_id:
+        q = q.filter(InventoryMovement.location_id == location_id)
+
+    return _conditional(_page(q, InventoryMovement.id, MOVEMENT_FIELDS, fields))
+
+
+@api_bp.post("/movements")
+@token_required
+@idempotent
+@write_transaction
+def create_movement():
+    # {"product_id", "movement_type": in|out|adjust, "quantity", "note"?, "unit_cost"?, "location_id"?}
+    payload = _json_body()
+
+    try:
+        product_id = int(payload.get("product_id"))
+        qty = int(payload.get("quantity"))
+        unit_cost = payload.get("unit_cost")
+        unit_cost = Decimal(str(unit_cost)) if unit_cost is not None else None
+        if unit_cost is not None and not unit_cost.is_finite():
+            raise ValueError(unit_cost)
+    except (TypeError, ValueError, ArithmeticError):
+        raise ApiError("product_id, quantity o unit_cost inválidos", 422)
+
+    product = Product.query.filter_by(id=product_id, business_id=current_user.business_id).first_or_404()
+
+    try:
+        movement = register_movement(
+            product,
+            (payload.get("movement_type") or "").strip(),
+            qty,
+            current_user.id,
+            note=(payload.get("note") or "").strip()[:255],
+            unit_cost=unit_cost,
+            location_id=payload.get("location_id")
+        )
+    except MovementError as e:
+        db.session.rollback()
+        raise ApiError(str(e), 422)
+
+    db.session.commit()
+    return _json(_serialize(movement, MOVEMENT_FIELDS, MOVEMENT_FIELDS), 201)
+
+
+@api_bp.post("/transfers")
+@token_required
+@idempotent
+@write_transaction
+def create_transfer():
+    # {"product_id", "source_id", "target_id", "quantity", "note"?}
+    payload = _json_body()
+
+    try:
+        product_id = int(payload.get("product_id"))
+        qty = int(payload.get("quantity"))
+    except (TypeError, ValueError):
+        raise ApiError("product_id o quantity inválidos", 422)
+
+    product = Product.query.filter_by(id=product_id, business_id=current_user.business_id).first_or_404()
+
+    try:
+        moves = transfer_stock(
+            product,
+            payload.get("source_id"),
+            payload.get("target_id"),
+            qty,
+            current_user.id,
+            note=(payload.get("note") or "").strip()[:255]
+        )
+    except MovementError as e:
+        db.session.rollback()
+        raise ApiError(str(e), 422)
+
+    db.session.commit()
+    return _json({"data": [_serialize(m, MOVEMENT_FIELDS, MOVEMENT_FIELDS) for m in moves]}, 201)
+
+
+# ===== reportes =====
+
+@api_bp.get("/reports/summary")
+@token_required
+@use_replica
+def reports_summary():
+    days = request.args.get("days", default=1, type=int)
+    low = request.args.get("low", default=5, type=int)
+
+    if days not in (1, 7, 30):
+        days = 1
+    if low is None or low < 0:
+        low = 5
+
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    business_id = current_user.business_id
+
+    sales_total, sales_count = sales_summary(business_id, start, end)
+
+    return _conditional({
+        "days": days,
+        "sales_total": Decimal(sales_total),
+        "sales_count": int(sales_count),
+        "top_products": [
+            {"product_name": r.product_name, "qty": int(r.qty), "income": Decimal(r.income)}
+            for r in top_products(business_id, start, end)
+        ],
+        "low_stock": [
+            {"id": p.id, "name": p.name, "stock": int(p.stock or 0)}
+            for p in low_stock_products(business_id, low)
+        ],
+    })
@@ -0,0 +1,48 @@
+from datetime import datetime
+import hashlib
+import secrets
+
+from ..extensions import db
+from ..models import ApiToken
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def create_token(user, name: str = None) -> str:
+    """Crea un token para `user` y devuelve el valor en claro (solo se muestra una vez)."""
+    token = "cp_" + secrets.token_urlsafe(32)
+    db.session.add(ApiToken(
+        business_id=user.business_id,
+        user_id=user.id,
+        name=name,
+        token_hash=hash_token(token)
+    ))
+    db.session.commit()
+    return token
+
+
+def revoke_token(token_id: int) -> bool:
+    token = db.session.get(ApiToken, token_id)
+    if not token or token.revoked_at:
+        return False
+    token.revoked_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def user_from_request(req):
+    # Authorization: Bearer <token>; solo para rutas de la API
+    if req.blueprint != "api":
+        return None
+
+    auth = req.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return None
+
+    token = ApiToken.query.filter_by(
+        token_hash=hash_token(auth[7:].strip()),
+        revoked_at=None
+    ).first()
+    return token.user if token else None
@@ -0,0 +1,162 @@
+from datetime import date, datetime, time
+
+import click
+from flask import current_app, g
+from flask.cli import AppGroup
+from sqlalchemy import delete, exists, func, insert, select, text, union_all
+from sqlalchemy.orm import aliased
+
+from .extensions import db
+from .models import (
+    ArchivedPeriod, InventoryMovement, InventoryMovementArchive, KardexIssue,
+    Sale, SaleArchive, SaleItem, SaleItemArchive, StockSnapshot
+)
+from .partitions import is_partitioned, month_start, next_month, partition_name
+
+archive_cli = AppGroup("archive", help="Archivo de ventas y kardex de meses cerrados.")
+
+def _columns(model, archive_model):
+    # columnas de la tabla caliente en el orden de la de archivo
+    return [model.__table__.c[c.name] for c in archive_model.__table__.columns]
+
+
+# ===== lectura transparente =====
+
+def archive_boundary():
+    """Primer instante no archivado (None si no hay archivo). Una consulta por request."""
+    if "archive_boundary" not in g:
+        last = db.session.query(func.max(ArchivedPeriod.month)).scalar()
+        g.archive_boundary = datetime.combine(next_month(last), time.min) if last else None
+    return g.archive_boundary
+
+
+def _tiered(model, archive_model, start):
+    boundary = archive_boundary()
+    if boundary is None or (start is not None and start >= boundary):
+        return model
+
+    # el rango toca meses archivados: caliente ∪ archivo con las mismas columnas
+    both = union_all(
+        select(*_columns(model, archive_model)),
+        select(*archive_model.__table__.columns)
+    ).subquery(f"{model.__tablename__}_all")
+    return aliased(model, both, adapt_on_names=True)
+
+
+def sales_for(start):
+    """Sale, o Sale + SaleArchive si `start` cae en un mes archivado."""
+    return _tiered(Sale, SaleArchive, start)
+
+
+def sale_items_for(start):
+    return _tiered(SaleItem, SaleItemArchive, start)
+
+
+def movements_for(start):
+    """InventoryMovement, o + InventoryMovementArchive si `start` (None = desde
+    el principio) cae en un mes archivado."""
+    return _tiered(InventoryMovement, InventoryMovementArchive, start)
+
+
+# ===== mover meses al archivo =====
+
+def _referenced_movement():
+    # snapshots e incidencias del kardex apuntan a movimientos: esos se quedan
+    return (
+        exists().where(StockSnapshot.movement_id == InventoryMovement.id)
+        | exists().where(KardexIssue.movement_id == InventoryMovement.id)
+    )
+
+
+def archive_month(month: date) -> ArchivedPeriod:
+    """Copia el mes a las tablas de archivo y lo borra de las calientes.
+    No hace commit. Los contadores diarios (TenantDailyStats) no se tocan."""
+    start = datetime.combine(month, time.min)
+    end = datetime.combine(next_month(month), time.min)
+    in_month = (Sale.created_at >= start) & (Sale.created_at < end)
+    sale_ids = select(Sale.id).where(in_month)
+
+    moves = (InventoryMovement.created_at >= start) & (InventoryMovement.created_at < end) & ~_referenced_movement()
+
+    steps = (
+        (SaleItem, SaleItemArchive, SaleItem.sale_id.in_(sale_ids)),
+        (Sale, SaleArchive, in_month),
+        (InventoryMovement, InventoryMovementArchive, moves),
+    )
+
+    counts = []
+    for model, archive_model, condition in steps:
+        names = [c.name for c in archive_model.__table__.columns]
+        moved = db.session.execute(
+            insert(archive_model.__table__).from_select(names, select(*_columns(model, archive_model)).where(condition))
+        ).rowcount
+        db.session.execute(delete(model.__table__).where(condition))
+        counts.append(moved)
+
+    period = db.session.get(ArchivedPeriod, month) or ArchivedPeriod(month=month, sales=0, sale_items=0, movements=0)
+    period.sale_items += counts[0]
+    period.sales += counts[1]
+    period.movements += counts[2]
+    period.archived_at = datetime.utcnow()
+    db.session.add(period)
+
+    # Postgres particionado: la partición del mes quedó vacía
+    for table in ("sale", "inventory_movement"):
+        if is_partitioned(table):
+            name = partition_name(table, month)
+            if db.session.execute(text("SELECT to_regclass(:t)"), {"t": name}).scalar() and \
+                    not db.session.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).scalar():
+                db.session.execute(text(f"DROP TABLE {name}"))
+
+    return period
+
+
+def archivable_months(before: date):
+    """Meses con ventas o movimientos anteriores a `before`."""
+    cutoff = datetime.combine(before, time.min)
+    oldest = [
+        db.session.query(func.min(Sale.created_at)).filter(Sale.created_at < cutoff).scalar(),
+        db.session.query(func.min(InventoryMovement.created_at)).filter(InventoryMovement.created_at < cutoff).scalar(),
+    ]
+    oldest = [d for d in oldest if d]
+    if not oldest:
+        return []
+
+    months, month = [], month_start(min(oldest).date())
+    while month < before:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def default_cutoff() -> date:
+    month = month_start(date.today())
+    for _ in range(current_app.config["ARCHIVE_AFTER_MONTHS"]):
+        month = date(month.year - (month.month == 1), (month.month - 2) % 12 + 1, 1)
+    return month
+
+
+@archive_cli.command("run")
+@click.option("--before", "before_str", default=None,
+              help="Archivar meses anteriores a YYYY-MM (por defecto: ARCHIVE_AFTER_MONTHS atrás).")
+def run_command(before_str):
+    """Mueve los meses cerrados a las tablas de archivo (un commit por mes)."""
+    before = datetime.strptime(before_str, "%Y-%m").date() if before_str else default_cutoff()
+
+    for month in archivable_months(before):
+        period = archive_month(month)
+        db.session.commit()
+        click.echo(f"{month:%Y-%m}: ventas={period.sales} líneas={period.sale_items} movimientos={period.movements}")
+
+    click.echo(f"Archivo hasta {before:%Y-%m} (sin incluir).")
+
+
+@archive_cli.command("status")
+def status_command():
+    """Meses archivados."""
+    periods = ArchivedPeriod.query.order_by(ArchivedPeriod.month).all()
+    if not periods:
+        click.echo("Sin meses archivados.")
+    for p in periods:
+        click.echo(f"{p.month:%Y-%m}: ventas={p.sales} líneas={p.sale_items} movimientos={p.movements} "
+                   f"({p.archived_at:%Y-%m-%d})")
@@ -1,7 +1,9 @@
 from flask import render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required
 from . import auth_bp
+from ..database import write_transaction
 from ..extensions import db
+from ..inventory.locations import default_location
 from ..models import User, Business
 
 # ✅ PON AQUÍ TU CORREO REAL (el que será ADMIN)
@@ -33,6 +35,7 @@ def register():
 
 
 @auth_bp.post("/register")
+@write_transaction
 def register_post():
     business_name = request.form.get("business_name", "").strip()
     email = request.form.get("email", "").strip().lower()
@@ -57,6 +60,10 @@ def register_post():
     user.set_password(password)
 
     db.session.add_all([biz, user])
+    db.session.flush()
+
+    # ubicación por defecto: el stock y el kardex siempre van a alguna
+    default_location(biz.id)
     db.session.commit()
 
     login_user(user)
@@ -0,0 +1,82 @@
+import os
+import shutil
+
+import click
+from flask import current_app
+
+from . import billing_bp
+from ..extensions import db
+from ..models import PaymentProof
+from .lifecycle import sweep
+from .uploads import MAGIC, file_sha256, preview_name, stored_name
+
+
+def _sniff_ext(path: str):
+    with open(path, "rb") as fh:
+        head = fh.read(8)
+    for magic, ext, mime in MAGIC:
+        if head.startswith(magic):
+            return ext, mime
+    return None
+
+
+@billing_bp.cli.command("migrate-proofs")
+def migrate_proofs_command():
+    """Mueve comprobantes con nombre antiguo a la ruta por hash (ab/cd/<sha256>.ext)."""
+    upload_dir = current_app.config["UPLOAD_FOLDER"]
+
+    legacy = PaymentProof.query.filter(~PaymentProof.filename.contains("/")).order_by(PaymentProof.id).all()
+    moved = missing = 0
+
+    for proof in legacy:
+        src = os.path.join(upload_dir, proof.filename)
+        kind = _sniff_ext(src) if os.path.isfile(src) else None
+        if kind is None:
+            missing += 1
+            click.echo(f"#{proof.id}: {proof.filename} no existe o no es PNG/JPG/PDF, se omite", err=True)
+            continue
+
+        ext, mime = kind
+        sha256 = file_sha256(src)
+        name = stored_name(sha256, ext)
+        dest = os.path.join(upload_dir, name)
+
+        # copia primero y borra el original después del commit: si se corta, se puede reintentar
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if not os.path.exists(dest):
+            shutil.copyfile(src, dest + ".part")
+            os.replace(dest + ".part", dest)
+
+        old_preview = None
+        if proof.preview_filename:
+            old_preview = os.path.join(upload_dir, proof.preview_filename)
+            new_preview = os.path.join(upload_dir, preview_name(name))
+            if os.path.isfile(old_preview) and not os.path.exists(new_preview):
+                shutil.copyfile(old_preview, new_preview)
+            proof.preview_filename = preview_name(name) if os.path.exists(new_preview) else None
+
+        proof.filename = name
+        proof.sha256 = sha256
+        proof.size_bytes = os.path.getsize(dest)
+        proof.mime_type = mime
+        db.session.commit()
+
+        for path in (src, old_preview):
+            if path and os.path.isfile(path):
+                os.remove(path)
+        moved += 1
+
+    click.echo(f"Comprobantes movidos: {moved}. Omitidos: {missing}.")
+
+
+@billing_bp.cli.command("sweep")
+def sweep_command():
+    """Vence trials y ordena comprobantes pendientes (correr por cron o con BILLING_SCHEDULER=1)."""
+    result = sweep()
+    db.session.commit()
+
+    if result.get("skipped"):
+        click.echo("Otro barrido en curso, se omite.")
+        return
+    click.echo(f"Negocios actualizados: {result['businesses']}. "
+               f"Comprobantes ya sin revisión: {result['proofs_superseded']}.")
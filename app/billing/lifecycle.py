@@ -0,0 +1,139 @@
+from datetime import datetime
+import logging
+import os
+import threading
+
+from sqlalchemy import and_, case, event, exists, or_, select, text, update
+
+from ..extensions import db
+from ..models import Business, PaymentProof
+
+log = logging.getLogger(__name__)
+
+# payment_status: trial -> expired (venció) | pending (comprobante en revisión) | approved (Pro)
+# access_blocked: el único dato que mira enforce_billing en cada request
+SWEEP_LOCK_ID = 0x62696C6C  # pg_advisory_xact_lock: un barrido a la vez entre workers
+
+
+def _trial_ended(now):
+    return and_(Business.is_pro.is_(False), Business.trial_ends_at <= now)
+
+
+def sweep(now: datetime = None) -> dict:
+    """Lleva cada negocio a su estado de facturación con UPDATEs por conjunto.
+
+    Idempotente: solo toca filas cuyo estado cambió. No hace commit.
+    """
+    now = now or datetime.utcnow()
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        locked = db.session.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": SWEEP_LOCK_ID}).scalar()
+        if not locked:
+            return {"skipped": True}
+
+    # comprobantes sin revisar de negocios que ya son Pro (activados a mano): nada que revisar
+    superseded = db.session.execute(
+        update(PaymentProof)
+        .where(
+            PaymentProof.status == "pending",
+            PaymentProof.business_id.in_(select(Business.id).where(Business.is_pro.is_(True)))
+        )
+        .values(status="superseded")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    has_pending = exists().where(
+        PaymentProof.business_id == Business.id,
+        PaymentProof.status == "pending"
+    )
+    status = case(
+        (Business.is_pro.is_(True), "approved"),
+        (has_pending, "pending"),
+        (Business.trial_ends_at <= now, "expired"),
+        else_="trial"
+    )
+    blocked = case((_trial_ended(now), True), else_=False)
+
+    businesses = db.session.execute(
+        update(Business)
+        .where(or_(Business.payment_status != status, Business.access_blocked != blocked))
+        .values(payment_status=status, access_blocked=blocked)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    return {"businesses": businesses, "proofs_superseded": superseded}
+
+
+# cambios de plan/trial hechos en la app: el flag se corrige al momento, sin esperar al barrido
+
+@event.listens_for(Business.is_pro, "set")
+def _sync_on_pro(target, value, oldvalue, initiator):
+    target.access_blocked = bool(not value and target.trial_ends_at and target.trial_ends_at <= datetime.utcnow())
+
+
+@event.listens_for(Business.trial_ends_at, "set")
+def _sync_on_trial(target, value, oldvalue, initiator):
+    target.access_blocked = bool(not target.is_pro and value and value <= datetime.utcnow())
+
+
+# ===== programador en proceso (opcional) =====
+
+_scheduler = None
+
+
+def _claim_scheduler(app):
+    """Lock de archivo no bloqueante en instance/: run.py se importa en cada
+    worker de gunicorn y solo el que lo obtiene corre el hilo. Se libera al
+    morir ese worker y lo toma el siguiente que arranque. Entre máquinas
+    distintas el barrido ya se serializa con pg_try_advisory_xact_lock."""
+    try:
+        import fcntl
+    except ImportError:  # Windows: sin lock, un hilo por proceso
+        return True
+
+    os.makedirs(app.instance_path, exist_ok=True)
+    handle = open(os.path.join(app.instance_path, "billing-sweep.lock"), "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle  # abierto mientras viva el proceso
+
+
+def _run(app, interval: int, stop: threading.Event):
+    from flask import g
+
+    while not stop.wait(interval):
+        with app.app_context():
+            g.db_write = True  # como @write_transaction: en SQLite, BEGIN IMMEDIATE
+            try:
+                result = sweep()
+                db.session.commit()
+                if result.get("businesses") or result.get("proofs_superseded"):
+                    log.info("Barrido de facturación: %s", result)
+            except Exception:
+                db.session.rollback()
+                log.exception("Falló el barrido de facturación")
+
+
+def start_scheduler(app) -> bool:
+    """Barrido cada BILLING_SWEEP_SECONDS en un hilo del proceso, si
+    BILLING_SCHEDULER está activo. Con gunicorn, un solo worker por máquina
+    lo corre (ver _claim_scheduler). Alternativa: `flask billing sweep` por cron."""
+    global _scheduler
+    if not app.config.get("BILLING_SCHEDULER") or _scheduler is not None:
+        return False
+
+    lock = _claim_scheduler(app)
+    if not lock:
+        return False
+
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=_run, args=(app, app.config["BILLING_SWEEP_SECONDS"], stop),
+        name="billing-sweep", daemon=True
+    )
+    thread.start()
+    _scheduler = (thread, stop, lock)
+    return True
@@ -1,13 +1,17 @@
 from datetime import datetime
-from flask import render_template, redirect, url_for, flash
+from flask import render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
 from . import billing_bp
 from ..extensions import db
+from ..database import write_transaction
 import os
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask import current_app, send_from_directory
 from flask_login import current_user
 from ..models import PaymentProof
+from .uploads import UploadError, receive_proof, schedule_preview, store_proof
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
 
 
 @billing_bp.get("/expired")
@@ -18,6 +22,7 @@ def expired():
 
 @billing_bp.post("/upgrade")
 @login_required
+@write_transaction
 def upgrade():
     # Por ahora: activar manualmente Pro (luego aquí va Stripe)
     biz = current_user.business
@@ -39,6 +44,7 @@ def pay():
     
 @billing_bp.get("/approve/<int:business_id>")
 @login_required
+@write_transaction
 def approve(business_id):
 
     from ..models import Business
@@ -51,12 +57,6 @@ def approve(business_id):
 
     return "Cliente activado ✅"
     
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "pdf"}
-
-def allowed_file(filename: str) -> bool:
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
-
-
 @billing_bp.get("/upload-proof")
 @login_required
 def upload_proof():
@@ -66,40 +66,61 @@ def upload_proof():
 
 @billing_bp.post("/upload-proof")
 @login_required
+@write_transaction
 def upload_proof_post():
-    biz = current_user.business
-
-    if "file" not in request.files:
-        flash("No se recibió archivo.", "danger")
-        return redirect(url_for("billing.upload_proof"))
-
-    f = request.files["file"]
-    if not f or f.filename == "":
-        flash("Selecciona un archivo.", "danger")
+    upload_dir = current_app.config["UPLOAD_FOLDER"]
+    max_bytes = current_app.config["MAX_CONTENT_LENGTH"]
+
+    # no retener la transacción (ni el lock de escritura en SQLite) mientras llega el archivo
+    db.session.rollback()
+
+    # se lee el cuerpo por bloques: el archivo va directo a disco (sin request.files)
+    try:
+        upload = receive_proof(
+            request.stream,
+            request.mimetype_params.get("boundary"),
+            upload_dir,
+            max_bytes=max_bytes,
+            chunk_size=current_app.config.get("UPLOAD_CHUNK_SIZE", 64 * 1024)
+        )
+    except RequestEntityTooLarge:
+        flash(f"El archivo supera el máximo de {max_bytes // (1024 * 1024)}MB.", "danger")
         return redirect(url_for("billing.upload_proof"))
-
-    if not allowed_file(f.filename):
-        flash("Formato no permitido. Usa PNG, JPG, JPEG o PDF.", "danger")
+    except UploadError as e:
+        flash(str(e), "danger")
         return redirect(url_for("billing.upload_proof"))
 
-    # carpeta destino (instance/uploads)
-    upload_dir = current_app.config["UPLOAD_FOLDER"]
-    os.makedirs(upload_dir, exist_ok=True)
-
-    original = secure_filename(f.filename)
-    ext = original.rsplit(".", 1)[1].lower()
+    biz = current_user.business
 
-    # nombre único
-    unique_name = f"proof_biz{biz.id}_user{current_user.id}_{int(datetime.utcnow().timestamp())}.{ext}"
-    path = os.path.join(upload_dir, unique_name)
-    f.save(path)
+    # mismo archivo ya enviado por este negocio y todavía vigente; uno
+    # rechazado o reemplazado se puede volver a enviar
+    duplicate = PaymentProof.query.filter(
+        PaymentProof.business_id == biz.id,
+        PaymentProof.sha256 == upload.sha256,
+        PaymentProof.status.in_(("pending", "approved"))
+    ).first()
+    if duplicate:
+        upload.discard()
+        if duplicate.status == "pending":
+            flash("Ese comprobante ya fue enviado. Está en revisión.", "info")
+        else:
+            flash("Ese comprobante ya fue aprobado.", "info")
+        return redirect(url_for("billing.plan"))
+
+    _, mime = upload.kind
+    sha256, size = upload.sha256, upload.size
+
+    # ruta por hash (ab/cd/<sha256>.ext); el mismo contenido se guarda una vez
+    stored = store_proof(upload, upload_dir)
 
     proof = PaymentProof(
         business_id=biz.id,
         user_id=current_user.id,
-        filename=unique_name,
-        original_name=original,
-        mime_type=f.mimetype,
+        filename=stored,
+        original_name=upload.original_name,
+        mime_type=mime,
+        sha256=sha256,
+        size_bytes=size,
         status="pending"
     )
     db.session.add(proof)
@@ -108,10 +129,43 @@ def upload_proof_post():
     biz.payment_status = "pending"
     db.session.commit()
 
+    if mime != "application/pdf":
+        schedule_preview(current_app._get_current_object(), proof.id)
+
     flash("Comprobante enviado ✅. En revisión.", "success")
     return redirect(url_for("billing.plan"))
 
 
+def _send_stored(name: str, mimetype: str = None, etag: str = None):
+    """Envía un archivo de UPLOAD_FOLDER.
+
+    Con `etag` (contenido direccionado por hash) el archivo nunca cambia:
+    ETag fuerte + caché inmutable, y 304 sin tocar el disco. Con
+    PROOF_SENDFILE=x-accel lo entrega nginx (X-Accel-Redirect); con
+    x-sendfile, el servidor frontal (USE_X_SENDFILE). Si no, Werkzeug con
+    soporte de Range/If-None-Match.
+    """
+    upload_dir = current_app.config["UPLOAD_FOLDER"]
+
+    if etag and request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    elif current_app.config.get("PROOF_SENDFILE") == "x-accel":
+        if not os.path.isfile(os.path.join(upload_dir, name)):
+            abort(404)
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = f"{current_app.config['PROOF_ACCEL_PREFIX'].rstrip('/')}/{name}"
+    else:
+        response = send_from_directory(upload_dir, name, mimetype=mimetype, etag=etag or True, conditional=True)
+
+    if etag:
+        response.set_etag(etag)
+        response.cache_control.no_cache = None
+        response.cache_control.private = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
 # Mostrar comprobante (solo dueño o admin)
 @billing_bp.get("/proof/<int:proof_id>")
 @login_required
@@ -122,12 +176,32 @@ def view_proof(proof_id):
     if proof.business_id != current_user.business_id and not _is_admin():
         abort(403)
 
-    upload_dir = current_app.config["UPLOAD_FOLDER"]
-    return send_from_directory(upload_dir, proof.filename, as_attachment=False)
+    return _send_stored(proof.filename, proof.mime_type, etag=proof.sha256)
+
+
+# Miniatura para la pantalla de revisión (si aún no existe, el original)
+@billing_bp.get("/proof/<int:proof_id>/preview")
+@login_required
+def view_proof_preview(proof_id):
+    proof = PaymentProof.query.get_or_404(proof_id)
+
+    if proof.business_id != current_user.business_id and not _is_admin():
+        abort(403)
+
+    if not proof.preview_filename:
+        # la miniatura puede llegar después: no cachear el original en esta URL
+        response = _send_stored(proof.filename, proof.mime_type)
+        response.cache_control.no_cache = True
+        return response
+
+    etag = f"{proof.sha256}-preview" if proof.sha256 else None
+    return _send_stored(proof.preview_filename, "image/jpeg", etag=etag)
 
 def _is_admin() -> bool:
     # Cambia tu correo aquí, o mejor por variable de entorno después
     admin_emails = {"ltrujilloirarragorri@gmail.com"}  # <-- pon tu correo real
+    if getattr(current_user, "is_admin", False):
+        return True
     return current_user.is_authenticated and current_user.email in admin_emails
 
 @billing_bp.get("/admin/payments")
@@ -142,6 +216,7 @@ def admin_payments():
 
 @billing_bp.post("/admin/payments/<int:proof_id>/approve")
 @login_required
+@write_transaction
 def admin_approve(proof_id):
     if not _is_admin():
         abort(403)
@@ -160,6 +235,7 @@ def admin_approve(proof_id):
 
 @billing_bp.post("/admin/payments/<int:proof_id>/reject")
 @login_required
+@write_transaction
 def admin_reject(proof_id):
     if not _is_admin():
         abort(403)
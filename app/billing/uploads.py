@@ -0,0 +1,225 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import uuid
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.utils import secure_filename
+
+log = logging.getLogger(__name__)
+
+# tipo real por los primeros bytes del archivo (no por la extensión)
+MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"%PDF-", "pdf", "application/pdf"),
+)
+SNIFF_BYTES = 8
+
+PREVIEW_SIZE = (480, 480)
+
+_previews = ThreadPoolExecutor(max_workers=1, thread_name_prefix="proof-preview")
+
+
+class UploadError(Exception):
+    """Subida rechazada; el mensaje es para el usuario."""
+
+
+class ProofUpload:
+    """Archivo recibido: escrito en disco en un .part, con hash y tipo detectado."""
+
+    def __init__(self, path: str, original_name: str):
+        self.path = path
+        self.original_name = original_name
+        self.size = 0
+        self.head = b""
+        self._hash = hashlib.sha256()
+        self._fh = open(path, "wb")
+
+    def write(self, chunk: bytes, max_bytes: int):
+        self.size += len(chunk)
+        if self.size > max_bytes:
+            raise UploadError(f"El archivo supera el máximo de {max_bytes // (1024 * 1024)}MB.")
+
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES and self.kind is None:
+                # no seguimos recibiendo algo que no es PNG/JPG/PDF
+                raise UploadError("El archivo no es un PNG, JPG o PDF válido.")
+
+        self._hash.update(chunk)
+        self._fh.write(chunk)
+
+    def close(self):
+        if not self._fh.closed:
+            self._fh.close()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def kind(self):
+        for magic, ext, mime in MAGIC:
+            if self.head.startswith(magic):
+                return ext, mime
+        return None
+
+
+def receive_proof(stream, boundary: str, upload_dir: str, field: str = "file",
+                  max_bytes: int = 5 * 1024 * 1024, chunk_size: int = 64 * 1024) -> ProofUpload:
+    """Lee un multipart/form-data desde `stream` por bloques de `chunk_size` y
+    escribe el archivo `field` en `upload_dir` mientras calcula su sha256.
+
+    Nunca tiene el archivo entero en memoria. Devuelve el ProofUpload ya
+    cerrado (archivo .part); quien llama decide el nombre final o lo descarta.
+    """
+    if not boundary:
+        raise UploadError("No se recibió archivo.")
+
+    os.makedirs(upload_dir, exist_ok=True)
+
+    decoder = MultipartDecoder(boundary.encode("latin-1"), max_form_memory_size=64 * 1024)
+    upload = None
+    current = None  # parte en curso: ProofUpload o None (se ignora)
+
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            decoder.receive_data(chunk or None)
+
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, File):
+                    current = None
+                    if event.name == field and upload is None:
+                        upload = current = ProofUpload(
+                            os.path.join(upload_dir, f".{uuid.uuid4().hex}.part"),
+                            secure_filename(event.filename or "")
+                        )
+                elif isinstance(event, Field):
+                    current = None
+                elif isinstance(event, Data) and current is not None:
+                    current.write(event.data, max_bytes)
+                event = decoder.next_event()
+
+            if isinstance(event, Epilogue):
+                break
+            if not chunk:
+                raise ValueError("multipart incompleto")
+    except (UploadError, RequestEntityTooLarge, ValueError) as e:
+        if upload is not None:
+            upload.discard()
+        if isinstance(e, UploadError):
+            raise
+        if isinstance(e, RequestEntityTooLarge):
+            raise UploadError(f"El archivo supera el máximo de {max_bytes // (1024 * 1024)}MB.")
+        raise UploadError("No se pudo leer el archivo enviado.")
+
+    if upload is None or upload.size == 0:
+        if upload is not None:
+            upload.discard()
+        raise UploadError("Selecciona un archivo.")
+
+    upload.close()
+
+    if upload.kind is None:
+        upload.discard()
+        raise UploadError("El archivo no es un PNG, JPG o PDF válido.")
+
+    return upload
+
+
+# ===== almacenamiento por contenido =====
+
+def stored_name(sha256: str, ext: str) -> str:
+    # ab/cd/abcd...ef.png: subcarpetas para no juntar miles de archivos en una
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+
+
+def store_proof(upload: ProofUpload, upload_dir: str) -> str:
+    """Mueve el .part a su ruta por hash y devuelve el nombre relativo.
+
+    Si ese contenido ya está guardado (otro negocio subió el mismo archivo)
+    se reutiliza y el .part se descarta.
+    """
+    ext, _ = upload.kind
+    name = stored_name(upload.sha256, ext)
+    path = os.path.join(upload_dir, name)
+
+    if os.path.exists(path):
+        upload.discard()
+        return name
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(upload.path, path)
+    return name
+
+
+def file_sha256(path: str, chunk_size: int = 64 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ===== vista previa (en segundo plano) =====
+
+def preview_name(filename: str) -> str:
+    return f"{filename.rsplit('.', 1)[0]}.preview.jpg"
+
+
+def build_preview(src: str, dest: str) -> bool:
+    """Miniatura JPEG de una imagen. Requiere Pillow (opcional): sin Pillow
+    o para PDF no hay vista previa y el admin abre el original."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+
+    with Image.open(src) as img:
+        img.thumbnail(PREVIEW_SIZE)
+        img.convert("RGB").save(dest, "JPEG", quality=80, optimize=True)
+    return True
+
+
+def _preview_job(app, proof_id: int):
+    from flask import g
+    from ..extensions import db
+    from ..models import PaymentProof
+
+    with app.app_context():
+        g.db_write = True  # como @write_transaction: en SQLite, BEGIN IMMEDIATE
+        proof = db.session.get(PaymentProof, proof_id)
+        if proof is None or proof.preview_filename or proof.mime_type == "application/pdf":
+            return
+
+        upload_dir = app.config["UPLOAD_FOLDER"]
+        name = preview_name(proof.filename)
+        try:
+            # mismo contenido ya procesado para otro comprobante
+            if os.path.exists(os.path.join(upload_dir, name)):
+                proof.preview_filename = name
+                db.session.commit()
+                return
+            if not build_preview(os.path.join(upload_dir, proof.filename), os.path.join(upload_dir, name)):
+                return
+        except Exception:
+            log.warning("No se pudo generar vista previa del comprobante %s", proof_id, exc_info=True)
+            return
+
+        proof.preview_filename = name
+        db.session.commit()
+
+
+def schedule_preview(app, proof_id: int):
+    # fuera del request: la respuesta al usuario no espera la miniatura
+    _previews.submit(_preview_job, app, proof_id)
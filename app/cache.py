@@ -0,0 +1,162 @@
+from collections import OrderedDict
+import threading
+import time
+
+from sqlalchemy import event
+
+from .database import RoutingSession
+
+# session.info: negocios cuya versión de datos subió en esta transacción
+BUMPED_KEY = "data_version_bumped"
+
+
+class LocalLRU:
+    """LRU en memoria del proceso (un dict por worker de gunicorn)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._by_business = {}      # business_id -> {keys}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, business_id: int, key, value, ttl: int):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            self._by_business.setdefault(business_id, set()).add(key)
+
+            while len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, business_id: int):
+        with self._lock:
+            for key in self._by_business.pop(business_id, ()):
+                self._data.pop(key, None)
+
+    def _drop(self, key):
+        self._data.pop(key, None)
+        keys = self._by_business.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_business[key[0]]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """Backend compartido entre workers/instancias (requiere el paquete redis).
+
+    No borra por negocio: la versión de datos va en la clave, así que lo
+    viejo ya no se lee y expira por TTL.
+    """
+
+    def __init__(self, url: str):
+        import redis  # opcional: solo si se configura FRAGMENT_CACHE_URL
+        self._client = redis.Redis.from_url(url)
+        self.evictions = 0
+
+    @staticmethod
+    def _key(key) -> str:
+        return "frag:" + ":".join(map(str, key))
+
+    def get(self, key):
+        value = self._client.get(self._key(key))
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, business_id: int, key, value, ttl: int):
+        self._client.set(self._key(key), value.encode("utf-8"), ex=ttl)
+
+    def invalidate(self, business_id: int):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class FragmentCache:
+    """Caché de fragmentos HTML por negocio.
+
+    La clave empieza con business_id y debe incluir la versión de datos;
+    además, al hacer commit de escrituras se limpia lo del negocio (LRU).
+    Contadores hit/miss por proceso, visibles en /admin.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get("FRAGMENT_CACHE_TTL", 300)
+        url = app.config.get("FRAGMENT_CACHE_URL")
+        if url:
+            self.backend = RedisBackend(url)
+        else:
+            self.backend = LocalLRU(app.config.get("FRAGMENT_CACHE_SIZE", 512))
+        app.extensions["fragment_cache"] = self
+
+    def get_or_render(self, key: tuple, render) -> str:
+        # key = (business_id, nombre, ..., data_version)
+        if self.backend is None:
+            return render()
+
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = render()
+        self.backend.set(key[0], key, str(value), self.ttl)
+        return value
+
+    def invalidate(self, business_id: int):
+        if self.backend is not None:
+            self.backend.invalidate(business_id)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else "-",
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": getattr(self.backend, "evictions", 0),
+        }
+
+
+fragment_cache = FragmentCache()
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _invalidate_fragments(session):
+    # liberar un savepoint no es el commit: se espera al de la transacción de afuera
+    if session.in_nested_transaction():
+        return
+    for business_id in session.info.pop(BUMPED_KEY, ()):
+        fragment_cache.invalidate(business_id)
+
+
+@event.listens_for(RoutingSession, "after_soft_rollback")
+def _forget_bumps(session, previous_transaction):
+    # un savepoint deshecho (ticket inválido del lote) no borra lo de la transacción de afuera
+    if not previous_transaction.nested:
+        session.info.pop(BUMPED_KEY, None)
@@ -1,9 +1,93 @@
+from decimal import Decimal
 import os
 
+
+def _database_uri(env_name, default=None):
+    uri = os.environ.get(env_name, default)
+    # Render/Heroku entregan postgres://, SQLAlchemy 2 exige postgresql://
+    if uri and uri.startswith("postgres://"):
+        uri = uri.replace("postgres://", "postgresql://", 1)
+    return uri
+
+
+def _default_live_streams():
+    # streams SSE por worker: en gthread cada stream retiene un hilo, así que
+    # se deja la mitad libre para ventas y sync; gevent aguanta cientos; sync ninguno
+    worker_class = os.environ.get("WEB_WORKER_CLASS", "gthread")
+    if worker_class == "gevent":
+        return int(os.environ.get("WEB_WORKER_CONNECTIONS", 200)) * 3 // 4
+    if worker_class == "gthread":
+        return max(int(os.environ.get("WEB_THREADS", 8)) // 2, 1)
+    return 0
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
-    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///controlpyme.db")
+    SQLALCHEMY_DATABASE_URI = _database_uri("DATABASE_URL", "sqlite:///controlpyme.db")
+    # Réplica de solo lectura para reportes/exports/dashboards (opcional)
+    SQLALCHEMY_REPLICA_URI = _database_uri("DATABASE_REPLICA_URL")
+    REPLICA_RETRY_SECONDS = int(os.environ.get("REPLICA_RETRY_SECONDS", 30))  # pausa tras una falla
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    
+
+    # Pool de conexiones (por worker de gunicorn: total = workers * (size + overflow))
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 10))      # segundos esperando conexión libre
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))    # segundos antes de reciclar
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 15000))  # 0 = sin límite
+    DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", "0") == "1"         # PgBouncer en modo transacción
+
+    # SQLite en producción (archivo): WAL + pragmas; SQLITE_TUNING=0 lo desactiva
+    SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "1") == "1"
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 20000))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+    # cambia en cada deploy: invalida los ETag de páginas con plantillas viejas
+    ETAG_SALT = os.environ.get("RENDER_GIT_COMMIT", "")
+
+    # caché de fragmentos (reportes): LRU por proceso o Redis compartido si hay URL
+    FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", 512))   # entradas por worker
+    FRAGMENT_CACHE_TTL = int(os.environ.get("FRAGMENT_CACHE_TTL", 300))     # segundos
+    FRAGMENT_CACHE_URL = os.environ.get("FRAGMENT_CACHE_URL")               # redis://... (requiere redis)
+
+    # dashboard en vivo (SSE): local = pub/sub del proceso; postgres = LISTEN/NOTIFY entre workers
+    LIVE_BACKEND = os.environ.get("LIVE_BACKEND", "local")
+    LIVE_HEARTBEAT_SECONDS = int(os.environ.get("LIVE_HEARTBEAT_SECONDS", 15))
+    LIVE_STREAM_SECONDS = int(os.environ.get("LIVE_STREAM_SECONDS", 300))  # luego el navegador reconecta
+    LIVE_MAX_STREAMS = int(os.environ.get("LIVE_MAX_STREAMS", _default_live_streams()))  # por worker
+    LIVE_POLL_SECONDS = int(os.environ.get("LIVE_POLL_SECONDS", 30))  # sin stream: polling con ETag
+
+    # facturación: barrido de trials/comprobantes (flask billing sweep o hilo en el proceso web)
+    BILLING_SCHEDULER = os.environ.get("BILLING_SCHEDULER", "0") == "1"
+    BILLING_SWEEP_SECONDS = int(os.environ.get("BILLING_SWEEP_SECONDS", 300))
+
+    # métricas de la plataforma (rollup nocturno)
+    PRO_MONTHLY_PRICE = Decimal(os.environ.get("PRO_MONTHLY_PRICE", "149"))  # MXN, para el MRR
+    METRICS_ACTIVE_DAYS = int(os.environ.get("METRICS_ACTIVE_DAYS", 7))      # activo = vendió en N días
+    METRICS_TRIAL_DAYS = int(os.environ.get("METRICS_TRIAL_DAYS", 7))        # trials que vencen en N días
+
+    # archivo: meses con más de N meses de antigüedad salen de las tablas calientes
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get("ARCHIVE_AFTER_MONTHS", 24))
+
+    ADMIN_PAGE_SIZE = int(os.environ.get("ADMIN_PAGE_SIZE", 50))  # filas por página en negocios/usuarios
+
+    # tickets impresos: se generan una vez por venta y se guardan en disco
+    RECEIPT_FOLDER = os.environ.get("RECEIPT_FOLDER", "instance/receipts")
+    RECEIPT_COLUMNS = int(os.environ.get("RECEIPT_COLUMNS", 42))  # impresora de 58 mm: 32; de 80 mm: 42 o 48
+
+    # ventas offline: tickets con fecha más vieja que N días se rechazan al sincronizar
+    OFFLINE_TICKET_MAX_DAYS = int(os.environ.get("OFFLINE_TICKET_MAX_DAYS", 7))
+
+    IDEMPOTENCY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_TTL_HOURS", 24))
+
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "instance/uploads")
-    MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB
+    UPLOAD_CHUNK_SIZE = 64 * 1024         # comprobantes: se escriben por bloques
+
+    # Entrega de comprobantes por el servidor frontal ("" = desde Python):
+    #   x-accel: nginx con `location /protected-uploads/ { internal; alias <UPLOAD_FOLDER>/; }`
+    #   x-sendfile: Apache/lighttpd con mod_xsendfile
+    PROOF_SENDFILE = os.environ.get("PROOF_SENDFILE", "")
+    PROOF_ACCEL_PREFIX = os.environ.get("PROOF_ACCEL_PREFIX", "/protected-uploads")
+    USE_X_SENDFILE = PROOF_SENDFILE == "x-sendfile"
@@ -0,0 +1,185 @@
+from functools import wraps
+import logging
+import time
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql.dml import UpdateBase
+
+log = logging.getLogger(__name__)
+
+REPLICA_BIND = "replica"
+
+
+def engine_options(config, uri=None) -> dict:
+    """Opciones de engine según el motor de `uri` (por defecto SQLALCHEMY_DATABASE_URI).
+
+    Postgres directo: QueuePool con pre-ping, reciclado y statement_timeout
+    enviado como parámetro de arranque de la conexión.
+    PgBouncer (modo transacción): sin pool propio (lo hace PgBouncer) y sin
+    parámetros de arranque, que PgBouncer rechaza; el timeout se aplica con
+    SET LOCAL en cada transacción (ver install_engine_events).
+    """
+    url = make_url(uri or config["SQLALCHEMY_DATABASE_URI"])
+    if _sqlite_tuned(url, config):
+        # timeout del driver = espera ante "database is locked"
+        return {"connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}}
+
+    if url.get_backend_name() != "postgresql":
+        return {}
+
+    if config.get("DB_PGBOUNCER"):
+        return {"poolclass": NullPool}
+
+    options = {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": True,
+    }
+
+    timeout = config.get("DB_STATEMENT_TIMEOUT_MS")
+    if timeout:
+        options["connect_args"] = {"options": f"-c statement_timeout={int(timeout)}"}
+
+    return options
+
+
+def replica_binds(config) -> dict:
+    # bind "replica" de Flask-SQLAlchemy (no tiene modelos: solo se usa vía RoutingSession)
+    uri = config.get("SQLALCHEMY_REPLICA_URI")
+    if not uri:
+        return {}
+    return {REPLICA_BIND: {"url": uri, **engine_options(config, uri)}}
+
+
+def _sqlite_tuned(url, config) -> bool:
+    # solo SQLite en archivo (WAL no aplica a :memory:)
+    return (
+        url.get_backend_name() == "sqlite"
+        and url.database not in (None, "", ":memory:")
+        and bool(config.get("SQLITE_TUNING"))
+    )
+
+
+def write_transaction(view):
+    """Marca una vista que escribe (ventas, kardex): en SQLite su transacción
+    arranca con BEGIN IMMEDIATE, que toma el lock de escritura al inicio y
+    espera busy_timeout en vez de fallar con "database is locked" al pasar
+    de lectura a escritura. En Postgres no cambia nada.
+    """
+    view._db_write = True
+    return view
+
+
+def mark_write_request(app):
+    # antes de cualquier consulta del request (incluida la carga del usuario)
+    @app.before_request
+    def _mark_write_request():
+        view = app.view_functions.get(request.endpoint)
+        if getattr(view, "_db_write", False):
+            g.db_write = True
+
+
+def _install_sqlite_events(engine, config):
+    busy_timeout = int(config["SQLITE_BUSY_TIMEOUT_MS"])
+    cache_size = int(config["SQLITE_CACHE_SIZE_KB"])
+    mmap_size = int(config["SQLITE_MMAP_SIZE"])
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, record):
+        # el driver no emite BEGIN: lo hacemos nosotros en "begin"
+        dbapi_conn.isolation_level = None
+
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.execute(f"PRAGMA cache_size=-{cache_size}")
+        cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _sqlite_begin(conn):
+        immediate = has_app_context() and g.get("db_write", False)
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if immediate else "BEGIN")
+
+
+def install_engine_events(engine, config):
+    if _sqlite_tuned(engine.url, config):
+        _install_sqlite_events(engine, config)
+        return
+
+    if engine.dialect.name != "postgresql":
+        return
+
+    timeout = config.get("DB_STATEMENT_TIMEOUT_MS")
+    if config.get("DB_PGBOUNCER") and timeout:
+        # SET LOCAL dura solo la transacción: no contamina la conexión
+        # compartida del lado de PgBouncer
+        @event.listens_for(engine, "begin")
+        def _statement_timeout(conn):
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout)}"))
+
+
+# ===== Ruteo a réplica =====
+
+_replica_down_until = 0.0
+
+
+def _replica_available(engine) -> bool:
+    global _replica_down_until
+
+    if time.monotonic() < _replica_down_until:
+        return False
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except SQLAlchemyError:
+        log.warning("Réplica no disponible, usando primaria", exc_info=True)
+        _replica_down_until = time.monotonic() + current_app.config.get("REPLICA_RETRY_SECONDS", 30)
+        return False
+
+    return True
+
+
+def use_replica(view):
+    """Marca una vista de solo lectura: sus consultas van a la réplica.
+
+    Se puede forzar la primaria por request con ?primary=1 o el header
+    X-DB-Primary: 1 (p. ej. justo después de escribir). Si no hay réplica
+    configurada o no responde, todo va a la primaria.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        forced = request.args.get("primary") == "1" or request.headers.get("X-DB-Primary") == "1"
+        engine = current_app.extensions["sqlalchemy"].engines.get(REPLICA_BIND)
+
+        if engine is not None and not forced and _replica_available(engine):
+            g.db_use_replica = True
+
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Sesión que manda las lecturas a la réplica cuando la vista lo pide.
+
+    Escrituras (flush, INSERT/UPDATE/DELETE) siempre van a la primaria.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase):
+            if g and g.get("db_use_replica"):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None:
+                    return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
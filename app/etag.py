@@ -0,0 +1,113 @@
+from datetime import date, datetime
+from functools import wraps
+import hashlib
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, update
+
+from .cache import BUMPED_KEY
+from .database import RoutingSession
+from .extensions import db
+from .models import Business, CashSession, Sale, Product, InventoryMovement
+
+# escrituras que cambian lo que muestran dashboard/reportes/productos
+VERSIONED_MODELS = (Sale, Product, InventoryMovement, CashSession)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_data_version(session, flush_context):
+    business_ids = {
+        obj.business_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, VERSIONED_MODELS) and obj.business_id
+    }
+    if business_ids:
+        session.info.setdefault(BUMPED_KEY, set()).update(business_ids)
+
+
+@event.listens_for(RoutingSession, "before_commit")
+def _bump_data_version(session):
+    # un UPDATE por transacción, no uno por flush: un checkout hace varios
+    # flush y cada uno tomaría el lock de la fila del negocio hasta el commit.
+    # Mismo commit que el cambio: si hay rollback, no sube. Los savepoints
+    # esperan al commit de la transacción de afuera.
+    if session.in_nested_transaction():
+        return
+
+    session.flush()
+    business_ids = session.info.get(BUMPED_KEY)
+    if not business_ids:
+        return
+
+    session.execute(
+        update(Business)
+        .where(Business.id.in_(business_ids))
+        .values(data_version=Business.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def data_version(business_id: int) -> int:
+    if "data_version" not in g:
+        if g.get("db_use_replica"):
+            # la versión debe salir de la misma base que los datos de la página
+            g.data_version = db.session.query(Business.data_version).filter(Business.id == business_id).scalar() or 0
+        else:
+            g.data_version = current_user.business.data_version or 0
+    return g.data_version
+
+
+def _page_etag(bucket_seconds=None) -> str:
+    biz = current_user.business
+    now = datetime.utcnow()
+
+    parts = [
+        current_app.config.get("ETAG_SALT", ""),
+        request.full_path,
+        current_user.id,
+        current_user.is_admin,
+        biz.id,
+        data_version(biz.id),
+        # navbar: plan y días de trial
+        biz.is_pro,
+        biz.payment_status,
+        (biz.trial_ends_at - now).days if biz.trial_ends_at else 0,
+        # "hoy" del dashboard
+        date.today(),
+    ]
+    if bucket_seconds:
+        # ventanas relativas (últimas 24h, 7 días...) avanzan con el reloj
+        parts.append(int(now.timestamp()) // bucket_seconds)
+
+    return hashlib.sha1(":".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+
+def conditional_view(view=None, *, bucket_seconds=None):
+    """ETag por versión de datos del negocio: si el navegador ya tiene la
+    página (If-None-Match), responde 304 sin correr las consultas de la vista.
+
+    Va debajo de @use_replica. Con mensajes flash pendientes siempre renderiza.
+    """
+    if view is None:
+        return lambda v: conditional_view(v, bucket_seconds=bucket_seconds)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get("_flashes"):
+            return view(*args, **kwargs)
+
+        etag = _page_etag(bucket_seconds)
+
+        if request.if_none_match.contains(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return wrapper
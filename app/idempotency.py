@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+from functools import wraps
+import uuid
+
+import click
+from flask import current_app, flash, jsonify, make_response, redirect, request, url_for
+from flask.cli import AppGroup
+from flask_login import current_user
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import IdempotencyKey
+
+MAX_STORED_BODY = 64 * 1024
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+idempotency_cli = AppGroup("idempotency", help="Claves de idempotencia.")
+
+
+def new_idempotency_key() -> str:
+    # para formularios: {{ idempotency_key() }} en un input hidden
+    return uuid.uuid4().hex
+
+
+def _request_key() -> str:
+    key = request.headers.get("Idempotency-Key") or request.form.get("idempotency_key") or ""
+    return key.strip()[:64]
+
+
+def _lookup(key: str):
+    record = IdempotencyKey.query.filter_by(
+        business_id=current_user.business_id,
+        key=key
+    ).first()
+
+    if record and record.expires_at < datetime.utcnow():
+        # vencida y aún no purgada: se libera la clave
+        db.session.delete(record)
+        db.session.flush()
+        return None
+
+    return record
+
+
+def _replay(record):
+    if record.endpoint != request.endpoint:
+        return _reject("La clave de idempotencia ya se usó en otra operación.", 422)
+
+    if record.status_code is None:
+        return _reject("La operación se está procesando. Intenta de nuevo en unos segundos.", 409)
+
+    if record.status_code in REDIRECT_CODES and record.location:
+        if not request.is_json:
+            flash("Esta operación ya se había registrado.", "info")
+        return redirect(record.location, code=record.status_code)
+
+    if record.body is None and not record.location:
+        # respuesta demasiado grande para guardarla: la operación sí se hizo
+        return _reject("La operación ya se había registrado, pero su respuesta no se guardó.", 409)
+
+    response = make_response(record.body or "", record.status_code)
+    if record.mimetype:
+        response.mimetype = record.mimetype
+    if record.location:
+        response.headers["Location"] = record.location
+    response.headers["Idempotent-Replay"] = "true"
+    return response
+
+
+def _reject(message: str, status: int):
+    if request.is_json or request.headers.get("Idempotency-Key"):
+        return jsonify(error=message), status
+    flash(message, "warning")
+    return redirect(request.referrer or url_for("main.dashboard"))
+
+
+def idempotent(view=None, on_replay=None):
+    """POST idempotente por clave (header Idempotency-Key o campo idempotency_key).
+
+    La clave se reserva en la misma transacción de la vista: si la vista hace
+    commit, la clave queda registrada junto con la venta/movimiento; si hace
+    rollback, la clave queda libre para reintentar. Un reintento con la misma
+    clave devuelve la respuesta original con una sola búsqueda por índice;
+    si el cuerpo pasaba de MAX_STORED_BODY y no había Location, devuelve 409.
+
+    `on_replay` se llama al devolver una respuesta repetida (p. ej. para
+    limpiar el carrito de la sesión, que el reintento no recibió).
+    """
+    if view is None:
+        return lambda v: idempotent(v, on_replay=on_replay)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _request_key()
+        if not key or not current_user.is_authenticated:
+            return view(*args, **kwargs)
+
+        record = _lookup(key)
+        if record:
+            if on_replay and record.endpoint == request.endpoint:
+                on_replay()
+            return _replay(record)
+
+        ttl = timedelta(hours=current_app.config.get("IDEMPOTENCY_TTL_HOURS", 24))
+        record = IdempotencyKey(
+            business_id=current_user.business_id,
+            key=key,
+            endpoint=request.endpoint,
+            expires_at=datetime.utcnow() + ttl
+        )
+        db.session.add(record)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # request gemelo concurrente: ya reservó la clave
+            db.session.rollback()
+            record = _lookup(key)
+            return _replay(record) if record else _reject("Reintenta la operación.", 409)
+
+        response = make_response(view(*args, **kwargs))
+
+        # si la vista hizo rollback, la reserva ya no existe
+        if inspect(record).persistent and response.status_code < 500:
+            record.status_code = response.status_code
+            record.location = response.headers.get("Location", "")[:255] or None
+            if response.status_code not in REDIRECT_CODES and (
+                response.content_length is None or response.content_length <= MAX_STORED_BODY
+            ):
+                body = response.get_data(as_text=True)
+                if len(body) <= MAX_STORED_BODY:
+                    record.mimetype = response.mimetype
+                    record.body = body
+            db.session.commit()
+
+        return response
+
+    return wrapper
+
+
+def purge_expired(now: datetime = None) -> int:
+    deleted = IdempotencyKey.query.filter(
+        IdempotencyKey.expires_at < (now or datetime.utcnow())
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+@idempotency_cli.command("purge")
+def purge_command():
+    """Borra las claves vencidas (correr diario)."""
+    click.echo(f"Claves borradas: {purge_expired()}")
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 inventory_bp = Blueprint("inventory", __name__, url_prefix="/inventory")
 
-from . import routes  # noqa
+from . import routes, commands  # noqa
@@ -0,0 +1,78 @@
+from datetime import datetime
+import click
+from sqlalchemy.exc import IntegrityError
+
+from . import inventory_bp
+from ..extensions import db
+from ..models import Business
+from .kardex import take_snapshots, verify_business
+from .valuation import close_month
+
+
+@inventory_bp.cli.command("snapshot")
+@click.option("--business-id", type=int, default=None, help="Solo este negocio (por defecto: todos).")
+@click.option("--every", type=int, default=1, show_default=True,
+              help="Mínimo de movimientos desde el último snapshot para crear uno nuevo.")
+@click.option("--at", "at_str", default=None, help="Fecha de corte YYYY-MM-DD (por defecto: ahora).")
+def snapshot_command(business_id, every, at_str):
+    """Crea checkpoints de stock por producto (correr diario)."""
+    at = None
+    if at_str:
+        at = datetime.strptime(at_str, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+
+    created = take_snapshots(business_id=business_id, at=at, every=every)
+    click.echo(f"Snapshots creados: {created}")
+
+
+@inventory_bp.cli.command("verify")
+@click.option("--business-id", type=int, default=None, help="Solo este negocio (por defecto: todos).")
+@click.option("--full", is_flag=True, help="Ignora el checkpoint y revisa todo el kardex.")
+def verify_command(business_id, full):
+    """Verifica la continuidad del kardex desde el último checkpoint."""
+    query = db.session.query(Business.id, Business.name).order_by(Business.id)
+    if business_id:
+        query = query.filter(Business.id == business_id)
+
+    total = 0
+    for bid, name in query.all():
+        issues = verify_business(bid, full=full)
+        total += len(issues)
+        if not issues:
+            continue
+
+        click.echo(f"Negocio #{bid} {name}: {len(issues)} incidencias")
+        for i in issues:
+            click.echo(
+                f"  [{i.kind}] producto #{i.product_id} movimiento #{i.movement_id or '-'}: "
+                f"esperado {i.expected}, encontrado {i.found}"
+            )
+
+    click.echo(f"Incidencias nuevas: {total}")
+
+
+@inventory_bp.cli.command("close-valuation")
+@click.option("--business-id", type=int, default=None, help="Solo este negocio (por defecto: todos).")
+@click.option("--month", default=None, help="Mes YYYY-MM (por defecto: el mes anterior).")
+def close_valuation_command(business_id, month):
+    """Guarda la valuación FIFO/promedio de un mes cerrado (correr a inicio de mes)."""
+    if month:
+        datetime.strptime(month, "%Y-%m")
+    else:
+        first = datetime.utcnow().replace(day=1)
+        month = (first.replace(year=first.year - 1, month=12) if first.month == 1
+                 else first.replace(month=first.month - 1)).strftime("%Y-%m")
+
+    query = db.session.query(Business.id).order_by(Business.id)
+    if business_id:
+        query = query.filter(Business.id == business_id)
+
+    total = 0
+    for (bid,) in query.all():
+        try:
+            total += close_month(bid, month)
+            db.session.commit()
+        except IntegrityError:
+            # otro proceso ya guardó este mes
+            db.session.rollback()
+
+    click.echo(f"Valuación {month}: {total} filas guardadas")
@@ -0,0 +1,356 @@
+from datetime import datetime
+import math
+from sqlalchemy import func, or_
+from sqlalchemy.orm import aliased
+
+from ..archive import movements_for
+from ..extensions import db
+from ..models import (
+    Business, Product, InventoryMovement, LocationStock, StockSnapshot, KardexCheckpoint, KardexIssue
+)
+from .locations import apply_stock, resolve_location, stock_rows
+
+
+class MovementError(Exception):
+    """Movimiento inválido; el mensaje es para el usuario."""
+
+    def __init__(self, message: str, category: str = "danger"):
+        super().__init__(message)
+        self.category = category
+
+
+def register_movement(product: Product, movement_type: str, qty: int, user_id: int,
+                      note: str = None, unit_cost=None, location_id=None) -> InventoryMovement:
+    """Aplica un movimiento manual de kardex (in/out/adjust) al producto en una
+    ubicación (la por defecto si no se indica) y lo registra. En "adjust", `qty`
+    es el NUEVO stock de esa ubicación. No hace commit.
+    """
+    if movement_type not in {"in", "out", "adjust"}:
+        raise MovementError("Tipo de movimiento inválido.")
+
+    # opcional: si está inactivo, permitir solo ajustes/entradas
+    if not bool(getattr(product, "is_active", True)) and movement_type == "out":
+        raise MovementError("Producto inactivo. Actívalo para poder dar salida.", "warning")
+
+    if qty is None or qty <= 0:
+        raise MovementError("Cantidad inválida. Debe ser mayor que 0.")
+
+    location = resolve_location(product.business_id, location_id)
+    if location is None:
+        raise MovementError("Ubicación inválida.")
+
+    row = stock_rows(product.business_id, location.id, [product.id])[product.id]
+    before = int(row.stock or 0)
+
+    # calcular stock_after (de la ubicación)
+    if movement_type == "in":
+        after = before + qty
+        movement_qty = qty
+    elif movement_type == "out":
+        after = before - qty
+        if after < 0:
+            raise MovementError("No puedes sacar más de lo que hay en stock.", "warning")
+        movement_qty = qty
+    else:
+        # adjust: qty se interpreta como NUEVO STOCK
+        after = qty
+        movement_qty = abs(after - before) if after != before else 0
+
+    if movement_type == "adjust" and movement_qty == 0:
+        raise MovementError("El ajuste no cambió el stock.", "info")
+
+    if unit_cost is not None and not math.isfinite(unit_cost):
+        raise MovementError("Costo inválido.")
+
+    if unit_cost is not None and unit_cost < 0:
+        raise MovementError("El costo no puede ser negativo.")
+
+    # el costo solo aplica a lo que entra al inventario
+    if after <= before:
+        unit_cost = None
+
+    # actualizar stock (ubicación + total del producto) y guardar movimiento
+    movement = InventoryMovement(
+        business_id=product.business_id,
+        product_id=product.id,
+        user_id=user_id,
+        movement_type=movement_type,
+        quantity=movement_qty,
+        unit_cost=unit_cost,
+        note=note or None,
+        created_at=datetime.utcnow(),
+        **apply_stock(product, row, after - before)
+    )
+    db.session.add(movement)
+    return movement
+
+
+def transfer_stock(product: Product, source_id, target_id, qty: int, user_id: int,
+                   note: str = None) -> tuple:
+    """Traspasa `qty` unidades entre dos ubicaciones: un transfer_out y un
+    transfer_in enlazados, en la misma transacción. El stock total del
+    producto no cambia (la valuación no los ve). No hace commit.
+    """
+    if qty is None or qty <= 0:
+        raise MovementError("Cantidad inválida. Debe ser mayor que 0.")
+
+    source = resolve_location(product.business_id, source_id)
+    target = resolve_location(product.business_id, target_id)
+    if source is None or target is None:
+        raise MovementError("Ubicación inválida.")
+    if source.id == target.id:
+        raise MovementError("El origen y el destino deben ser distintos.", "warning")
+
+    source_row = stock_rows(product.business_id, source.id, [product.id])[product.id]
+    target_row = stock_rows(product.business_id, target.id, [product.id])[product.id]
+    if int(source_row.stock or 0) < qty:
+        raise MovementError(f"Stock insuficiente en {source.name}.", "warning")
+
+    now = datetime.utcnow()
+    note = note or f"Traspaso {source.name} → {target.name}"
+
+    moves = []
+    for row, movement_type, delta in ((source_row, "transfer_out", -qty), (target_row, "transfer_in", qty)):
+        movement = InventoryMovement(
+            business_id=product.business_id,
+            product_id=product.id,
+            user_id=user_id,
+            movement_type=movement_type,
+            quantity=qty,
+            note=note,
+            created_at=now,
+            **apply_stock(product, row, delta, total=False)
+        )
+        db.session.add(movement)
+        moves.append(movement)
+
+    db.session.flush()
+    moves[0].transfer_pair_id, moves[1].transfer_pair_id = moves[1].id, moves[0].id
+    return tuple(moves)
+
+
+def _latest_snapshots(business_id: int, at: datetime):
+    # último snapshot <= at por producto (uno por producto)
+    ranked = db.session.query(
+        StockSnapshot.product_id,
+        StockSnapshot.stock,
+        StockSnapshot.movement_id,
+        StockSnapshot.taken_at,
+        func.row_number().over(
+            partition_by=StockSnapshot.product_id,
+            order_by=(StockSnapshot.taken_at.desc(), StockSnapshot.id.desc())
+        ).label("rn")
+    ).filter(
+        StockSnapshot.business_id == business_id,
+        StockSnapshot.taken_at <= at
+    ).subquery()
+
+    return db.session.query(ranked).filter(ranked.c.rn == 1).subquery()
+
+
+def stock_state_at(business_id: int, at: datetime) -> dict:
+    """Estado del kardex por producto a la fecha `at`.
+
+    Devuelve {product_id: (stock, movement_id, tail_count)}, donde tail_count es
+    el número de movimientos posteriores al snapshot usado (0 si no hubo).
+    Solo lee el snapshot más cercano y la cola de movimientos hasta `at`.
+    """
+    snap = _latest_snapshots(business_id, at)
+
+    snaps = db.session.query(snap.c.product_id, snap.c.stock, snap.c.movement_id, snap.c.taken_at).all()
+    state = {r.product_id: (int(r.stock), r.movement_id, 0) for r in snaps}
+
+    # la cola empieza en el snapshot más antiguo usado; si algún producto no
+    # tiene snapshot hay que leer desde el principio (archivo incluido)
+    products = db.session.query(func.count(Product.id)).filter(Product.business_id == business_id).scalar()
+    oldest = min((r.taken_at for r in snaps), default=None) if len(snaps) >= products else None
+    moves = movements_for(oldest)
+
+    tail = db.session.query(
+        moves.id,
+        moves.product_id,
+        moves.stock_after,
+        func.row_number().over(
+            partition_by=moves.product_id,
+            order_by=(moves.created_at.desc(), moves.id.desc())
+        ).label("rn"),
+        func.count().over(partition_by=moves.product_id).label("tail_count")
+    ).outerjoin(
+        snap, snap.c.product_id == moves.product_id
+    ).filter(
+        moves.business_id == business_id,
+        moves.created_at <= at,
+        or_(snap.c.taken_at.is_(None), moves.created_at > snap.c.taken_at)
+    ).subquery()
+
+    for r in db.session.query(tail).filter(tail.c.rn == 1):
+        state[r.product_id] = (int(r.stock_after), r.id, int(r.tail_count))
+
+    return state
+
+
+def stock_at(business_id: int, at: datetime) -> dict:
+    """Stock por producto a la fecha `at` ({product_id: stock}).
+
+    Productos sin movimientos ni snapshot hasta esa fecha no aparecen.
+    """
+    return {pid: st[0] for pid, st in stock_state_at(business_id, at).items()}
+
+
+def take_snapshots(business_id: int = None, at: datetime = None, every: int = 1) -> int:
+    """Guarda un snapshot para cada producto con al menos `every` movimientos
+    desde su último snapshot. Pensado para correr diario (cron/CLI).
+
+    Devuelve cuántos snapshots se crearon.
+    """
+    at = at or datetime.utcnow()
+    every = max(int(every or 1), 1)
+
+    if business_id:
+        business_ids = [business_id]
+    else:
+        business_ids = [bid for (bid,) in db.session.query(Business.id).order_by(Business.id)]
+
+    created = 0
+    for bid in business_ids:
+        for product_id, (stock, movement_id, tail_count) in stock_state_at(bid, at).items():
+            if tail_count < every:
+                continue
+
+            db.session.add(StockSnapshot(
+                business_id=bid,
+                product_id=product_id,
+                stock=stock,
+                movement_id=movement_id,
+                taken_at=at
+            ))
+            created += 1
+
+        # commit por negocio: lotes pequeños y sin transacciones largas
+        db.session.commit()
+
+    return created
+
+
+def _last_verified_stock(business_id: int, last_movement_id: int) -> dict:
+    # stock_after del último movimiento ya verificado, solo para los productos
+    # que tienen movimientos nuevos desde el checkpoint
+    new_moves = aliased(InventoryMovement)
+    touched = db.session.query(new_moves.product_id).filter(
+        new_moves.business_id == business_id,
+        new_moves.id > last_movement_id
+    )
+
+    ranked = db.session.query(
+        InventoryMovement.product_id,
+        InventoryMovement.stock_after,
+        func.row_number().over(
+            partition_by=InventoryMovement.product_id,
+            order_by=(InventoryMovement.created_at.desc(), InventoryMovement.id.desc())
+        ).label("rn")
+    ).filter(
+        InventoryMovement.business_id == business_id,
+        InventoryMovement.id <= last_movement_id,
+        InventoryMovement.product_id.in_(touched)
+    ).subquery()
+
+    return {
+        r.product_id: int(r.stock_after)
+        for r in db.session.query(ranked).filter(ranked.c.rn == 1)
+    }
+
+
+def verify_business(business_id: int, full: bool = False) -> list:
+    """Verifica la continuidad del kardex de un negocio.
+
+    Solo revisa los movimientos posteriores al último checkpoint (o todos si
+    `full`), y compara el stock resultante con Product.stock. Guarda las
+    incidencias en KardexIssue y devuelve las nuevas.
+    """
+    cp = KardexCheckpoint.query.filter_by(business_id=business_id).first()
+    if not cp:
+        cp = KardexCheckpoint(business_id=business_id, last_movement_id=0)
+        db.session.add(cp)
+
+    last_id = 0 if full else int(cp.last_movement_id or 0)
+    if full:
+        KardexIssue.query.filter_by(business_id=business_id, kind="gap").delete()
+
+    prev = _last_verified_stock(business_id, last_id) if last_id else {}
+    issues = []
+    max_id = last_id
+
+    rows = db.session.query(
+        InventoryMovement.id,
+        InventoryMovement.product_id,
+        InventoryMovement.stock_before,
+        InventoryMovement.stock_after
+    ).filter(
+        InventoryMovement.business_id == business_id,
+        InventoryMovement.id > last_id
+    ).order_by(
+        InventoryMovement.product_id,
+        InventoryMovement.created_at,
+        InventoryMovement.id
+    ).yield_per(1000)
+
+    for r in rows:
+        expected = prev.get(r.product_id)
+        if expected is not None and int(r.stock_before) != expected:
+            issues.append(KardexIssue(
+                business_id=business_id,
+                product_id=r.product_id,
+                movement_id=r.id,
+                kind="gap",
+                expected=expected,
+                found=int(r.stock_before)
+            ))
+
+        prev[r.product_id] = int(r.stock_after)
+        max_id = max(max_id, r.id)
+
+    # stock actual (snapshot + cola) contra Product.stock; es estado actual,
+    # así que reemplaza las incidencias anteriores de este tipo
+    KardexIssue.query.filter_by(business_id=business_id, kind="stock_mismatch").delete()
+    KardexIssue.query.filter_by(business_id=business_id, kind="location_total").delete()
+    state = stock_state_at(business_id, datetime.utcnow())
+
+    # Product.stock debe ser la suma de sus ubicaciones
+    location_totals = dict(db.session.query(
+        LocationStock.product_id, func.sum(LocationStock.stock)
+    ).filter(
+        LocationStock.business_id == business_id
+    ).group_by(LocationStock.product_id).all())
+
+    products = db.session.query(Product.id, Product.stock).filter(
+        Product.business_id == business_id
+    )
+    for product_id, stock in products:
+        kardex_stock, movement_id, _ = state.get(product_id, (0, None, 0))
+        if int(stock or 0) != kardex_stock:
+            issues.append(KardexIssue(
+                business_id=business_id,
+                product_id=product_id,
+                movement_id=movement_id,
+                kind="stock_mismatch",
+                expected=kardex_stock,
+                found=int(stock or 0)
+            ))
+
+        location_total = int(location_totals.get(product_id) or 0)
+        if int(stock or 0) != location_total:
+            issues.append(KardexIssue(
+                business_id=business_id,
+                product_id=product_id,
+                movement_id=movement_id,
+                kind="location_total",
+                expected=int(stock or 0),
+                found=location_total
+            ))
+
+    db.session.add_all(issues)
+    cp.last_movement_id = max_id
+    cp.checked_at = datetime.utcnow()
+    db.session.commit()
+
+    return issues
@@ -0,0 +1,123 @@
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import Location, LocationStock, Product
+
+DEFAULT_LOCATION_NAME = "Principal"
+
+
+class LocationError(Exception):
+    """Ubicación inválida; el mensaje es para el usuario."""
+
+
+def default_location(business_id: int) -> Location:
+    """Ubicación por defecto del negocio (la crea si falta). No hace commit."""
+    location = Location.query.filter_by(business_id=business_id, is_default=True).first()
+    if location is None:
+        location = Location(business_id=business_id, name=DEFAULT_LOCATION_NAME, is_default=True)
+        db.session.add(location)
+        db.session.flush()
+    return location
+
+
+def create_location(business_id: int, name: str) -> Location:
+    """Alta de una ubicación (bodega, sucursal...). No hace commit."""
+    name = (name or "").strip()[:80]
+    if not name:
+        raise LocationError("El nombre es obligatorio.")
+
+    # la por defecto siempre existe antes que las demás
+    default_location(business_id)
+
+    location = Location(business_id=business_id, name=name)
+    try:
+        with db.session.begin_nested():
+            db.session.add(location)
+    except IntegrityError:
+        # uq_location_business_name
+        raise LocationError("Ya existe una ubicación con ese nombre.")
+    return location
+
+
+def business_locations(business_id: int) -> list:
+    """Ubicaciones activas, la de por defecto primero."""
+    return Location.query.filter_by(
+        business_id=business_id,
+        is_active=True
+    ).order_by(Location.is_default.desc(), Location.name.asc()).all()
+
+
+def resolve_location(business_id: int, location_id=None):
+    """La ubicación pedida (activa y del negocio) o la por defecto si no se indica.
+    None si `location_id` no es válida."""
+    if not location_id:
+        return default_location(business_id)
+    try:
+        location_id = int(location_id)
+    except (TypeError, ValueError):
+        return None
+    return Location.query.filter_by(id=location_id, business_id=business_id, is_active=True).first()
+
+
+def stock_rows(business_id: int, location_id: int, product_ids) -> dict:
+    """{product_id: LocationStock} en una consulta por PK; crea en la sesión
+    (stock 0) las filas que falten."""
+    ids = {int(pid) for pid in product_ids}
+    if not ids:
+        return {}
+
+    rows = {
+        r.product_id: r for r in LocationStock.query.filter(
+            LocationStock.business_id == business_id,
+            LocationStock.location_id == location_id,
+            LocationStock.product_id.in_(ids)
+        )
+    }
+    for pid in ids - rows.keys():
+        rows[pid] = LocationStock(business_id=business_id, location_id=location_id, product_id=pid, stock=0)
+        db.session.add(rows[pid])
+    return rows
+
+
+def location_stock_map(business_id: int, location_id: int) -> dict:
+    """{product_id: stock} de una ubicación (pantalla de venta)."""
+    return dict(db.session.query(LocationStock.product_id, LocationStock.stock).filter(
+        LocationStock.business_id == business_id,
+        LocationStock.location_id == location_id
+    ).all())
+
+
+def stock_by_location(business_id: int) -> dict:
+    """{product_id: {location_id: stock}} del negocio, filas con stock distinto de 0."""
+    result = {}
+    rows = db.session.query(LocationStock.product_id, LocationStock.location_id, LocationStock.stock).filter(
+        LocationStock.business_id == business_id,
+        LocationStock.stock != 0
+    )
+    for product_id, location_id, stock in rows:
+        result.setdefault(product_id, {})[location_id] = stock
+    return result
+
+
+def apply_stock(product: Product, row: LocationStock, delta: int, total: bool = True) -> dict:
+    """Mueve el stock de la ubicación y, con `total`, el del producto (la suma
+    de sus ubicaciones). Devuelve los antes/después para el movimiento de kardex."""
+    before = int(product.stock or 0)
+    after = before + delta if total else before
+    location_before = int(row.stock or 0)
+
+    row.stock = location_before + delta
+    product.stock = after
+
+    return {
+        "stock_before": before,
+        "stock_after": after,
+        "location_id": row.location_id,
+        "location_stock_before": location_before,
+        "location_stock_after": location_before + delta,
+    }
+
+
+def stock_at_location(business_id: int, location_id: int, product_id: int) -> int:
+    row = db.session.get(LocationStock, (business_id, location_id, product_id))
+    return int(row.stock) if row else 0
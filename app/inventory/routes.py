@@ -5,20 +5,42 @@ import csv
 from io import StringIO
 
 from . import inventory_bp
+from ..archive import archive_boundary, movements_for
 from ..extensions import db
-from ..models import Product, InventoryMovement
+from ..idempotency import idempotent
+from ..database import use_replica, write_transaction
+from ..models import Location, Product, InventoryMovement
+from .kardex import MovementError, register_movement, stock_at, transfer_stock
+from .locations import LocationError, business_locations, create_location, stock_by_location
+from .valuation import valuate_month
+
+
+MOVEMENT_TYPES = {"in", "out", "adjust", "transfer_out", "transfer_in"}
 
 
 def _same_business(product: Product) -> bool:
     return product.business_id == current_user.business_id
 
 
+def _int_or_blank(value):
+    # movimientos archivados antes de las ubicaciones pueden no tenerlas
+    return "" if value is None else int(value)
+
+
+def _location_names() -> dict:
+    # incluye las desactivadas: el historial las sigue mostrando
+    return dict(db.session.query(Location.id, Location.name).filter(
+        Location.business_id == current_user.business_id
+    ).all())
+
+
 @inventory_bp.get("/")
 @login_required
 def movements_home():
     # filtros
     product_id = request.args.get("product_id", type=int)
-    movement_type = (request.args.get("movement_type") or "").strip()  # in/out/adjust
+    movement_type = (request.args.get("movement_type") or "").strip()  # in/out/adjust/transfer_*
+    location_id = request.args.get("location_id", type=int)
     limit = request.args.get("limit", default=200, type=int)
 
     if limit not in (50, 100, 200, 500):
@@ -31,9 +53,12 @@ def movements_home():
     if product_id:
         q = q.filter(InventoryMovement.product_id == product_id)
 
-    if movement_type in {"in", "out", "adjust"}:
+    if movement_type in MOVEMENT_TYPES:
         q = q.filter(InventoryMovement.movement_type == movement_type)
 
+    if location_id:
+        q = q.filter(InventoryMovement.location_id == location_id)
+
     movements = q.order_by(InventoryMovement.created_at.desc()).limit(limit).all()
 
     products = Product.query.filter_by(
@@ -44,19 +69,26 @@ def movements_home():
         "inventory/movements.html",
         movements=movements,
         products=products,
+        locations=business_locations(current_user.business_id),
+        location_names=_location_names(),
         product_id=product_id,
         movement_type=movement_type,
+        location_id=location_id,
         limit=limit
     )
 
 
 @inventory_bp.post("/move")
 @login_required
+@idempotent
+@write_transaction
 def create_movement():
     product_id = request.form.get("product_id", type=int)
     movement_type = (request.form.get("movement_type") or "").strip()
     qty = request.form.get("quantity", type=int)
     note = (request.form.get("note") or "").strip()[:255]
+    unit_cost = request.form.get("unit_cost", type=float)
+    location_id = request.form.get("location_id", type=int)
 
     if movement_type not in {"in", "out", "adjust"}:
         flash("Tipo de movimiento inválido.", "danger")
@@ -70,94 +102,145 @@ def create_movement():
     if not _same_business(product):
         abort(403)
 
-    # opcional: si está inactivo, permitir solo ajustes/entradas
-    if not bool(getattr(product, "is_active", True)) and movement_type == "out":
-        flash("Producto inactivo. Actívalo para poder dar salida.", "warning")
+    try:
+        register_movement(product, movement_type, qty, current_user.id, note=note, unit_cost=unit_cost,
+                          location_id=location_id)
+    except MovementError as e:
+        db.session.rollback()
+        flash(str(e), e.category)
         return redirect(url_for("inventory.movements_home", product_id=product_id))
 
-    if qty is None or qty <= 0:
-        flash("Cantidad inválida. Debe ser mayor que 0.", "danger")
-        return redirect(url_for("inventory.movements_home", product_id=product_id))
+    db.session.commit()
 
-    before = int(product.stock or 0)
-
-    # calcular stock_after
-    if movement_type == "in":
-        after = before + qty
-        movement_qty = qty
-    elif movement_type == "out":
-        after = before - qty
-        if after < 0:
-            flash("No puedes sacar más de lo que hay en stock.", "warning")
-            return redirect(url_for("inventory.movements_home", product_id=product_id))
-        movement_qty = qty
-    else:
-        # adjust: qty se interpreta como NUEVO STOCK
-        after = qty
-        movement_qty = abs(after - before) if after != before else 0
-
-    if movement_type == "adjust" and movement_qty == 0:
-        flash("El ajuste no cambió el stock.", "info")
-        return redirect(url_for("inventory.movements_home", product_id=product_id))
+    flash("Movimiento registrado ✅", "success")
+    return redirect(url_for("inventory.movements_home", product_id=product_id))
 
-    # actualizar stock y guardar movimiento
-    product.stock = after
 
-    movement = InventoryMovement(
-        business_id=current_user.business_id,
-        product_id=product.id,
-        user_id=current_user.id,
-        movement_type=movement_type,
-        quantity=movement_qty,
-        stock_before=before,
-        stock_after=after,
-        note=note or None,
-        created_at=datetime.utcnow(),
+@inventory_bp.get("/locations")
+@login_required
+def locations_home():
+    business_id = current_user.business_id
+
+    products = Product.query.filter_by(
+        business_id=business_id
+    ).order_by(Product.name.asc()).all()
+
+    return render_template(
+        "inventory/locations.html",
+        locations=business_locations(business_id),
+        products=products,
+        stock=stock_by_location(business_id)
     )
 
-    db.session.add(movement)
+
+@inventory_bp.post("/locations")
+@login_required
+@write_transaction
+def create_location_post():
+    try:
+        location = create_location(current_user.business_id, request.form.get("name"))
+    except LocationError as e:
+        db.session.rollback()
+        flash(str(e), "danger")
+        return redirect(url_for("inventory.locations_home"))
+
     db.session.commit()
+    flash(f"Ubicación {location.name} creada ✅", "success")
+    return redirect(url_for("inventory.locations_home"))
 
-    flash("Movimiento registrado ✅", "success")
-    return redirect(url_for("inventory.movements_home", product_id=product_id))
+
+@inventory_bp.post("/transfer")
+@login_required
+@idempotent
+@write_transaction
+def create_transfer():
+    product_id = request.form.get("product_id", type=int)
+    qty = request.form.get("quantity", type=int)
+    note = (request.form.get("note") or "").strip()[:255]
+
+    if not product_id:
+        flash("Selecciona un producto.", "danger")
+        return redirect(url_for("inventory.locations_home"))
+
+    product = Product.query.get_or_404(product_id)
+    if not _same_business(product):
+        abort(403)
+
+    try:
+        transfer_stock(
+            product,
+            request.form.get("source_id", type=int),
+            request.form.get("target_id", type=int),
+            qty,
+            current_user.id,
+            note=note
+        )
+    except MovementError as e:
+        db.session.rollback()
+        flash(str(e), e.category)
+        return redirect(url_for("inventory.locations_home"))
+
+    db.session.commit()
+
+    flash("Traspaso registrado ✅", "success")
+    return redirect(url_for("inventory.locations_home"))
 
 
 @inventory_bp.get("/export/csv")
 @login_required
+@use_replica
 def export_movements_csv():
     product_id = request.args.get("product_id", type=int)
     movement_type = (request.args.get("movement_type") or "").strip()
+    location_id = request.args.get("location_id", type=int)
     limit = request.args.get("limit", default=500, type=int)
 
     if limit not in (100, 200, 500, 1000):
         limit = 500
 
-    q = db.session.query(
-        InventoryMovement.created_at,
-        InventoryMovement.movement_type,
-        InventoryMovement.quantity,
-        InventoryMovement.stock_before,
-        InventoryMovement.stock_after,
-        InventoryMovement.note,
-        Product.name.label("product_name")
-    ).join(
-        Product, Product.id == InventoryMovement.product_id
-    ).filter(
-        InventoryMovement.business_id == current_user.business_id
-    )
-
-    if product_id:
-        q = q.filter(InventoryMovement.product_id == product_id)
-
-    if movement_type in {"in", "out", "adjust"}:
-        q = q.filter(InventoryMovement.movement_type == movement_type)
-
-    rows = q.order_by(InventoryMovement.created_at.desc()).limit(limit).all()
+    def movement_rows(moves):
+        q = db.session.query(
+            moves.created_at,
+            moves.movement_type,
+            moves.quantity,
+            moves.stock_before,
+            moves.stock_after,
+            moves.location_id,
+            moves.location_stock_before,
+            moves.location_stock_after,
+            moves.note,
+            Product.name.label("product_name")
+        ).join(
+            Product, Product.id == moves.product_id
+        ).filter(
+            moves.business_id == current_user.business_id
+        )
+
+        if product_id:
+            q = q.filter(moves.product_id == product_id)
+
+        if movement_type in MOVEMENT_TYPES:
+            q = q.filter(moves.movement_type == movement_type)
+
+        if location_id:
+            q = q.filter(moves.location_id == location_id)
+
+        return q.order_by(moves.created_at.desc()).limit(limit).all()
+
+    # los últimos `limit` suelen estar en la tabla caliente; si no alcanzan,
+    # se lee también el archivo
+    rows = movement_rows(InventoryMovement)
+    if len(rows) < limit and archive_boundary() is not None:
+        rows = movement_rows(movements_for(None))
 
     output = StringIO()
     writer = csv.writer(output)
-    writer.writerow(["fecha", "tipo", "producto", "cantidad", "stock_antes", "stock_despues", "nota"])
+    writer.writerow([
+        "fecha", "tipo", "producto", "cantidad", "stock_antes", "stock_despues",
+        "ubicacion", "stock_ubicacion_antes", "stock_ubicacion_despues", "nota"
+    ])
 
+    location_names = _location_names()
     for r in rows:
         writer.writerow([
             r.created_at.strftime("%Y-%m-%d %H:%M:%S"),
@@ -166,6 +249,9 @@ def export_movements_csv():
             int(r.quantity),
             int(r.stock_before),
             int(r.stock_after),
+            location_names.get(r.location_id, ""),
+            _int_or_blank(r.location_stock_before),
+            _int_or_blank(r.location_stock_after),
             r.note or ""
         ])
 
@@ -174,3 +260,86 @@ def export_movements_csv():
         mimetype="text/csv",
         headers={"Content-Disposition": f"attachment; filename=kardex_{datetime.utcnow().date()}.csv"}
     )
+
+
+@inventory_bp.get("/export/stock-at")
+@login_required
+@use_replica
+def export_stock_at_csv():
+    # formato esperado: YYYY-MM-DD (stock al cierre de ese día)
+    date_str = request.args.get("date", "")
+
+    try:
+        at = datetime.strptime(date_str, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+    except ValueError:
+        flash("Fecha inválida.", "danger")
+        return redirect(url_for("inventory.movements_home"))
+
+    stock_map = stock_at(current_user.business_id, at)
+
+    products = Product.query.filter_by(
+        business_id=current_user.business_id
+    ).order_by(Product.name.asc()).all()
+
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["producto", "stock", "precio", "valor_venta"])
+
+    for p in products:
+        stock = stock_map.get(p.id, 0)
+        writer.writerow([
+            p.name,
+            stock,
+            f"{float(p.price):.2f}",
+            f"{float(p.price) * stock:.2f}"
+        ])
+
+    return Response(
+        output.getvalue(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=stock_{date_str}.csv"}
+    )
+
+
+@inventory_bp.get("/export/valuation")
+@login_required
+@use_replica
+def export_valuation_csv():
+    # formato esperado: YYYY-MM
+    period = request.args.get("month", "")
+
+    try:
+        datetime.strptime(period, "%Y-%m")
+    except ValueError:
+        flash("Mes inválido.", "danger")
+        return redirect(url_for("inventory.movements_home"))
+
+    rows = valuate_month(current_user.business_id, period)
+
+    names = dict(db.session.query(Product.id, Product.name).filter(
+        Product.business_id == current_user.business_id
+    ).all())
+
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow([
+        "producto", "stock", "costo_promedio", "valor_promedio", "valor_fifo",
+        "costo_ventas_promedio", "costo_ventas_fifo"
+    ])
+
+    for r in rows:
+        writer.writerow([
+            names.get(r["product_id"], f"#{r['product_id']}"),
+            r["stock"],
+            f"{r['avg_cost']:.4f}",
+            f"{r['value_avg']:.2f}",
+            f"{r['value_fifo']:.2f}",
+            f"{r['cogs_avg']:.2f}",
+            f"{r['cogs_fifo']:.2f}"
+        ])
+
+    return Response(
+        output.getvalue(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=valuacion_{period}.csv"}
+    )
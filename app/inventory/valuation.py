@@ -0,0 +1,223 @@
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+import json
+
+from sqlalchemy import func
+
+from ..archive import movements_for
+from ..extensions import db
+from ..models import ValuationPeriod
+
+CENT = Decimal("0.01")
+COST_PLACES = Decimal("0.0001")
+
+
+class _ProductCost:
+    """Estado de costo de un producto mientras se recorre su kardex.
+
+    Promedio ponderado: stock + costo promedio (memoria constante).
+    FIFO: capas abiertas (cantidad, costo) en orden de entrada.
+    """
+
+    __slots__ = ("stock", "avg_cost", "layers", "cogs_avg", "cogs_fifo")
+
+    def __init__(self, stock=0, avg_cost=Decimal("0"), layers=None):
+        self.stock = int(stock)
+        self.avg_cost = Decimal(avg_cost)
+        self.layers = deque(layers or [])
+        self.cogs_avg = Decimal("0")
+        self.cogs_fifo = Decimal("0")
+
+    def receive(self, qty: int, unit_cost):
+        cost = self.avg_cost if unit_cost is None else Decimal(unit_cost)
+
+        total_qty = self.stock + qty
+        if total_qty > 0 and self.stock > 0:
+            self.avg_cost = (self.avg_cost * self.stock + cost * qty) / total_qty
+        else:
+            self.avg_cost = cost
+
+        self.stock = total_qty
+        self.layers.append([qty, cost])
+
+    def issue(self, qty: int, is_sale: bool):
+        fifo_cost = Decimal("0")
+        pending = qty
+        while pending > 0 and self.layers:
+            layer = self.layers[0]
+            used = min(pending, layer[0])
+            fifo_cost += layer[1] * used
+            layer[0] -= used
+            pending -= used
+            if layer[0] == 0:
+                self.layers.popleft()
+
+        # salida sin capas (kardex con huecos): se valora al promedio
+        fifo_cost += self.avg_cost * pending
+
+        if is_sale:
+            self.cogs_avg += self.avg_cost * qty
+            self.cogs_fifo += fifo_cost
+
+        self.stock -= qty
+
+    @property
+    def value_avg(self):
+        return self.avg_cost * max(self.stock, 0)
+
+    @property
+    def value_fifo(self):
+        return sum((c * q for q, c in self.layers), Decimal("0"))
+
+
+def _month_bounds(period: str):
+    start = datetime.strptime(period, "%Y-%m")
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+def _row(product_id: int, st: _ProductCost) -> dict:
+    return {
+        "product_id": product_id,
+        "stock": st.stock,
+        "avg_cost": st.avg_cost.quantize(COST_PLACES),
+        "value_avg": st.value_avg.quantize(CENT),
+        "value_fifo": st.value_fifo.quantize(CENT),
+        "cogs_avg": st.cogs_avg.quantize(CENT),
+        "cogs_fifo": st.cogs_fifo.quantize(CENT),
+        "layers": [[q, c] for q, c in st.layers],
+    }
+
+
+def _cached_rows(business_id: int, period: str) -> list:
+    rows = ValuationPeriod.query.filter_by(
+        business_id=business_id,
+        period=period
+    ).order_by(ValuationPeriod.product_id).all()
+
+    return [{
+        "product_id": r.product_id,
+        "stock": r.stock,
+        "avg_cost": Decimal(r.avg_cost),
+        "value_avg": Decimal(r.value_avg),
+        "value_fifo": Decimal(r.value_fifo),
+        "cogs_avg": Decimal(r.cogs_avg),
+        "cogs_fifo": Decimal(r.cogs_fifo),
+        "layers": [[q, Decimal(c)] for q, c in json.loads(r.fifo_layers)],
+    } for r in rows]
+
+
+def valuate_month(business_id: int, period: str) -> list:
+    """Valuación del inventario al cierre de `period` (YYYY-MM) y costo de
+    ventas del mes, por promedio ponderado y FIFO.
+
+    Solo lectura (sirve en réplica): usa el mes guardado por `close_month`
+    si existe; si no, lo calcula sin guardarlo.
+    """
+    return _cached_rows(business_id, period) or _compute_month(business_id, period)
+
+
+def close_month(business_id: int, period: str) -> int:
+    """Guarda la valuación de un mes ya cerrado para no recalcularla.
+
+    Devuelve cuántas filas agregó (0 si ya estaba guardado o el mes no ha
+    terminado). No hace commit; correr en la base principal.
+    """
+    if _month_bounds(period)[1] > datetime.utcnow():
+        return 0
+
+    exists = db.session.query(ValuationPeriod.product_id).filter_by(
+        business_id=business_id,
+        period=period
+    ).first()
+    if exists:
+        return 0
+
+    rows = _compute_month(business_id, period)
+    for r in rows:
+        db.session.add(ValuationPeriod(
+            business_id=business_id,
+            product_id=r["product_id"],
+            period=period,
+            stock=r["stock"],
+            avg_cost=r["avg_cost"],
+            value_avg=r["value_avg"],
+            value_fifo=r["value_fifo"],
+            cogs_avg=r["cogs_avg"],
+            cogs_fifo=r["cogs_fifo"],
+            fifo_layers=json.dumps([[q, str(c)] for q, c in r["layers"]]),
+        ))
+    return len(rows)
+
+
+def _compute_month(business_id: int, period: str) -> list:
+    # Parte del último mes cerrado en caché y recorre una sola vez los
+    # movimientos siguientes en orden (product_id, created_at).
+    start, end = _month_bounds(period)
+
+    # punto de partida: último mes cerrado y guardado antes de este
+    base_period = db.session.query(func.max(ValuationPeriod.period)).filter(
+        ValuationPeriod.business_id == business_id,
+        ValuationPeriod.period < period
+    ).scalar()
+
+    base = {}
+    stream_from = None
+    if base_period:
+        for r in _cached_rows(business_id, base_period):
+            base[r["product_id"]] = (r["stock"], r["avg_cost"], r["layers"])
+        stream_from = _month_bounds(base_period)[1]
+
+    # desde el mes base (o desde el principio): puede tocar meses archivados
+    moves = movements_for(stream_from)
+    q = db.session.query(
+        moves.product_id,
+        moves.movement_type,
+        moves.stock_before,
+        moves.stock_after,
+        moves.unit_cost,
+        moves.created_at
+    ).filter(
+        moves.business_id == business_id,
+        moves.created_at < end
+    )
+    if stream_from:
+        q = q.filter(moves.created_at >= stream_from)
+
+    q = q.order_by(
+        moves.product_id,
+        moves.created_at,
+        moves.id
+    ).yield_per(2000)
+
+    rows = []
+    current_id = None
+    st = None
+
+    for m in q:
+        if m.product_id != current_id:
+            if st is not None:
+                rows.append(_row(current_id, st))
+            current_id = m.product_id
+            st = _ProductCost(*base.pop(current_id, (0, Decimal("0"), None)))
+
+        delta = int(m.stock_after) - int(m.stock_before)
+        if delta > 0:
+            st.receive(delta, m.unit_cost)
+        elif delta < 0:
+            # solo las salidas dentro del mes cuentan como costo de ventas
+            st.issue(-delta, is_sale=(m.movement_type == "out" and m.created_at >= start))
+
+    if st is not None:
+        rows.append(_row(current_id, st))
+
+    # productos sin movimientos desde el mes base
+    for product_id, state in base.items():
+        rows.append(_row(product_id, _ProductCost(*state)))
+
+    rows.sort(key=lambda r: r["product_id"])
+    return rows
@@ -0,0 +1,196 @@
+from decimal import Decimal
+import json
+import logging
+import queue
+import select
+import threading
+
+from sqlalchemy import event, text
+
+from .database import RoutingSession
+from .models import Sale, SaleItem
+
+log = logging.getLogger(__name__)
+
+# session.info: ventas creadas/actualizadas en la transacción (se publican al commit)
+PENDING_KEY = "live_sales"
+PG_CHANNEL = "controlpyme_live"
+MAX_ITEMS = 20  # NOTIFY admite ~8KB por mensaje
+
+
+class Subscription:
+    def __init__(self, business_id: int, maxsize: int = 100):
+        self.business_id = business_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflow = False  # cliente lento: se perdieron eventos
+
+    def get(self, timeout: float):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LiveHub:
+    """Pub/sub por negocio para el dashboard en vivo (SSE).
+
+    local: solo llega a los streams del mismo proceso; los demás workers lo
+    notan por la versión de datos en el heartbeat.
+    postgres: NOTIFY al publicar y un hilo LISTEN por proceso que reparte
+    a sus suscriptores, así todos los workers reciben el evento.
+    """
+
+    def __init__(self):
+        self.backend = "local"
+        self._subs = {}  # business_id -> {Subscription}
+        self._open = 0   # streams abiertos en este proceso
+        self._lock = threading.Lock()
+        self._engine = None
+        self._listener = None
+
+    def init_app(self, app, engine=None):
+        self.backend = app.config.get("LIVE_BACKEND", "local")
+        self._engine = engine
+        app.extensions["live_hub"] = self
+
+    @property
+    def shared(self) -> bool:
+        return self.backend == "postgres"
+
+    def subscribe(self, business_id: int, limit: int = None):
+        """Suscripción nueva, o None si el proceso ya tiene `limit` streams abiertos."""
+        if self.shared:
+            self._ensure_listener()
+
+        sub = Subscription(business_id)
+        with self._lock:
+            if limit is not None and self._open >= limit:
+                return None
+            self._subs.setdefault(business_id, set()).add(sub)
+            self._open += 1
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subs.get(sub.business_id)
+            if subs is not None and sub in subs:
+                subs.discard(sub)
+                self._open -= 1
+                if not subs:
+                    del self._subs[sub.business_id]
+
+    def publish(self, business_id: int, payload: dict):
+        if self.shared:
+            message = json.dumps({"business_id": business_id, **payload}, separators=(",", ":"))
+            try:
+                with self._engine.connect() as conn:
+                    conn.execute(text("SELECT pg_notify(:channel, :message)"),
+                                 {"channel": PG_CHANNEL, "message": message})
+                    conn.commit()
+            except Exception:
+                # el dashboard se pone al día en la próxima carga; la venta ya está guardada
+                log.warning("No se pudo publicar evento en vivo", exc_info=True)
+            return
+
+        self._deliver(business_id, payload)
+
+    def _deliver(self, business_id: int, payload: dict):
+        with self._lock:
+            subs = list(self._subs.get(business_id, ()))
+
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(payload)
+            except queue.Full:
+                sub.overflow = True
+
+    # ===== backend postgres =====
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name="live-listen", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        # conexión propia (fuera del pool): LISTEN no funciona vía PgBouncer en modo transacción
+        dialect = self._engine.dialect
+        args, kwargs = dialect.create_connect_args(self._engine.url)
+        conn = dialect.connect(*args, **kwargs)
+        conn.autocommit = True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {PG_CHANNEL}")
+
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        payload = json.loads(note.payload)
+                        self._deliver(payload.pop("business_id"), payload)
+                    except (ValueError, KeyError):
+                        log.warning("Evento en vivo inválido: %r", note.payload)
+        except Exception:
+            log.exception("Listener de eventos en vivo detenido")
+        finally:
+            conn.close()
+
+
+live_hub = LiveHub()
+
+
+def _sale_event(snapshot: dict) -> dict:
+    items = snapshot["items"]
+    return {
+        "type": "sale",
+        "id": snapshot["id"],
+        "total": snapshot["total"],
+        "created_at": snapshot["created_at"],
+        "items": items[:MAX_ITEMS],
+        "items_count": len(items),
+    }
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_sales(session, flush_context):
+    pending = None
+
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Sale):
+            pending = session.info.setdefault(PENDING_KEY, {})
+            entry = pending.setdefault(obj.id, {"sale": obj, "items": []})
+            entry.update(
+                business_id=obj.business_id,
+                total=str(Decimal(obj.total or 0).quantize(Decimal("0.01"))),
+                created_at=obj.created_at.isoformat() if obj.created_at else None,
+            )
+
+    for obj in session.new:
+        if isinstance(obj, SaleItem):
+            pending = session.info.setdefault(PENDING_KEY, {})
+            entry = pending.get(obj.sale_id)
+            if entry is not None:
+                entry["items"].append({"product_name": obj.product_name, "quantity": int(obj.quantity)})
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _publish_sales(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+
+    for sale_id, entry in pending.items():
+        # ventas deshechas con un savepoint (p. ej. un ticket inválido del lote) ya no están
+        if entry["sale"] not in session:
+            continue
+        live_hub.publish(entry["business_id"], _sale_event({"id": sale_id, **entry}))
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _drop_sales(session):
+    session.info.pop(PENDING_KEY, None)
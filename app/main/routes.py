@@ -1,10 +1,16 @@
-from flask import render_template, redirect, url_for
+from flask import render_template, redirect, url_for, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from . import main_bp
 from datetime import datetime, date, time, timedelta
 from sqlalchemy import func
-from ..models import Sale, SaleItem, Product
+from ..models import Business, Sale, Product
 from ..extensions import db
+from ..database import use_replica
+from ..etag import conditional_view
+from ..live import live_hub
+from ..sales.cash import current_session
+import json
+from time import monotonic
 
 
 @main_bp.get("/")
@@ -16,45 +22,97 @@ def landing():
 
 @main_bp.get("/dashboard")
 @login_required
+@use_replica
+@conditional_view
 def dashboard():
     start = datetime.combine(date.today(), time.min)
     end = datetime.combine(date.today(), time.max)
 
-    # Tickets del día
-    sales_today = Sale.query.filter(
+    # Tickets del día: total y cantidad en una consulta
+    total_today, sales_count = db.session.query(
+        func.coalesce(func.sum(Sale.total), 0),
+        func.count(Sale.id)
+    ).filter(
         Sale.business_id == current_user.business_id,
         Sale.created_at >= start,
         Sale.created_at <= end
-    ).all()
-
-    total_today = float(sum([s.total for s in sales_today])) if sales_today else 0.0
-    sales_count = len(sales_today)
+    ).one()
+    total_today = float(total_today)
 
     products_count = Product.query.filter_by(
         business_id=current_user.business_id
     ).count()
 
-    # Últimos tickets (para mostrar en dashboard)
+    # Últimos tickets (el detalle sale de items_count/first_product_name, sin SaleItem)
     recent_sales = Sale.query.filter_by(
         business_id=current_user.business_id
     ).order_by(Sale.created_at.desc()).limit(10).all()
 
-    # items para esos tickets (en una sola consulta)
-    recent_ids = [s.id for s in recent_sales]
-    items_map = {}
-    if recent_ids:
-        items = SaleItem.query.filter(
-            SaleItem.sale_id.in_(recent_ids)
-        ).order_by(SaleItem.sale_id.desc()).all()
-
-        for it in items:
-            items_map.setdefault(it.sale_id, []).append(it)
-
     return render_template(
         "main/dashboard.html",
+        cash_session=current_session(current_user.business_id),
         total_today=total_today,
         sales_count=sales_count,
         products_count=products_count,
         recent_sales=recent_sales,
-        items_map=items_map
+        today=date.today()
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+@main_bp.get("/dashboard/stream")
+@login_required
+def dashboard_stream():
+    # Server-Sent Events: el dashboard recibe cada venta al hacer commit
+    business_id = current_user.business_id
+    version = current_user.business.data_version
+    heartbeat = current_app.config.get("LIVE_HEARTBEAT_SECONDS", 15)
+    lifetime = current_app.config.get("LIVE_STREAM_SECONDS", 300)
+
+    # no retener una conexión del pool mientras el stream está abierto
+    db.session.close()
+
+    # cada stream retiene un hilo/greenlet por LIVE_STREAM_SECONDS: por encima
+    # del tope el navegador no reconecta (204) y el dashboard pasa a polling con ETag
+    sub = live_hub.subscribe(business_id, limit=current_app.config["LIVE_MAX_STREAMS"])
+    if sub is None:
+        return Response(status=204)
+
+    def events():
+        nonlocal version
+        deadline = monotonic() + lifetime
+        try:
+            yield "retry: 3000\n\n"
+
+            while monotonic() < deadline:
+                payload = sub.get(timeout=heartbeat)
+                if payload is not None:
+                    version = None  # cambio ya enviado: se vuelve a tomar en el próximo heartbeat
+                    yield _sse(payload["type"], payload)
+                    continue
+
+                if sub.overflow:
+                    sub.overflow = False
+                    yield _sse("refresh", {})
+                    continue
+
+                if not live_hub.shared:
+                    # pub/sub local: ventas de otros workers se notan por la versión de datos
+                    current = db.session.query(Business.data_version).filter(Business.id == business_id).scalar()
+                    db.session.close()
+                    if version is not None and current != version:
+                        yield _sse("refresh", {})
+                    version = current
+
+                yield ": ping\n\n"
+        finally:
+            live_hub.unsubscribe(sub)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
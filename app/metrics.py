@@ -0,0 +1,187 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from importlib import import_module
+
+from sqlalchemy import case, delete, event, func, insert, select, update
+from sqlalchemy.orm import attributes
+
+from .archive import sales_for
+from .database import RoutingSession
+from .extensions import db
+from .models import Business, PlatformDailyMetric, Sale, TenantDailyStats
+
+stats_table = TenantDailyStats.__table__
+
+
+# ===== contadores por negocio (incrementales) =====
+
+def _sale_day(sale) -> date:
+    return (sale.created_at or datetime.utcnow()).date()
+
+
+def _total_delta(sale) -> Decimal:
+    hist = attributes.get_history(sale, "total")
+    if not hist.added:
+        return Decimal("0")
+    old = hist.deleted[0] if hist.deleted else 0
+    return Decimal(hist.added[0] or 0) - Decimal(old or 0)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _count_sales(session, flush_context):
+    # (business_id, día) -> [tickets, total]; el total de un ticket se fija
+    # después del primer flush (register_ticket), por eso se suman deltas
+    deltas = defaultdict(lambda: [0, Decimal("0")])
+
+    for obj in session.new:
+        if isinstance(obj, Sale):
+            entry = deltas[(obj.business_id, _sale_day(obj))]
+            entry[0] += 1
+            entry[1] += Decimal(obj.total or 0)
+
+    for obj in session.dirty:
+        if isinstance(obj, Sale):
+            delta = _total_delta(obj)
+            if delta:
+                deltas[(obj.business_id, _sale_day(obj))][1] += delta
+
+    for obj in session.deleted:
+        if isinstance(obj, Sale):
+            entry = deltas[(obj.business_id, _sale_day(obj))]
+            entry[0] -= 1
+            entry[1] -= Decimal(obj.total or 0)
+
+    rows = [
+        {"business_id": biz_id, "day": day, "sales_count": count, "sales_total": total}
+        for (biz_id, day), (count, total) in deltas.items()
+        if count or total
+    ]
+    if rows:
+        # mismo flush/transacción que la venta: un savepoint deshecho también deshace el contador
+        _add_daily(session, rows)
+
+
+def _add_daily(session, rows):
+    dialect = session.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        stmt = import_module(f"sqlalchemy.dialects.{dialect}").insert(stats_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[stats_table.c.business_id, stats_table.c.day],
+            set_={
+                "sales_count": stats_table.c.sales_count + stmt.excluded.sales_count,
+                "sales_total": stats_table.c.sales_total + stmt.excluded.sales_total,
+            }
+        )
+        session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = session.execute(
+            update(stats_table)
+            .where(stats_table.c.business_id == row["business_id"], stats_table.c.day == row["day"])
+            .values(sales_count=stats_table.c.sales_count + row["sales_count"],
+                    sales_total=stats_table.c.sales_total + row["sales_total"])
+        )
+        if result.rowcount == 0:
+            session.execute(insert(stats_table), row)
+
+
+@event.listens_for(Business.is_pro, "set", active_history=True)
+def _stamp_pro_since(target, value, oldvalue, initiator):
+    # conversión: pasa a Pro (no cuenta si ya lo era)
+    if value and oldvalue is not True:
+        target.pro_since = datetime.utcnow()
+
+
+def rebuild_tenant_stats(since: date = None) -> int:
+    """Recalcula los contadores diarios desde las ventas (carga inicial o
+    reparación), archivo incluido si el rango lo toca. Correr sin ventas en
+    curso para los días que toca. No hace commit."""
+    start = datetime.combine(since, time.min) if since else None
+    sales = sales_for(start)
+    day_expr = func.date(sales.created_at)
+
+    cleanup = delete(TenantDailyStats)
+    source = select(
+        sales.business_id, day_expr, func.count(sales.id), func.coalesce(func.sum(sales.total), 0)
+    ).where(sales.created_at.isnot(None)).group_by(sales.business_id, day_expr)
+
+    if since:
+        cleanup = cleanup.where(TenantDailyStats.day >= since)
+        source = source.where(sales.created_at >= start)
+
+    db.session.execute(cleanup)
+    result = db.session.execute(
+        insert(stats_table).from_select(["business_id", "day", "sales_count", "sales_total"], source)
+    )
+    return result.rowcount
+
+
+# ===== rollup diario de la plataforma =====
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def rollup_day(day: date, *, active_days: int, trial_days: int, price: Decimal) -> PlatformDailyMetric:
+    """Calcula (o recalcula) la fila de `day`. No hace commit.
+
+    Ventas y actividad salen de TenantDailyStats (una fila por negocio y día,
+    no de Sale). Pro/trials son el estado de Business al correr el rollup:
+    correrlo poco después de medianoche para el día anterior.
+    """
+    day_end = datetime.combine(day + timedelta(days=1), time.min)
+    trial = Business.is_pro.is_(False)
+
+    tenants_total, tenants_pro, trials_active, trials_expiring, conversions = db.session.execute(
+        select(
+            func.count(Business.id),
+            _count_if(Business.is_pro.is_(True)),
+            _count_if(trial & (Business.trial_ends_at > day_end)),
+            _count_if(trial & (Business.trial_ends_at > day_end)
+                      & (Business.trial_ends_at <= day_end + timedelta(days=trial_days))),
+            _count_if((Business.pro_since >= day_end - timedelta(days=1)) & (Business.pro_since < day_end)),
+        )
+    ).one()
+
+    tenants_active = db.session.execute(
+        select(func.count(func.distinct(TenantDailyStats.business_id))).where(
+            TenantDailyStats.day > day - timedelta(days=active_days),
+            TenantDailyStats.day <= day,
+            TenantDailyStats.sales_count > 0
+        )
+    ).scalar()
+
+    sales_count, sales_total = db.session.execute(
+        select(
+            func.coalesce(func.sum(TenantDailyStats.sales_count), 0),
+            func.coalesce(func.sum(TenantDailyStats.sales_total), 0)
+        ).where(TenantDailyStats.day == day)
+    ).one()
+
+    metric = db.session.get(PlatformDailyMetric, day) or PlatformDailyMetric(day=day)
+    metric.tenants_total = tenants_total
+    metric.tenants_pro = tenants_pro
+    metric.tenants_active = tenants_active
+    metric.trials_active = trials_active
+    metric.trials_expiring = trials_expiring
+    metric.conversions = conversions
+    metric.mrr = tenants_pro * price
+    metric.sales_count = sales_count
+    metric.sales_total = sales_total
+    metric.computed_at = datetime.utcnow()
+
+    db.session.add(metric)
+    return metric
+
+
+def sales_today():
+    """(tickets, total) de hoy en toda la plataforma, desde los contadores."""
+    return db.session.execute(
+        select(
+            func.coalesce(func.sum(TenantDailyStats.sales_count), 0),
+            func.coalesce(func.sum(TenantDailyStats.sales_total), 0)
+        ).where(TenantDailyStats.day == datetime.utcnow().date())
+    ).one()
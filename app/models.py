@@ -4,23 +4,45 @@ from .extensions import db
 from datetime import datetime, timedelta
 
 class Business(db.Model):
+    __table_args__ = (
+        # búsqueda por prefijo en el admin; en Postgres además ix_business_name_trgm (migración)
+        db.Index("ix_business_name_lower", db.func.lower(db.text("name"))),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
 
     # SaaS Billing
-    trial_ends_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.utcnow() + timedelta(days=7))
+    trial_ends_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.utcnow() + timedelta(days=7), index=True)
     is_pro = db.Column(db.Boolean, nullable=False, default=False)
 
     users = db.relationship("User", backref="business", lazy=True)
     payment_status = db.Column(db.String(20), default="trial")
     # valores:    # trial    # pending    # approved
     payment_status = db.Column(db.String(20), nullable=False, default="trial")
-    # trial | pending | approved
+    # trial | expired | pending | approved  (lo mantiene `flask billing sweep`)
+
+    # trial vencido y sin Pro; lo recalcula el barrido de facturación (app/billing/lifecycle.py)
+    access_blocked = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    pro_since = db.Column(db.DateTime, nullable=True)  # última activación de Pro (conversiones)
+
+    # sube con cada escritura de ventas/productos/kardex (ETag de páginas)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    def has_access(self, now=None) -> bool:
+        # Pro o trial vigente. access_blocked lo precalcula el barrido de
+        # facturación; la fecha del trial cubre el hueco hasta que corra
+        if self.access_blocked:
+            return False
+        if self.is_pro or not self.trial_ends_at:
+            return True
+        return self.trial_ends_at > (now or datetime.utcnow())
 
     
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False)
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False, index=True)
     
     is_admin = db.Column(db.Boolean, default=False)
 
@@ -50,18 +72,26 @@ class Product(db.Model):
     business = db.relationship("Business")
 
 class Sale(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint("business_id", "client_ref", name="uq_sale_business_client_ref"),
+        db.Index("ix_sale_business_created", "business_id", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=True, index=True)
-    product_name = db.Column(db.String(150), nullable=True)
-    unit_price = db.Column(db.Numeric(10, 2), nullable=True)
-    quantity = db.Column(db.Integer, nullable=True)
     total = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    client_ref = db.Column(db.String(64), nullable=True)  # clave del ticket en la caja (sync offline)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # resumen de las líneas (lo llena register_ticket): listas de tickets sin cargar SaleItem
+    items_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    units_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    first_product_name = db.Column(db.String(150), nullable=True)
 
-    product = db.relationship("Product")
+    cash_session_id = db.Column(db.Integer, db.ForeignKey("cash_session.id"), nullable=True, index=True)
+
+    # clave de partición en Postgres (ver app/partitions.py)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
 class PaymentProof(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -71,34 +101,80 @@ class PaymentProof(db.Model):
 
     filename = db.Column(db.String(255), nullable=False)     # nombre guardado en disco
     original_name = db.Column(db.String(255), nullable=True) # nombre original
-    mime_type = db.Column(db.String(80), nullable=True)
+    mime_type = db.Column(db.String(80), nullable=True)    # detectado por contenido
+
+    sha256 = db.Column(db.String(64), nullable=True, index=True)
+    size_bytes = db.Column(db.Integer, nullable=True)
+    preview_filename = db.Column(db.String(255), nullable=True)  # miniatura para revisión (imágenes)
 
-    status = db.Column(db.String(20), nullable=False, default="pending")
-    # pending | approved | rejected
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)
+    # pending | approved | rejected | superseded (el negocio ya era Pro)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     business = db.relationship("Business")
     user = db.relationship("User")
     
+class Location(db.Model):
+    # Ubicación de stock (tienda, bodega...). Cada negocio tiene una por
+    # defecto: ahí van las ventas y movimientos que no indican ubicación
+    __table_args__ = (
+        db.UniqueConstraint("business_id", "name", name="uq_location_business_name"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False, index=True)
+    name = db.Column(db.String(80), nullable=False)
+    is_default = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    is_active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class LocationStock(db.Model):
+    # Stock por ubicación; Product.stock es la suma, mantenida en la misma transacción
+    __table_args__ = (
+        db.Index("ix_location_stock_product", "product_id"),
+    )
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey("location.id"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+
+    stock = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+
 class InventoryMovement(db.Model):
+    __table_args__ = (
+        db.Index("ix_inventory_movement_product_created", "product_id", "created_at"),
+        db.Index("ix_inventory_movement_location_product_created", "location_id", "product_id", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
 
-    movement_type = db.Column(db.String(20), nullable=False)  # in | out | adjust
+    movement_type = db.Column(db.String(20), nullable=False)  # in | out | adjust | transfer_out | transfer_in
     quantity = db.Column(db.Integer, nullable=False)          # cantidad del movimiento (siempre positiva)
-    stock_before = db.Column(db.Integer, nullable=False)
+    stock_before = db.Column(db.Integer, nullable=False)      # stock total del producto
     stock_after = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Numeric(10, 2), nullable=True)  # costo unitario (entradas)
+
+    # kardex por ubicación: stock de esa ubicación antes/después
+    location_id = db.Column(db.Integer, db.ForeignKey("location.id"), nullable=False)
+    location_stock_before = db.Column(db.Integer, nullable=False)
+    location_stock_after = db.Column(db.Integer, nullable=False)
+    transfer_pair_id = db.Column(db.Integer, nullable=True)  # el otro movimiento del traspaso
 
     note = db.Column(db.String(255), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)  # clave de partición
 
     business = db.relationship("Business")
     product = db.relationship("Product")
     user = db.relationship("User")
+    location = db.relationship("Location")
     
 class SaleItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -113,7 +189,8 @@ class SaleItem(db.Model):
     product_id = db.Column(
         db.Integer,
         db.ForeignKey("product.id"),
-        nullable=False
+        nullable=False,
+        index=True
     )
 
     product_name = db.Column(db.String(150), nullable=False)
@@ -123,3 +200,230 @@ class SaleItem(db.Model):
 
     sale = db.relationship("Sale", backref="items")
     product = db.relationship("Product")
+
+class CashSession(db.Model):
+    # Turno de caja: se abre con un fondo, suma las ventas al registrarlas
+    # (sales/services.register_ticket) y se cierra con el arqueo
+    __table_args__ = (
+        db.Index("ix_cash_session_business_opened", "business_id", "opened_at"),
+        # una sola caja abierta por negocio
+        db.Index("uq_cash_session_open", "business_id", unique=True,
+                 sqlite_where=db.text("closed_at IS NULL"),
+                 postgresql_where=db.text("closed_at IS NULL")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False)
+    opened_by_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    closed_by_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+
+    opened_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime, nullable=True)
+
+    opening_cash = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    sales_total = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default="0")
+
+    # arqueo al cerrar
+    expected_cash = db.Column(db.Numeric(12, 2), nullable=True)
+    counted_cash = db.Column(db.Numeric(12, 2), nullable=True)
+    difference = db.Column(db.Numeric(12, 2), nullable=True)  # contado - esperado
+    close_note = db.Column(db.String(255), nullable=True)
+
+    opened_by = db.relationship("User", foreign_keys=[opened_by_id])
+    closed_by = db.relationship("User", foreign_keys=[closed_by_id])
+
+class StockSnapshot(db.Model):
+    # Checkpoint de stock por producto: permite reconstruir el stock a una
+    # fecha sin recorrer todo el kardex (snapshot + cola corta de movimientos)
+    __table_args__ = (
+        db.Index("ix_stock_snapshot_product_taken", "product_id", "taken_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
+
+    stock = db.Column(db.Integer, nullable=False)
+    movement_id = db.Column(db.Integer, db.ForeignKey("inventory_movement.id"), nullable=True)  # último movimiento incluido
+    taken_at = db.Column(db.DateTime, nullable=False)  # el stock es válido a esta fecha
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    product = db.relationship("Product")
+
+class KardexCheckpoint(db.Model):
+    # Hasta dónde se verificó el kardex de cada negocio (verificación incremental)
+    id = db.Column(db.Integer, primary_key=True)
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False, unique=True)
+    last_movement_id = db.Column(db.Integer, nullable=False, default=0)
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class KardexIssue(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
+    movement_id = db.Column(db.Integer, db.ForeignKey("inventory_movement.id"), nullable=True)
+
+    kind = db.Column(db.String(20), nullable=False)
+    # gap: stock_before no coincide con el stock_after anterior
+    # stock_mismatch: el último movimiento no coincide con Product.stock
+    # location_total: la suma de LocationStock no coincide con Product.stock
+    expected = db.Column(db.Integer, nullable=True)
+    found = db.Column(db.Integer, nullable=True)
+
+    detected_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    product = db.relationship("Product")
+
+class ValuationPeriod(db.Model):
+    # Estado de valuación por producto al cierre de un mes ya cerrado
+    # (los meses cerrados no se recalculan)
+    __table_args__ = (
+        db.UniqueConstraint("business_id", "period", "product_id", name="uq_valuation_period_product"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
+    period = db.Column(db.String(7), nullable=False)  # YYYY-MM
+
+    stock = db.Column(db.Integer, nullable=False)
+    avg_cost = db.Column(db.Numeric(12, 4), nullable=False, default=0)
+    value_avg = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    value_fifo = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    cogs_avg = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    cogs_fifo = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    fifo_layers = db.Column(db.Text, nullable=False, default="[]")  # JSON [[cantidad, costo], ...]
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(db.Model):
+    # Respuesta guardada de un POST con clave de idempotencia (reintentos/doble click)
+    __table_args__ = (
+        db.UniqueConstraint("business_id", "key", name="uq_idempotency_business_key"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    endpoint = db.Column(db.String(80), nullable=False)
+
+    # respuesta original (None mientras se procesa)
+    status_code = db.Column(db.Integer, nullable=True)
+    location = db.Column(db.String(255), nullable=True)
+    mimetype = db.Column(db.String(80), nullable=True)
+    body = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class ApiToken(db.Model):
+    # Token para la API JSON (/api/v1); solo se guarda el hash
+    id = db.Column(db.Integer, primary_key=True)
+
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+
+    name = db.Column(db.String(80), nullable=True)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True, index=True)  # sha256 hex
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship("User")
+
+
+class TenantDailyStats(db.Model):
+    # Contadores por negocio y día; se actualizan con cada venta (ver app/metrics.py)
+    business_id = db.Column(db.Integer, db.ForeignKey("business.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    sales_total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+
+class PlatformDailyMetric(db.Model):
+    # Rollup nocturno de la plataforma (flask admin rollup-metrics); lo lee el dashboard admin
+    day = db.Column(db.Date, primary_key=True)
+
+    tenants_total = db.Column(db.Integer, nullable=False, default=0)
+    tenants_pro = db.Column(db.Integer, nullable=False, default=0)
+    tenants_active = db.Column(db.Integer, nullable=False, default=0)  # con ventas en la ventana
+    trials_active = db.Column(db.Integer, nullable=False, default=0)
+    trials_expiring = db.Column(db.Integer, nullable=False, default=0)  # vencen en los próximos N días
+    conversions = db.Column(db.Integer, nullable=False, default=0)     # pasaron a Pro ese día
+    mrr = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    sales_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ===== archivo: meses cerrados movidos fuera de las tablas calientes (app/archive.py) =====
+
+class SaleArchive(db.Model):
+    __table_args__ = (
+        db.Index("ix_sale_archive_business_created", "business_id", "created_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    business_id = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    client_ref = db.Column(db.String(64), nullable=True)
+    items_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    units_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    first_product_name = db.Column(db.String(150), nullable=True)
+    cash_session_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+class SaleItemArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    sale_id = db.Column(db.Integer, nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=False, index=True)
+    product_name = db.Column(db.String(150), nullable=False)
+    unit_price = db.Column(db.Numeric(10, 2), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Numeric(10, 2), nullable=False)
+
+
+class InventoryMovementArchive(db.Model):
+    __table_args__ = (
+        db.Index("ix_inventory_movement_archive_business_created", "business_id", "created_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    business_id = db.Column(db.Integer, nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    movement_type = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    stock_before = db.Column(db.Integer, nullable=False)
+    stock_after = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Numeric(10, 2), nullable=True)
+    location_id = db.Column(db.Integer, nullable=True)
+    location_stock_before = db.Column(db.Integer, nullable=True)
+    location_stock_after = db.Column(db.Integer, nullable=True)
+    transfer_pair_id = db.Column(db.Integer, nullable=True)
+    note = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+class ArchivedPeriod(db.Model):
+    # Mes ya movido al archivo (toda la plataforma); los reportes leen el
+    # archivo solo si su rango empieza antes del último mes archivado
+    month = db.Column(db.Date, primary_key=True)
+
+    sales = db.Column(db.Integer, nullable=False, default=0)
+    sale_items = db.Column(db.Integer, nullable=False, default=0)
+    movements = db.Column(db.Integer, nullable=False, default=0)
+
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,103 @@
+from datetime import date
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from .extensions import db
+
+# tablas particionadas por mes en created_at (migración 19ff869b127f, solo Postgres)
+PARTITIONED_TABLES = ("sale", "inventory_movement")
+
+partitions_cli = AppGroup("partitions", help="Particiones mensuales de ventas y kardex (Postgres).")
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(table: str) -> bool:
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return bool(db.session.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"), {"t": table}
+    ).scalar())
+
+
+def list_partitions(table: str):
+    """[(nombre, límites, filas estimadas)] de las particiones de `table`."""
+    return db.session.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:t) ORDER BY c.relname"
+    ), {"t": table}).all()
+
+
+def ensure_partition(table: str, month: date) -> bool:
+    """Crea la partición del mes si falta. No hace commit.
+
+    Si la partición default ya recibió filas de ese mes, se mueven a la
+    nueva antes de adjuntarla (Postgres no deja solapar rangos con la default).
+    """
+    name = partition_name(table, month)
+    if db.session.execute(text("SELECT to_regclass(:t)"), {"t": name}).scalar():
+        return False
+
+    start, end = month, next_month(month)
+    bounds = f"FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    in_range = "created_at >= :start AND created_at < :end"
+    params = {"start": start, "end": end}
+
+    stray = db.session.execute(
+        text(f"SELECT 1 FROM {table}_default WHERE {in_range} LIMIT 1"), params
+    ).scalar()
+
+    if not stray:
+        db.session.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"))
+        return True
+
+    db.session.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+    db.session.execute(text(f"INSERT INTO {name} SELECT * FROM {table}_default WHERE {in_range}"), params)
+    db.session.execute(text(f"DELETE FROM {table}_default WHERE {in_range}"), params)
+    db.session.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    return True
+
+
+@partitions_cli.command("ensure")
+@click.option("--ahead", type=int, default=3, show_default=True, help="Meses futuros a crear.")
+def ensure_command(ahead):
+    """Crea las particiones del mes actual y de los próximos meses (correr diario)."""
+    created = 0
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            click.echo(f"{table}: no está particionada, se omite.")
+            continue
+
+        month = month_start(date.today())
+        for _ in range(ahead + 1):
+            if ensure_partition(table, month):
+                click.echo(f"{partition_name(table, month)} creada")
+                created += 1
+            month = next_month(month)
+        db.session.commit()
+
+    click.echo(f"Particiones creadas: {created}")
+
+
+@partitions_cli.command("list")
+def list_command():
+    """Particiones de ventas y kardex con sus filas estimadas."""
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            click.echo(f"{table}: no está particionada.")
+            continue
+        for name, bounds, rows in list_partitions(table):
+            click.echo(f"{name:<32} {bounds:<70} ~{max(rows, 0)} filas")
@@ -2,13 +2,17 @@ from flask import render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
 from . import products_bp
 from ..extensions import db
-from sqlalchemy import func
+from ..database import write_transaction
+from ..etag import conditional_view
+from ..inventory.locations import apply_stock, default_location, stock_rows
+from sqlalchemy import exists, func
 from datetime import datetime
-from ..models import Product, Sale, InventoryMovement
+from ..models import Product, SaleItem, SaleItemArchive, InventoryMovement, LocationStock
 
 
 @products_bp.get("/")
 @login_required
+@conditional_view
 def list_products():
     products = Product.query.filter_by(
         business_id=current_user.business_id
@@ -26,10 +30,12 @@ def new_product():
 
 @products_bp.post("/new")
 @login_required
+@write_transaction
 def create_product():
     name = (request.form.get("name") or "").strip()
     price = request.form.get("price", type=float)
     stock = request.form.get("stock", type=int) or 0
+    unit_cost = request.form.get("unit_cost", type=float)
 
     # switches del form
     merge_if_exists = request.form.get("merge_if_exists") == "1"
@@ -48,6 +54,10 @@ def create_product():
         flash("El stock no puede ser negativo.", "danger")
         return redirect(url_for("products.new_product"))
 
+    if unit_cost is not None and unit_cost < 0:
+        flash("El costo no puede ser negativo.", "danger")
+        return redirect(url_for("products.new_product"))
+
     # Buscar producto existente (mismo negocio, nombre case-insensitive)
     existing = Product.query.filter(
         Product.business_id == current_user.business_id,
@@ -56,9 +66,6 @@ def create_product():
 
     # ===== Caso 1: Existe y queremos MERGE =====
     if existing and merge_if_exists:
-        before = int(existing.stock or 0)
-        after = before + int(stock)
-
         # si el usuario puso stock 0 y solo quiere evitar duplicado:
         # igual permitimos actualizar precio/estado si lo marcó
         if update_price_if_merge:
@@ -66,21 +73,22 @@ def create_product():
 
         existing.is_active = is_active
 
-        # si hay stock para sumar, registramos movimiento IN
+        # si hay stock para sumar, registramos movimiento IN (en la ubicación por defecto)
         if stock > 0:
+            location = default_location(current_user.business_id)
+            row = stock_rows(current_user.business_id, location.id, [existing.id])[existing.id]
             mv = InventoryMovement(
                 business_id=current_user.business_id,
                 product_id=existing.id,
                 user_id=current_user.id,
                 movement_type="in",
                 quantity=int(stock),
-                stock_before=before,
-                stock_after=after,
+                unit_cost=unit_cost,
                 note="Entrada por alta/merge de producto",
-                created_at=datetime.utcnow()
+                created_at=datetime.utcnow(),
+                **apply_stock(existing, row, int(stock))
             )
             db.session.add(mv)
-            existing.stock = after
 
         db.session.commit()
 
@@ -96,7 +104,7 @@ def create_product():
     product = Product(
         name=name,
         price=price,
-        stock=int(stock),
+        stock=0,
         business_id=current_user.business_id,
         is_active=is_active
     )
@@ -104,18 +112,20 @@ def create_product():
     db.session.add(product)
     db.session.flush()  # ya tenemos product.id
 
-    # Kardex automático si nace con stock
+    # Kardex automático si nace con stock (en la ubicación por defecto)
     if stock > 0:
+        location = default_location(current_user.business_id)
+        row = stock_rows(current_user.business_id, location.id, [product.id])[product.id]
         mv = InventoryMovement(
             business_id=current_user.business_id,
             product_id=product.id,
             user_id=current_user.id,
             movement_type="in",
             quantity=int(stock),
-            stock_before=0,
-            stock_after=int(stock),
+            unit_cost=unit_cost,
             note="Stock inicial (alta de producto)",
-            created_at=datetime.utcnow()
+            created_at=datetime.utcnow(),
+            **apply_stock(product, row, int(stock))
         )
         db.session.add(mv)
 
@@ -134,6 +144,7 @@ def edit_product(product_id):
 
 @products_bp.post("/<int:product_id>/edit")
 @login_required
+@write_transaction
 def edit_product_post(product_id):
     p = Product.query.get_or_404(product_id)
     if p.business_id != current_user.business_id:
@@ -154,9 +165,33 @@ def edit_product_post(product_id):
     if stock is None:
         stock = int(p.stock or 0)
 
+    if stock < 0:
+        flash("El stock no puede ser negativo.", "danger")
+        return redirect(url_for("products.edit_product", product_id=product_id))
+
+    # el stock total es la suma de las ubicaciones: la diferencia va a la por defecto
+    delta = stock - int(p.stock or 0)
+    if delta:
+        location = default_location(current_user.business_id)
+        row = stock_rows(current_user.business_id, location.id, [p.id])[p.id]
+        if int(row.stock or 0) + delta < 0:
+            db.session.rollback()
+            flash(f"No hay stock suficiente en {location.name} para bajar el total; usa el kardex.", "danger")
+            return redirect(url_for("products.edit_product", product_id=product_id))
+
+        db.session.add(InventoryMovement(
+            business_id=current_user.business_id,
+            product_id=p.id,
+            user_id=current_user.id,
+            movement_type="adjust",
+            quantity=abs(delta),
+            note="Ajuste por edición de producto",
+            created_at=datetime.utcnow(),
+            **apply_stock(p, row, delta)
+        ))
+
     p.name = name
     p.price = price
-    p.stock = stock
 
     db.session.commit()
     flash("Producto actualizado ✅", "success")
@@ -164,6 +199,7 @@ def edit_product_post(product_id):
 
 @products_bp.post("/<int:product_id>/toggle")
 @login_required
+@write_transaction
 def toggle_product(product_id):
     p = Product.query.get_or_404(product_id)
     if p.business_id != current_user.business_id:
@@ -177,21 +213,34 @@ def toggle_product(product_id):
 
 @products_bp.post("/<int:product_id>/delete")
 @login_required
+@write_transaction
 def delete_product(product_id):
     p = Product.query.get_or_404(product_id)
     if p.business_id != current_user.business_id:
         abort(403)
 
     # Si tiene ventas, NO se elimina (para no perder historial)
-    has_sales = Sale.query.filter_by(
-        business_id=current_user.business_id,
-        product_id=p.id
-    ).count() > 0
+    # líneas de ticket (también las archivadas); el producto ya es de este negocio
+    has_sales = db.session.query(
+        exists().where(SaleItem.product_id == p.id)
+        | exists().where(SaleItemArchive.product_id == p.id)
+    ).scalar()
 
     if has_sales:
         flash("Este producto ya tiene ventas. Mejor desactívalo para conservar historial.", "warning")
         return redirect(url_for("products.list_products"))
 
+    # stock por ubicación: con existencias no se borra; las filas en 0 se van con el producto
+    has_stock = db.session.query(exists().where(
+        LocationStock.product_id == p.id,
+        LocationStock.stock != 0
+    )).scalar()
+
+    if has_stock:
+        flash("Este producto todavía tiene stock en alguna ubicación. Ajústalo a 0 o desactívalo.", "warning")
+        return redirect(url_for("products.list_products"))
+
+    LocationStock.query.filter_by(product_id=p.id).delete(synchronize_session=False)
     db.session.delete(p)
     db.session.commit()
     flash("Producto eliminado ✅", "success")
@@ -199,6 +248,7 @@ def delete_product(product_id):
 
 @products_bp.post("/<int:product_id>/price")
 @login_required
+@write_transaction
 def update_price(product_id):
     p = Product.query.get_or_404(product_id)
     if p.business_id != current_user.business_id:
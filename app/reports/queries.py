@@ -0,0 +1,47 @@
+from sqlalchemy import func, desc
+
+from ..archive import sales_for, sale_items_for
+from ..extensions import db
+from ..models import Product
+
+
+def sales_summary(business_id: int, start, end):
+    # Total vendido + número de tickets (Sale) en una sola consulta
+    sales = sales_for(start)  # incluye el archivo si el rango lo toca
+    total, count = db.session.query(
+        func.coalesce(func.sum(sales.total), 0),
+        func.count(sales.id)
+    ).filter(
+        sales.business_id == business_id,
+        sales.created_at >= start,
+        sales.created_at <= end
+    ).one()
+    return total, count
+
+
+def top_products(business_id: int, start, end, limit: int = 10):
+    # Top productos por cantidad e ingreso (SaleItem + Sale)
+    sales, items = sales_for(start), sale_items_for(start)
+    return db.session.query(
+        items.product_name,
+        func.coalesce(func.sum(items.quantity), 0).label("qty"),
+        func.coalesce(func.sum(items.total), 0).label("income"),
+    ).join(
+        sales, sales.id == items.sale_id
+    ).filter(
+        sales.business_id == business_id,
+        sales.created_at >= start,
+        sales.created_at <= end
+    ).group_by(
+        items.product_name
+    ).order_by(
+        desc("qty")
+    ).limit(limit).all()
+
+
+def low_stock_products(business_id: int, low: int):
+    return Product.query.filter(
+        Product.business_id == business_id,
+        Product.stock <= low,
+        Product.is_active == True
+    ).order_by(Product.stock.asc()).all()
@@ -1,16 +1,23 @@
 from datetime import datetime, timedelta
 from flask import render_template, request, url_for, flash, redirect, Response
+from markupsafe import Markup
 from flask_login import login_required, current_user
-from sqlalchemy import func, desc
 from . import reports_bp
-from ..models import Sale, SaleItem, Product
+from .queries import sales_summary, top_products, low_stock_products
+from ..archive import sales_for, sale_items_for
+from ..models import Product
 from ..extensions import db
+from ..database import use_replica
+from ..etag import conditional_view, data_version
+from ..cache import fragment_cache
 import csv
 from io import StringIO
 
 
 @reports_bp.get("/")
 @login_required
+@use_replica
+@conditional_view(bucket_seconds=300)
 def reports_home():
     days = request.args.get("days", default=1, type=int)
     low = request.args.get("low", default=5, type=int)
@@ -20,63 +27,39 @@ def reports_home():
     if low is None or low < 0:
         low = 5
 
-    end = datetime.utcnow()
-    start = end - timedelta(days=days)
-
-    # Total vendido + número de tickets (Sale)
-    sales_total = db.session.query(
-        func.coalesce(func.sum(Sale.total), 0)
-    ).filter(
-        Sale.business_id == current_user.business_id,
-        Sale.created_at >= start,
-        Sale.created_at <= end
-    ).scalar()
-
-    sales_count = db.session.query(
-        func.count(Sale.id)
-    ).filter(
-        Sale.business_id == current_user.business_id,
-        Sale.created_at >= start,
-        Sale.created_at <= end
-    ).scalar()
-
-    # Top productos por cantidad e ingreso (SaleItem + Sale)
-    top_by_qty = db.session.query(
-        SaleItem.product_name,
-        func.coalesce(func.sum(SaleItem.quantity), 0).label("qty"),
-        func.coalesce(func.sum(SaleItem.total), 0).label("income"),
-    ).join(
-        Sale, Sale.id == SaleItem.sale_id
-    ).filter(
-        Sale.business_id == current_user.business_id,
-        Sale.created_at >= start,
-        Sale.created_at <= end
-    ).group_by(
-        SaleItem.product_name
-    ).order_by(
-        desc("qty")
-    ).limit(10).all()
-
-    # Stock bajo (Product)
-    low_stock = Product.query.filter(
-        Product.business_id == current_user.business_id,
-        Product.stock <= low,
-        Product.is_active == True
-    ).order_by(Product.stock.asc()).all()
+    business_id = current_user.business_id
+
+    def render_summary():
+        end = datetime.utcnow()
+        start = end - timedelta(days=days)
+
+        sales_total, sales_count = sales_summary(business_id, start, end)
+        return render_template(
+            "reports/_summary.html",
+            low=low,
+            sales_total=sales_total,
+            sales_count=sales_count,
+            top_by_qty=top_products(business_id, start, end),
+            low_stock=low_stock_products(business_id, low)
+        )
+
+    # mismo resumen para todos los usuarios del negocio hasta la próxima escritura
+    summary_html = fragment_cache.get_or_render(
+        (business_id, "reports_summary", days, low, data_version(business_id)),
+        render_summary
+    )
 
     return render_template(
         "reports/home.html",
         days=days,
         low=low,
-        sales_total=sales_total,
-        sales_count=sales_count,
-        top_by_qty=top_by_qty,
-        low_stock=low_stock
+        summary_html=Markup(summary_html)
     )
 
 
 @reports_bp.get("/export/csv")
 @login_required
+@use_replica
 def export_csv():
     days = request.args.get("days", default=1, type=int)
     if days not in (1, 7, 30):
@@ -85,20 +68,21 @@ def export_csv():
     end = datetime.utcnow()
     start = end - timedelta(days=days)
 
+    sales, items = sales_for(start), sale_items_for(start)
     rows = db.session.query(
-        Sale.id.label("ticket_id"),
-        Sale.created_at,
-        SaleItem.product_name,
-        SaleItem.unit_price,
-        SaleItem.quantity,
-        SaleItem.total
+        sales.id.label("ticket_id"),
+        sales.created_at,
+        items.product_name,
+        items.unit_price,
+        items.quantity,
+        items.total
     ).join(
-        Sale, Sale.id == SaleItem.sale_id
+        sales, sales.id == items.sale_id
     ).filter(
-        Sale.business_id == current_user.business_id,
-        Sale.created_at >= start,
-        Sale.created_at <= end
-    ).order_by(Sale.created_at.desc(), Sale.id.desc()).all()
+        sales.business_id == current_user.business_id,
+        sales.created_at >= start,
+        sales.created_at <= end
+    ).order_by(sales.created_at.desc(), sales.id.desc()).all()
 
     output = StringIO()
     writer = csv.writer(output)
@@ -126,6 +110,7 @@ def export_csv():
 
 @reports_bp.get("/export-products-csv")
 @login_required
+@use_replica
 def export_products_csv():
     products = Product.query.filter_by(
         business_id=current_user.business_id
@@ -152,6 +137,7 @@ def export_products_csv():
 
 @reports_bp.get("/export-sales-range")
 @login_required
+@use_replica
 def export_sales_range():
     # formato esperado: YYYY-MM-DD
     start_str = request.args.get("start", "")
@@ -169,20 +155,22 @@ def export_sales_range():
         flash("Formato de fecha inválido.", "danger")
         return redirect(url_for("reports.reports_home"))
 
+    # rangos viejos: también lee los meses archivados
+    sales, items = sales_for(start), sale_items_for(start)
     rows = db.session.query(
-        Sale.id.label("ticket_id"),
-        Sale.created_at,
-        SaleItem.product_name,
-        SaleItem.quantity,
-        SaleItem.unit_price,
-        SaleItem.total
+        sales.id.label("ticket_id"),
+        sales.created_at,
+        items.product_name,
+        items.quantity,
+        items.unit_price,
+        items.total
     ).join(
-        Sale, Sale.id == SaleItem.sale_id
+        sales, sales.id == items.sale_id
     ).filter(
-        Sale.business_id == current_user.business_id,
-        Sale.created_at >= start,
-        Sale.created_at <= end
-    ).order_by(Sale.created_at.asc(), Sale.id.asc()).all()
+        sales.business_id == current_user.business_id,
+        sales.created_at >= start,
+        sales.created_at <= end
+    ).order_by(sales.created_at.asc(), sales.id.asc()).all()
 
     output = StringIO()
     writer = csv.writer(output)
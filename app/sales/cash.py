@@ -0,0 +1,105 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import CashSession
+
+
+class CashError(Exception):
+    """Operación de caja inválida; el mensaje es para el usuario."""
+
+
+def _amount(value, label: str) -> Decimal:
+    try:
+        amount = Decimal(str(value)).quantize(Decimal("0.01"))
+    except (TypeError, ValueError, InvalidOperation):
+        raise CashError(f"{label} inválido.")
+    if amount < 0:
+        raise CashError(f"{label} inválido.")
+    return amount
+
+
+def current_session(business_id: int):
+    """Caja abierta del negocio (o None). Usa el índice único parcial."""
+    return CashSession.query.filter(
+        CashSession.business_id == business_id,
+        CashSession.closed_at.is_(None)
+    ).first()
+
+
+def open_session(business_id: int, user_id: int, opening_cash) -> CashSession:
+    """Abre la caja con su fondo inicial. No hace commit."""
+    if current_session(business_id):
+        raise CashError("Ya hay una caja abierta.")
+
+    cash_session = CashSession(
+        business_id=business_id,
+        opened_by_id=user_id,
+        opening_cash=_amount(opening_cash, "Fondo inicial")
+    )
+    db.session.add(cash_session)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # otra caja se abrió al mismo tiempo (uq_cash_session_open)
+        raise CashError("Ya hay una caja abierta.")
+    return cash_session
+
+
+def record_sale(sale) -> None:
+    """Suma la venta a la caja abierta, en la misma transacción del ticket.
+
+    El UPDATE es relativo (total = total + x) y exige la caja abierta: si se
+    cerró mientras tanto, la venta queda sin caja en vez de alterar un
+    arqueo ya hecho. Tampoco entran ventas anteriores a la apertura (tickets
+    offline sincronizados tarde): ese efectivo no está en esta caja.
+    """
+    session_id = db.session.query(CashSession.id).filter(
+        CashSession.business_id == sale.business_id,
+        CashSession.closed_at.is_(None),
+        CashSession.opened_at <= (sale.created_at or datetime.utcnow())
+    ).scalar()
+    if session_id is None:
+        return
+
+    updated = db.session.execute(
+        update(CashSession)
+        .where(CashSession.id == session_id, CashSession.closed_at.is_(None))
+        .values(sales_count=CashSession.sales_count + 1,
+                sales_total=CashSession.sales_total + sale.total)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if updated:
+        sale.cash_session_id = session_id
+
+
+def close_session(business_id: int, user_id: int, counted_cash, note: str = None) -> CashSession:
+    """Cierra la caja y guarda el arqueo (esperado vs contado). No hace commit.
+
+    Los totales ya están acumulados: cerrar no recorre las ventas del turno.
+    """
+    counted = _amount(counted_cash, "Efectivo contado")
+
+    cash_session = current_session(business_id)
+    if cash_session is None:
+        raise CashError("No hay caja abierta.")
+
+    # marca el cierre primero: toma el lock de la fila y espera a las ventas en curso
+    closed = db.session.execute(
+        update(CashSession)
+        .where(CashSession.id == cash_session.id, CashSession.closed_at.is_(None))
+        .values(closed_at=datetime.utcnow(), closed_by_id=user_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not closed:
+        raise CashError("La caja ya se cerró.")
+
+    db.session.refresh(cash_session)
+    cash_session.expected_cash = cash_session.opening_cash + cash_session.sales_total
+    cash_session.counted_cash = counted
+    cash_session.difference = counted - cash_session.expected_cash
+    cash_session.close_note = (note or "").strip()[:255] or None
+    return cash_session
@@ -0,0 +1,187 @@
+import os
+import uuid
+from decimal import Decimal
+
+from flask import abort, current_app, request, send_file
+
+from ..models import Sale, SaleArchive, SaleItem, SaleItemArchive
+
+# subir si cambia el formato: lo ya cacheado en disco deja de usarse
+RECEIPT_VERSION = 1
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+FORMATS = {
+    "escpos": ("application/octet-stream", "bin"),
+    "pdf": ("application/pdf", "pdf"),
+}
+
+FOOTER = "¡Gracias por su compra!"
+
+
+# ===== contenido (común a los dos formatos) =====
+
+def _money(value) -> str:
+    return f"{Decimal(value or 0):.2f}"
+
+
+def _pair(left: str, right: str, width: int) -> str:
+    left = left[:max(width - len(right) - 1, 0)]
+    return left + " " * (width - len(left) - len(right)) + right
+
+
+def receipt_lines(business_name: str, sale, items, width: int) -> list:
+    """[(texto, destacado)] del ticket, ya cortado a `width` columnas."""
+    lines = [
+        (business_name[:width].center(width), True),
+        (f"Ticket #{sale.id}".center(width), False),
+        (f"{sale.created_at:%d/%m/%Y %H:%M}".center(width), False),
+        ("-" * width, False),
+    ]
+    units = 0
+    for it in items:
+        lines.append((it.product_name[:width], False))
+        lines.append((_pair(f"  {it.quantity} x {_money(it.unit_price)}", _money(it.total), width), False))
+        units += it.quantity
+
+    lines += [
+        ("-" * width, False),
+        (_pair("TOTAL", f"${_money(sale.total)}", width), True),
+        (f"Artículos: {units}", False),
+        ("", False),
+        (FOOTER[:width].center(width), False),
+    ]
+    return lines
+
+
+# ===== ESC/POS (impresoras térmicas) =====
+
+ESC_INIT = b"\x1b@"
+ESC_CODEPAGE_850 = b"\x1bt\x02"   # PC850: acentos y ñ
+ESC_BOLD_ON, ESC_BOLD_OFF = b"\x1bE\x01", b"\x1bE\x00"
+ESC_FEED_CUT = b"\x1bd\x03\x1dV\x01"  # 3 líneas y corte parcial
+
+
+def render_escpos(lines) -> bytes:
+    out = [ESC_INIT, ESC_CODEPAGE_850]
+    for text, strong in lines:
+        data = text.encode("cp850", errors="replace") + b"\n"
+        out.append(ESC_BOLD_ON + data + ESC_BOLD_OFF if strong else data)
+    out.append(ESC_FEED_CUT)
+    return b"".join(out)
+
+
+# ===== PDF (una página angosta, Courier; sin dependencias) =====
+
+PDF_PAGE_WIDTH = 226.77  # 80 mm
+PDF_MARGIN = 10
+
+
+def _pdf_text(text: str) -> bytes:
+    data = text.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def render_pdf(lines, width: int) -> bytes:
+    # Courier: cada carácter mide 0.6 del tamaño de fuente
+    size = min(9.0, (PDF_PAGE_WIDTH - 2 * PDF_MARGIN) / (width * 0.6))
+    leading = size * 1.25
+    height = 2 * PDF_MARGIN + leading * len(lines)
+
+    ops = [b"BT", f"{leading:.2f} TL {PDF_MARGIN} {height - PDF_MARGIN - size:.2f} Td".encode()]
+    for text, strong in lines:
+        ops.append(f"/{'F2' if strong else 'F1'} {size:.2f} Tf".encode())
+        ops.append(b"(" + _pdf_text(text) + b") Tj T*")
+    ops.append(b"ET")
+    content = b"\n".join(ops)
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PDF_PAGE_WIDTH} {height:.2f}] "
+        f"/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>",
+        b"<< /Length " + str(len(content)).encode() + b" >>\nstream\n" + content + b"\nendstream",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def render(fmt: str, business_name: str, sale, items, width: int) -> bytes:
+    lines = receipt_lines(business_name, sale, items, width)
+    return render_escpos(lines) if fmt == "escpos" else render_pdf(lines, width)
+
+
+# ===== caché en disco por venta (las ventas no cambian) =====
+
+def receipt_path(business_id: int, sale_id: int, fmt: str) -> str:
+    ext = FORMATS[fmt][1]
+    return os.path.join(os.path.abspath(current_app.config["RECEIPT_FOLDER"]), str(business_id),
+                        f"{sale_id}-v{RECEIPT_VERSION}.{ext}")
+
+
+def _load_sale(business_id: int, sale_id: int):
+    # la venta puede estar en un mes ya archivado
+    for sale_model, item_model in ((Sale, SaleItem), (SaleArchive, SaleItemArchive)):
+        sale = sale_model.query.filter_by(id=sale_id, business_id=business_id).first()
+        if sale is not None:
+            return sale, item_model.query.filter_by(sale_id=sale.id).order_by(item_model.id).all()
+    return None, None
+
+
+def build_receipt(business, sale_id: int, fmt: str):
+    """Ruta del ticket en caché; lo genera la primera vez. None si la venta no existe."""
+    path = receipt_path(business.id, sale_id, fmt)
+    if os.path.exists(path):
+        return path
+
+    sale, items = _load_sale(business.id, sale_id)
+    if sale is None:
+        return None
+
+    data = render(fmt, business.name, sale, items, current_app.config["RECEIPT_COLUMNS"])
+
+    # escritura atómica: otro worker puede estar generando el mismo ticket
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.part"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def send_receipt(business, sale_id: int, fmt: str):
+    """Respuesta con el ticket (reimpresión): 304 si el cliente ya lo tiene,
+    del disco si ya se generó, y si no se genera una sola vez."""
+    if fmt not in FORMATS:
+        abort(404)
+
+    mimetype, ext = FORMATS[fmt]
+    etag = f"receipt-{business.id}-{sale_id}-v{RECEIPT_VERSION}-{fmt}"
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        path = build_receipt(business, sale_id, fmt)
+        if path is None:
+            abort(404)
+        response = send_file(path, mimetype=mimetype, etag=False, conditional=False,
+                             download_name=f"ticket-{sale_id}.{ext}", as_attachment=fmt == "escpos")
+
+    response.set_etag(etag)
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
@@ -1,9 +1,21 @@
-from flask import render_template, request, redirect, url_for, flash, abort, session
+from flask import render_template, request, redirect, url_for, flash, abort, session, jsonify, current_app
 from flask_login import login_required, current_user
 from . import sales_bp
 from ..extensions import db
-from ..models import Product, Sale, SaleItem, InventoryMovement
+from ..idempotency import idempotent
+from ..database import write_transaction
+from ..inventory.locations import (
+    business_locations, default_location, location_stock_map, resolve_location, stock_at_location
+)
+from ..models import CashSession, Product, Sale
+from .cash import CashError, close_session, current_session, open_session
+from .receipts import send_receipt
+from .services import TicketError, load_products, register_ticket
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+import uuid
+
+MAX_SYNC_BATCH = 200
 
 def _get_cart():
     cart = session.get("cart", [])
@@ -13,11 +25,21 @@ def _get_cart():
 
 def _save_cart(cart):
     session["cart"] = cart
+    # versión del carrito: la venta offline la guarda para vaciarlo solo si no cambió
+    session["cart_ref"] = uuid.uuid4().hex
     session.modified = True
 
 def _cart_total(cart):
     return sum(Decimal(str(i["total"])) for i in cart) if cart else Decimal("0.00")
 
+def _sale_location():
+    # ubicación de esta caja (elegida en la pantalla de venta); si no, la por defecto
+    business_id = current_user.business_id
+    return resolve_location(business_id, session.get("location_id")) or default_location(business_id)
+
+def _location_stock(product) -> int:
+    return stock_at_location(product.business_id, _sale_location().id, product.id)
+
 @sales_bp.get("/new")
 @login_required
 def new_sale():
@@ -48,20 +70,50 @@ def new_sale():
         business_id=current_user.business_id,
         is_active=True
     ).order_by(Product.stock.desc()).limit(12).all()
+
+    # el stock que se muestra y se valida es el de la ubicación de la caja
+    location = _sale_location()
     
     return render_template(
         "sales/new.html",
+        locations=business_locations(current_user.business_id),
+        location=location,
+        location_stock=location_stock_map(current_user.business_id, location.id),
         products=products,
         cart=cart,
         cart_total=cart_total,
         recent_sales=recent_sales,
         last_sale=last_sale,
-        quick_products=quick_products
+        quick_products=quick_products,
+        cart_ref=session.get("cart_ref"),
+        max_sync_batch=MAX_SYNC_BATCH
     )
 
 
+@sales_bp.post("/location")
+@login_required
+@write_transaction
+def set_location():
+    location = resolve_location(current_user.business_id, request.form.get("location_id"))
+    if location is None:
+        flash("Ubicación inválida.", "danger")
+    else:
+        session["location_id"] = location.id
+        flash(f"Vendiendo desde {location.name}.", "info")
+    return redirect(url_for("sales.new_sale"))
+
+
+@sales_bp.get("/<int:sale_id>/receipt.<fmt>")
+@login_required
+def receipt(sale_id, fmt):
+    # reimpresión: el ticket se genera una vez y luego sale de la caché en disco
+    return send_receipt(current_user.business, sale_id, fmt)
+
+
 @sales_bp.post("/new")
 @login_required
+@idempotent
+@write_transaction
 def create_sale():
     product_id = request.form.get("product_id")
     quantity = request.form.get("quantity", type=int)
@@ -81,57 +133,28 @@ def create_sale():
     if product.business_id != current_user.business_id:
         abort(403)
 
-    # No vender inactivos
-    if not product.is_active:
-        flash("Producto inactivo. Actívalo para vender.", "warning")
-        return redirect(url_for("sales.new_sale"))
-
-    # Stock suficiente
-    if product.stock < quantity:
-        flash("Stock insuficiente.", "danger")
+    # venta rápida de un producto: el mismo ticket (Sale + SaleItem + kardex) que el carrito
+    try:
+        sale = register_ticket(
+            current_user.business_id,
+            current_user.id,
+            [{"product_id": product.id, "quantity": quantity, "unit_price": product.price}],
+            products={product.id: product},
+            location_id=_sale_location().id
+        )
+        db.session.commit()
+    except TicketError as e:
+        db.session.rollback()
+        flash(str(e), "danger")
         return redirect(url_for("sales.new_sale"))
 
-    # Kardex: calcular before/after
-    stock_before = int(product.stock)
-    stock_after = stock_before - quantity
-
-    # Actualizar stock
-    product.stock = stock_after
-
-    # Registrar venta (guardamos nombre/precio por historial)
-    sale = Sale(
-        business_id=current_user.business_id,
-        product_id=product.id,
-        product_name=product.name,
-        unit_price=product.price,
-        quantity=quantity,
-        total=product.price * quantity
-    )
-
-    db.session.add(sale)
-    db.session.flush()  # ya existe sale.id sin commit
-
-    # Kardex: movimiento OUT por venta
-    movement = InventoryMovement(
-        business_id=current_user.business_id,
-        product_id=product.id,
-        user_id=current_user.id,
-        movement_type="out",
-        quantity=quantity,
-        stock_before=stock_before,
-        stock_after=stock_after,
-        note=f"Venta #{sale.id}"
-    )
-
-    db.session.add(movement)
-    db.session.commit()
-
     session["last_sale_id"] = sale.id
     flash("Venta registrada ✅", "success")
     return redirect(url_for("sales.new_sale"))
     
 @sales_bp.post("/cart/add")
 @login_required
+@write_transaction
 def cart_add():
     product_id = request.form.get("product_id")
     quantity = request.form.get("quantity", type=int)
@@ -155,7 +178,7 @@ def cart_add():
     # Validación stock considerando lo que ya está en carrito
     cart = _get_cart()
     in_cart_qty = sum(int(i["quantity"]) for i in cart if int(i["product_id"]) == product.id)
-    if product.stock < (in_cart_qty + quantity):
+    if _location_stock(product) < (in_cart_qty + quantity):
         flash("Stock insuficiente (considerando el carrito).", "danger")
         return redirect(url_for("sales.new_sale"))
 
@@ -189,6 +212,7 @@ def cart_remove(idx):
 
 @sales_bp.post("/cart/add-quick/<int:product_id>")
 @login_required
+@write_transaction
 def cart_add_quick(product_id):
     product = Product.query.get_or_404(product_id)
 
@@ -204,7 +228,7 @@ def cart_add_quick(product_id):
     # cantidad en carrito para validar stock
     in_cart_qty = sum(int(i["quantity"]) for i in cart if int(i["product_id"]) == product.id)
 
-    if int(product.stock) < (in_cart_qty + 1):
+    if _location_stock(product) < (in_cart_qty + 1):
         flash("Stock insuficiente (considerando el carrito).", "danger")
         return redirect(url_for("sales.new_sale"))
 
@@ -227,12 +251,26 @@ def cart_add_quick(product_id):
 @sales_bp.post("/cart/clear")
 @login_required
 def cart_clear():
-    session.pop("cart", None)
+    # desde la cola offline: solo si el carrito sigue siendo el del ticket sincronizado
+    cart_ref = request.form.get("cart_ref")
+    if cart_ref is not None:
+        if cart_ref != session.get("cart_ref"):
+            return "", 409
+        _clear_cart()
+        return "", 204
+
+    _clear_cart()
     flash("Carrito vaciado.", "info")
     return redirect(url_for("sales.new_sale"))
 
+def _clear_cart():
+    session.pop("cart", None)
+    session.pop("cart_ref", None)
+
 @sales_bp.post("/checkout")
 @login_required
+@idempotent(on_replay=_clear_cart)
+@write_transaction
 def checkout():
 
     cart = session.get("cart", [])
@@ -241,82 +279,183 @@ def checkout():
         flash("El carrito está vacío.", "warning")
         return redirect(url_for("sales.new_sale"))
 
-    try:
-        # ===== crear venta (ticket) =====
-        sale = Sale(
+    # clave del ticket generada en la caja (ver cola offline en sales/new.html)
+    client_ref = (request.form.get("client_ref") or "").strip()[:64] or None
+    if client_ref:
+        existing = Sale.query.filter_by(
             business_id=current_user.business_id,
-            total=0
-        )
-
-        db.session.add(sale)
-        db.session.flush()  # obtiene ID sin commit
+            client_ref=client_ref
+        ).first()
+        if existing:
+            _clear_cart()
+            flash(f"Venta #{existing.id} ya estaba registrada.", "info")
+            return redirect(url_for("sales.new_sale"))
 
-        total_sale = Decimal("0.00")
+    try:
+        sale = register_ticket(
+            current_user.business_id,
+            current_user.id,
+            cart,
+            client_ref=client_ref,
+            location_id=_sale_location().id
+        )
 
-        # ===== procesar items =====
-        for item in cart:
+        db.session.commit()
+        session["last_sale_id"] = sale.id
+        session.modified = True
 
-            product = Product.query.get(item["product_id"])
+        # ===== limpiar carrito =====
+        _clear_cart()
 
-            if not product:
-                raise Exception("Producto no encontrado")
+        flash(f"Venta #{sale.id} registrada ✅", "success")
 
-            if not product.is_active:
-                raise Exception(f"{product.name} está inactivo")
+    except TicketError as e:
+        db.session.rollback()
+        flash(str(e), "danger")
 
-            quantity = int(item["quantity"])
-            unit_price = Decimal(str(item["unit_price"]))
-            total = Decimal(str(item["total"]))
+    return redirect(url_for("sales.new_sale"))
 
-            if product.stock < quantity:
-                raise Exception(f"Stock insuficiente: {product.name}")
 
-            stock_before = product.stock
-            product.stock -= quantity
-            stock_after = product.stock
+# ===== caja (turnos) =====
 
-            # ---- SaleItem ----
-            sale_item = SaleItem(
-                sale_id=sale.id,
-                product_id=product.id,
-                product_name=product.name,
-                unit_price=unit_price,
-                quantity=quantity,
-                total=total
-            )
+@sales_bp.get("/cash")
+@login_required
+def cash():
+    business_id = current_user.business_id
 
-            db.session.add(sale_item)
+    closed_sessions = CashSession.query.filter(
+        CashSession.business_id == business_id,
+        CashSession.closed_at.isnot(None)
+    ).order_by(CashSession.opened_at.desc()).limit(20).all()
 
-            # ---- Kardex OUT ----
-            movement = InventoryMovement(
-                business_id=current_user.business_id,
-                product_id=product.id,
-                user_id=current_user.id,
-                movement_type="out",
-                quantity=quantity,
-                stock_before=stock_before,
-                stock_after=stock_after,
-                note=f"Venta #{sale.id}"
-            )
+    return render_template(
+        "sales/cash.html",
+        cash_session=current_session(business_id),
+        closed_sessions=closed_sessions
+    )
 
-            db.session.add(movement)
 
-            total_sale += total
+@sales_bp.post("/cash/open")
+@login_required
+@write_transaction
+def cash_open():
+    try:
+        open_session(current_user.business_id, current_user.id, request.form.get("opening_cash") or 0)
+        db.session.commit()
+        flash("Caja abierta ✅", "success")
+    except CashError as e:
+        db.session.rollback()
+        flash(str(e), "danger")
+    return redirect(url_for("sales.cash"))
 
-        # ===== actualizar total venta =====
-        sale.total = total_sale
 
+@sales_bp.post("/cash/close")
+@login_required
+@write_transaction
+def cash_close():
+    try:
+        cash_session = close_session(
+            current_user.business_id,
+            current_user.id,
+            request.form.get("counted_cash"),
+            note=request.form.get("note")
+        )
         db.session.commit()
-        session["last_sale_id"] = sale.id
-        session.modified = True
+        flash(f"Caja cerrada ✅ Diferencia: ${cash_session.difference:.2f}",
+              "success" if cash_session.difference == 0 else "warning")
+    except CashError as e:
+        db.session.rollback()
+        flash(str(e), "danger")
+    return redirect(url_for("sales.cash"))
 
-        # ===== limpiar carrito =====
-        session.pop("cart", None)
 
-        flash(f"Venta #{sale.id} registrada ✅", "success")
+def _ticket_time(value):
+    # hora real de la venta en la caja; si no es válida o viene del futuro, ahora.
+    # Una fecha fuera de la ventana offline es un error del ticket, no se reescribe.
+    now = datetime.utcnow()
+    try:
+        created_at = datetime.fromisoformat(str(value).replace("Z", "+00:00")) if value else None
+    except ValueError:
+        return now
+    if created_at is None:
+        return now
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if created_at > now:
+        return now
+
+    max_days = current_app.config["OFFLINE_TICKET_MAX_DAYS"]
+    if created_at < now - timedelta(days=max_days):
+        raise TicketError(
+            f"Venta del {created_at:%Y-%m-%d %H:%M}: más de {max_days} días offline, regístrala a mano"
+        )
+    return created_at
 
-    except Exception as e:
-        db.session.rollback()
-        flash(str(e), "danger")
 
-    return redirect(url_for("sales.new_sale"))
+@sales_bp.post("/sync")
+@login_required
+@idempotent
+@write_transaction
+def sync_tickets():
+    # Lote de tickets guardados offline en la caja:
+    # {"tickets": [{"key", "created_at", "items": [{"product_id", "quantity", "unit_price"}]}]}
+    payload = request.get_json(silent=True) or {}
+    tickets = payload.get("tickets")
+
+    if not isinstance(tickets, list):
+        return jsonify(error="Formato inválido: se espera {'tickets': [...]}"), 400
+
+    if len(tickets) > MAX_SYNC_BATCH:
+        return jsonify(error=f"Máximo {MAX_SYNC_BATCH} tickets por lote"), 400
+
+    business_id = current_user.business_id
+    keys = [str(t.get("key"))[:64] for t in tickets if isinstance(t, dict) and t.get("key")]
+
+    # tickets ya sincronizados (reintentos): una consulta para todo el lote
+    existing = dict(db.session.query(Sale.client_ref, Sale.id).filter(
+        Sale.business_id == business_id,
+        Sale.client_ref.in_(keys)
+    ).all()) if keys else {}
+
+    product_ids = {
+        i.get("product_id")
+        for t in tickets if isinstance(t, dict) and isinstance(t.get("items"), list)
+        for i in t["items"] if isinstance(i, dict) and str(i.get("product_id", "")).isdigit()
+    }
+    products = load_products(business_id, product_ids)
+    location_id = _sale_location().id
+
+    results = []
+    for t in tickets:
+        key = str(t.get("key") or "")[:64] if isinstance(t, dict) else ""
+        if not key:
+            results.append({"key": None, "status": "error", "error": "Falta key"})
+            continue
+
+        if key in existing:
+            results.append({"key": key, "status": "duplicate", "sale_id": existing[key]})
+            continue
+
+        try:
+            # savepoint por ticket: uno inválido no tumba el lote
+            with db.session.begin_nested():
+                created_at = _ticket_time(t.get("created_at"))
+                sale = register_ticket(
+                    business_id,
+                    current_user.id,
+                    t.get("items"),
+                    products=products,
+                    created_at=created_at,
+                    client_ref=key,
+                    note_suffix=" (offline)",
+                    location_id=location_id
+                )
+        except TicketError as e:
+            results.append({"key": key, "status": "error", "error": str(e)})
+            continue
+
+        existing[key] = sale.id
+        results.append({"key": key, "status": "created", "sale_id": sale.id})
+
+    db.session.commit()
+    return jsonify(results=results)
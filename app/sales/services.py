@@ -0,0 +1,134 @@
+from decimal import Decimal, InvalidOperation
+
+from ..extensions import db
+from ..inventory.locations import apply_stock, resolve_location, stock_rows
+from ..models import Product, Sale, SaleItem, InventoryMovement
+from .cash import record_sale
+
+
+class TicketError(Exception):
+    """Ticket inválido (producto, cantidad o stock); el mensaje es para el usuario."""
+
+
+def load_products(business_id: int, product_ids) -> dict:
+    # una sola consulta para todos los productos del ticket/lote
+    ids = set()
+    for pid in product_ids:
+        try:
+            ids.add(int(pid))
+        except (TypeError, ValueError):
+            pass  # id inválido: la línea se rechaza al registrar el ticket
+    if not ids:
+        return {}
+    return {
+        p.id: p for p in Product.query.filter(
+            Product.business_id == business_id,
+            Product.id.in_(ids)
+        )
+    }
+
+
+def register_ticket(business_id: int, user_id: int, items, products: dict = None,
+                    created_at=None, client_ref: str = None, note_suffix: str = "",
+                    location_id=None) -> Sale:
+    """Crea la venta (ticket) con sus SaleItem y el movimiento OUT de kardex
+    de cada línea, descontando stock de la ubicación (la por defecto si no se
+    indica), y la suma a la caja abierta. No hace commit.
+
+    `items`: [{"product_id", "quantity", "unit_price"}]. `products` permite
+    pasar los productos ya cargados (ver load_products).
+    """
+    if not items or not isinstance(items, list):
+        raise TicketError("El ticket no tiene productos.")
+
+    if not all(isinstance(i, dict) for i in items):
+        raise TicketError("Línea de ticket inválida")
+
+    if products is None:
+        products = load_products(business_id, [i.get("product_id") for i in items])
+
+    location = resolve_location(business_id, location_id)
+    if location is None:
+        raise TicketError("Ubicación inválida.")
+    # stock de la ubicación: una consulta por PK para todas las líneas del ticket
+    ticket_ids = set()
+    for item in items:
+        try:
+            ticket_ids.add(int(item["product_id"]))
+        except (KeyError, TypeError, ValueError):
+            pass  # la línea se rechaza abajo
+    location_stock = stock_rows(business_id, location.id, ticket_ids & products.keys())
+
+    sale = Sale(
+        business_id=business_id,
+        total=0,
+        client_ref=client_ref
+    )
+    if created_at:
+        sale.created_at = created_at
+
+    db.session.add(sale)
+    db.session.flush()  # obtiene ID sin commit
+
+    total_sale = Decimal("0.00")
+    units = 0
+
+    for item in items:
+        try:
+            product = products.get(int(item["product_id"]))
+            quantity = int(item["quantity"])
+            unit_price = Decimal(str(item["unit_price"]))
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise TicketError("Línea de ticket inválida")
+
+        if not unit_price.is_finite():
+            raise TicketError("Línea de ticket inválida")
+
+        if not product:
+            raise TicketError("Producto no encontrado")
+
+        if not product.is_active:
+            raise TicketError(f"{product.name} está inactivo")
+
+        if quantity <= 0 or unit_price < 0:
+            raise TicketError(f"Cantidad o precio inválido: {product.name}")
+
+        row = location_stock[product.id]
+        if row.stock < quantity:
+            raise TicketError(f"Stock insuficiente: {product.name}")
+
+        total = unit_price * quantity
+
+        # ---- SaleItem ----
+        db.session.add(SaleItem(
+            sale_id=sale.id,
+            product_id=product.id,
+            product_name=product.name,
+            unit_price=unit_price,
+            quantity=quantity,
+            total=total
+        ))
+
+        # ---- Kardex OUT ----
+        db.session.add(InventoryMovement(
+            business_id=business_id,
+            product_id=product.id,
+            user_id=user_id,
+            movement_type="out",
+            quantity=quantity,
+            note=f"Venta #{sale.id}{note_suffix}",
+            **apply_stock(product, row, -quantity)
+        ))
+
+        total_sale += total
+        units += quantity
+        if sale.first_product_name is None:
+            sale.first_product_name = product.name
+
+    sale.total = total_sale
+    sale.items_count = len(items)
+    sale.units_count = units
+
+    # turno de caja abierto: sus totales suben en esta misma transacción
+    record_sale(sale)
+    return sale
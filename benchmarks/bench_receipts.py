@@ -0,0 +1,81 @@
+"""Benchmark de tickets: render ESC/POS y PDF por ticket y lectura desde la caché.
+
+Genera tickets en memoria (sin base de datos) con --lines líneas y mide el
+render de cada formato; luego mide leer el mismo ticket ya guardado en disco,
+que es lo que hace una reimpresión. El objetivo es quedar en pocos ms por ticket.
+
+Uso:
+    python benchmarks/bench_receipts.py --tickets 2000 --lines 12
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.sales.receipts import render  # noqa: E402
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def _ticket(sale_id, lines):
+    items = [
+        SimpleNamespace(product_name=f"Producto de prueba número {i} (ñ)", quantity=i % 5 + 1,
+                        unit_price=Decimal("12.50"), total=Decimal("12.50") * (i % 5 + 1))
+        for i in range(lines)
+    ]
+    sale = SimpleNamespace(id=sale_id, created_at=datetime.utcnow(), total=sum(i.total for i in items))
+    return sale, items
+
+
+def _report(name, latencies):
+    print(
+        f"{name:<14} n={len(latencies):<6} p50={_percentile(latencies, 50):6.3f}ms  "
+        f"p95={_percentile(latencies, 95):6.3f}ms  max={max(latencies):6.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=12, help="líneas por ticket")
+    parser.add_argument("--width", type=int, default=42, help="columnas de la impresora")
+    args = parser.parse_args()
+
+    tickets = [_ticket(n, args.lines) for n in range(1, args.tickets + 1)]
+
+    with tempfile.TemporaryDirectory() as folder:
+        for fmt in ("escpos", "pdf"):
+            latencies = []
+            for sale, items in tickets:
+                t0 = time.perf_counter()
+                data = render(fmt, "Tienda de prueba", sale, items, args.width)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            _report(f"render {fmt}", latencies)
+
+            # reimpresión: el archivo ya está en la caché
+            path = os.path.join(folder, f"ticket.{fmt}")
+            with open(path, "wb") as f:
+                f.write(data)
+            latencies = []
+            for _ in tickets:
+                t0 = time.perf_counter()
+                with open(path, "rb") as f:
+                    f.read()
+                latencies.append((time.perf_counter() - t0) * 1000)
+            _report(f"caché {fmt}", latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark de contención de escrituras en SQLite con varios procesos.
+
+Simula N workers de gunicorn haciendo "checkouts" concurrentes sobre el mismo
+archivo: leer stock, descontarlo y registrar el movimiento en una transacción.
+Compara la configuración por defecto del driver contra el perfil de
+app.database (WAL, synchronous=NORMAL, busy_timeout, BEGIN IMMEDIATE).
+
+Uso:
+    python benchmarks/bench_sqlite_writes.py --procs 4 --tx 300
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask, g
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.config import Config  # noqa: E402
+from app.database import engine_options, install_engine_events  # noqa: E402
+
+SCHEMA = [
+    "CREATE TABLE product (id INTEGER PRIMARY KEY, stock INTEGER NOT NULL)",
+    "CREATE TABLE movement (id INTEGER PRIMARY KEY, product_id INTEGER, "
+    "stock_before INTEGER, stock_after INTEGER, note TEXT)",
+]
+
+
+def _config(url):
+    config = {k: getattr(Config, k) for k in dir(Config) if k.isupper()}
+    config["SQLALCHEMY_DATABASE_URI"] = url
+    return config
+
+
+def _engine(url, tuned):
+    if not tuned:
+        return create_engine(url)
+    config = _config(url)
+    engine = create_engine(url, **engine_options(config))
+    install_engine_events(engine, config)
+    return engine
+
+
+def _worker(url, tuned, tx, products, queue):
+    engine = _engine(url, tuned)
+    app = Flask(__name__)
+    latencies, errors = [], 0
+
+    with app.app_context():
+        g.db_write = True  # como una vista marcada con @write_transaction
+        for i in range(tx):
+            product_id = (os.getpid() + i) % products + 1
+            t0 = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    before = conn.execute(
+                        text("SELECT stock FROM product WHERE id = :id"), {"id": product_id}
+                    ).scalar()
+                    conn.execute(
+                        text("UPDATE product SET stock = :s WHERE id = :id"),
+                        {"s": before - 1, "id": product_id}
+                    )
+                    conn.execute(
+                        text("INSERT INTO movement (product_id, stock_before, stock_after, note) "
+                             "VALUES (:p, :b, :a, 'venta')"),
+                        {"p": product_id, "b": before, "a": before - 1}
+                    )
+                latencies.append((time.perf_counter() - t0) * 1000)
+            except OperationalError:
+                errors += 1
+
+    engine.dispose()
+    queue.put((latencies, errors))
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run(name, tuned, procs, tx, products):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    url = f"sqlite:///{path}"
+
+    setup = _engine(url, tuned)
+    with setup.begin() as conn:
+        for stmt in SCHEMA:
+            conn.execute(text(stmt))
+        conn.execute(
+            text("INSERT INTO product (id, stock) VALUES (:id, :s)"),
+            [{"id": i, "s": 10 ** 6} for i in range(1, products + 1)]
+        )
+    setup.dispose()
+
+    queue = mp.Queue()
+    workers = [mp.Process(target=_worker, args=(url, tuned, tx, products, queue)) for _ in range(procs)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    results = [queue.get() for _ in workers]
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for lat, _ in results for ms in lat]
+    errors = sum(err for _, err in results)
+
+    # consistencia: stock + movimientos debe cuadrar
+    check = _engine(url, False)
+    with check.connect() as conn:
+        moved = conn.execute(text("SELECT COUNT(*) FROM movement")).scalar()
+        sold = conn.execute(text("SELECT SUM(:s - stock) FROM product"), {"s": 10 ** 6}).scalar()
+    check.dispose()
+
+    print(
+        f"{name:<8} ok={len(latencies):<6} locked={errors:<5} tps={len(latencies) / elapsed:8.1f}  "
+        f"p50={_percentile(latencies, 50):7.2f}ms  p99={_percentile(latencies, 99):7.2f}ms  "
+        f"max={max(latencies or [0]):8.2f}ms  {'cuadra' if moved == sold else 'NO CUADRA'}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--tx", type=int, default=300, help="transacciones por proceso")
+    parser.add_argument("--products", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"procesos={args.procs} transacciones/proceso={args.tx}")
+    run("default", False, args.procs, args.tx, args.products)
+    run("perfil", True, args.procs, args.tx, args.products)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Benchmark de modelos de workers de gunicorn con la mezcla de un POS.
+
+Levanta gunicorn con gunicorn.conf.py para cada WEB_WORKER_CLASS y lo carga
+con clientes concurrentes: dashboard, lista de productos, reportes, ventas
+por la API y algún export CSV de 30 días, mientras hay dashboards abiertos
+con su stream SSE. Reporta requests/s por núcleo y latencias.
+
+Uso:
+    python benchmarks/bench_workers.py --seconds 20 --clients 16 --streams 40
+
+Cada stream se reporta como aceptado (200) o rechazado (204: el worker ya
+tiene LIVE_MAX_STREAMS abiertos y ese dashboard pasa a polling con ETag).
+
+Resultado de referencia (1 núcleo compartido con el generador de carga,
+SQLite, 16 clientes, 500 ventas previas, 10s; perfiles por defecto):
+
+    sin streams SSE            req/s/núcleo   p50      p95      errores
+    sync     (3 workers)           95.3      160ms    236ms     13
+    gthread  (2 x 8 hilos)         96.9       67ms    613ms      0
+    gevent   (1 x 200)            117.5        8ms    925ms      0
+
+    con 40 dashboards abiertos (SSE)                          streams
+    sync                           84.8      176ms    277ms     13    0/40
+    gthread  (tope 4 por worker)   90.2      171ms    385ms      1    4/40
+    gthread  (sin tope)            60.7       22ms    200ms     13    8/40  (hilos tomados)
+    gevent   (tope 150)           108.7        8ms    889ms      0   40/40
+
+Sin tope, en gthread los streams se quedan con los hilos y las ventas
+esperan o fallan; con el tope los dashboards de más hacen polling (304
+baratos) y el POS conserva su throughput. Con Postgres + psycogreen,
+gevent es el perfil para muchos dashboards en vivo.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+
+# mezcla: (peso, método, ruta)
+MIX = [
+    (40, "GET", "/dashboard"),
+    (20, "GET", "/products/"),
+    (15, "GET", "/reports/?days=7"),
+    (20, "POST", "/api/v1/sales"),
+    (5, "GET", "/reports/export/csv?days=30"),
+]
+
+
+def _setup(db_path, products, history):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    from app import create_app
+    from app.extensions import db
+    from app.models import Product
+    from app.api.tokens import create_token
+    from app.inventory.kardex import register_movement
+    from app.sales.services import register_ticket
+
+    app = create_app()
+    with app.app_context():
+        db.create_all(bind_key=None)
+
+    client = app.test_client()
+    client.post("/auth/register", data={"business_name": "Bench", "email": "bench@x.com", "password": "pw"})
+    cookie = client.get_cookie("session").value
+
+    with app.app_context():
+        from app.models import User
+        user = User.query.filter_by(email="bench@x.com").first()
+        for i in range(products):
+            product = Product(business_id=user.business_id, name=f"Producto {i}", price=10, stock=0, is_active=True)
+            db.session.add(product)
+            db.session.flush()
+            # el stock vive por ubicación: entra por el kardex a la ubicación por defecto
+            register_movement(product, "in", 10 ** 6, user.id)
+        db.session.commit()
+
+        # historial para que los reportes/exports tengan filas
+        for _ in range(history):
+            register_ticket(user.business_id, user.id, [
+                {"product_id": random.randint(1, products), "quantity": 1, "unit_price": "10"}
+            ])
+        db.session.commit()
+
+        token = create_token(user, "bench")
+
+        # cierra las conexiones: SQLite vuelca el WAL al archivo antes de copiarlo
+        db.session.remove()
+        db.engine.dispose()
+
+    return cookie, token
+
+
+def _start(worker_class, port, db_path):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "WEB_WORKER_CLASS": worker_class,
+        "PORT": str(port),
+        "LIVE_STREAM_SECONDS": "3600",
+    })
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "run:app"],
+        cwd=ROOT, env=env
+    )
+
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"gunicorn ({worker_class}) no arrancó")
+
+
+def _stream(port, cookie, stop, streams):
+    # dashboard abierto: mantiene la conexión SSE hasta el final
+    # (204 = el worker llegó a LIVE_MAX_STREAMS y el dashboard haría polling)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("GET", "/dashboard/stream", headers={"Cookie": f"session={cookie}"})
+        resp = conn.getresponse()
+        streams.append(resp.status)
+        if resp.status != 200:
+            return
+        while not stop.is_set():
+            try:
+                resp.fp.readline()
+            except OSError:
+                pass
+    except OSError:
+        streams.append(None)
+
+
+def _client(port, cookie, token, stop, results, timeout):
+    weights = [w for w, _, _ in MIX]
+    conn = None
+    while not stop.is_set():
+        _, method, path = random.choices(MIX, weights=weights)[0]
+        headers = {"Cookie": f"session={cookie}"}
+        body = None
+        if method == "POST":
+            headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+            body = '{"items":[{"product_id":%d,"quantity":1,"unit_price":"10"}]}' % random.randint(1, 20)
+
+        t0 = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status < 500
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn = None
+        results.append((path.split("?")[0], ok, (time.perf_counter() - t0) * 1000))
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run(worker_class, args, cookie, token, db_path, port):
+    proc = _start(worker_class, port, db_path)
+    stop = threading.Event()
+    results = []
+    stream_status = []
+
+    streams = [threading.Thread(target=_stream, args=(port, cookie, stop, stream_status), daemon=True)
+               for _ in range(args.streams)]
+    for t in streams:
+        t.start()
+    time.sleep(1.0)
+
+    clients = [threading.Thread(target=_client, args=(port, cookie, token, stop, results, args.timeout), daemon=True)
+               for _ in range(args.clients)]
+    started = time.perf_counter()
+    for t in clients:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    elapsed = time.perf_counter() - started
+
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+    ok = [ms for _, good, ms in results if good]
+    errors = len(results) - len(ok)
+    cores = multiprocessing.cpu_count()
+    rps = len(ok) / elapsed
+
+    print(
+        f"{worker_class:<8} req/s={rps:7.1f}  req/s/núcleo={rps / cores:7.1f}  errores={errors:<5} "
+        f"p50={_percentile(ok, 50):7.1f}ms  p95={_percentile(ok, 95):7.1f}ms  p99={_percentile(ok, 99):7.1f}ms  "
+        f"streams={stream_status.count(200)}/{args.streams} (204={stream_status.count(204)})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--classes", default="sync,gthread,gevent")
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--streams", type=int, default=40, help="dashboards abiertos con SSE")
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--history", type=int, default=2000, help="ventas previas")
+    parser.add_argument("--timeout", type=float, default=10.0, help="timeout por request (s)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"núcleos={multiprocessing.cpu_count()} clientes={args.clients} streams={args.streams} "
+          f"duración={args.seconds}s")
+
+    # una base preparada y una copia limpia por modelo de worker
+    base = os.path.join(tempfile.mkdtemp(), "base.db")
+    cookie, token = _setup(base, args.products, args.history)
+
+    for i, worker_class in enumerate(args.classes.split(",")):
+        db_path = os.path.join(os.path.dirname(base), f"{worker_class}.db")
+        shutil.copy(base, db_path)
+        run(worker_class, args, cookie, token, db_path, args.port + i)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Perfiles de gunicorn (se carga solo: `gunicorn run:app` desde la raíz).
+
+WEB_WORKER_CLASS elige el modelo de workers:
+
+  gthread (default)  N procesos x T hilos. Un export lento, una subida de
+                     comprobante o un stream SSE ocupa un hilo, no el worker.
+                     Sirve con SQLite y con Postgres.
+  gevent             N procesos x cientos de greenlets (gevent + psycogreen).
+                     Para muchos streams SSE abiertos. Solo con Postgres:
+                     sqlite3 bloquea el proceso entero mientras espera.
+  sync               un request por proceso (el comportamiento anterior).
+
+Conexiones a la base: cada worker tiene su propio pool (DB_POOL_SIZE +
+DB_MAX_OVERFLOW). En gthread conviene pool >= hilos; en gevent el pool es
+el límite real de concurrencia contra la base y los greenlets esperan hasta
+DB_POOL_TIMEOUT. Los streams y exports largos sueltan la conexión antes de
+empezar a enviar.
+
+Streams SSE del dashboard: cada uno retiene un hilo (gthread) o greenlet
+(gevent) hasta LIVE_STREAM_SECONDS. LIVE_MAX_STREAMS los limita por worker
+(por defecto: la mitad de los hilos en gthread, 3/4 de las conexiones en
+gevent, ninguno en sync); los dashboards de más hacen polling con ETag.
+
+Sesiones en gevent: Flask-SQLAlchemy asocia la sesión al app context, que
+vive en contextvars y gevent aísla por greenlet; cada request tiene su
+sesión. No compartir sesiones ni objetos ORM entre greenlets/hilos.
+
+Throughput por núcleo de cada perfil con la mezcla POS: ver
+benchmarks/bench_workers.py.
+"""
+import multiprocessing
+import os
+
+worker_class = os.environ.get("WEB_WORKER_CLASS", "gthread")
+cores = multiprocessing.cpu_count()
+
+if worker_class == "gevent":
+    workers = int(os.environ.get("WEB_CONCURRENCY", cores))
+    worker_connections = int(os.environ.get("WEB_WORKER_CONNECTIONS", 200))
+elif worker_class == "gthread":
+    workers = int(os.environ.get("WEB_CONCURRENCY", cores + 1))
+    threads = int(os.environ.get("WEB_THREADS", 8))
+else:
+    worker_class = "sync"
+    workers = int(os.environ.get("WEB_CONCURRENCY", 2 * cores + 1))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# gthread/gevent: el timeout vigila al worker, no a cada request; un stream
+# SSE abierto no lo dispara. En sync sí corta requests largos.
+timeout = int(os.environ.get("WEB_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", 5))
+
+# recicla workers de a poco (fugas de memoria en procesos largos)
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 200))
+
+
+_sqlite = os.environ.get("DATABASE_URL", "sqlite").startswith("sqlite")
+
+
+def when_ready(server):
+    if worker_class == "gevent" and _sqlite:
+        server.log.warning("gevent con SQLite: cada consulta bloquea todo el worker; usa gthread")
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent" and not _sqlite:
+        # psycopg2 cede el control al hub mientras espera a Postgres
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
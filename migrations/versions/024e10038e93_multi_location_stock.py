@@ -0,0 +1,122 @@
+"""Add multi-location stock and per-location kardex
+
+Revision ID: 024e10038e93
+Revises: 7fd88bdb3232
+Create Date: 2026-10-19 12:14:27.747609
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '024e10038e93'
+down_revision = '7fd88bdb3232'
+branch_labels = None
+depends_on = None
+
+
+BATCH = 10000
+
+
+def _backfill_movements(table):
+    # todo lo anterior estaba en la única ubicación: la por defecto de cada negocio
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text(f'SELECT max(id) FROM {table}')).scalar() or 0
+
+    for lo in range(0, max_id, BATCH):
+        conn.execute(sa.text(
+            f'UPDATE {table} SET '
+            f'location_id = (SELECT l.id FROM location l '
+            f'WHERE l.business_id = {table}.business_id AND l.is_default = :t), '
+            f'location_stock_before = stock_before, location_stock_after = stock_after '
+            f'WHERE id > :lo AND id <= :hi'
+        ), {'lo': lo, 'hi': lo + BATCH, 't': True})
+
+
+def upgrade():
+    op.create_table('location',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=80), nullable=False),
+    sa.Column('is_default', sa.Boolean(), server_default=sa.false(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), server_default=sa.true(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('business_id', 'name', name='uq_location_business_name')
+    )
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_location_business_id'), ['business_id'], unique=False)
+
+    op.create_table('location_stock',
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.ForeignKeyConstraint(['location_id'], ['location.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('business_id', 'location_id', 'product_id')
+    )
+    with op.batch_alter_table('location_stock', schema=None) as batch_op:
+        batch_op.create_index('ix_location_stock_product', ['product_id'], unique=False)
+
+    # ubicación por defecto por negocio, con todo el stock actual
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        "INSERT INTO location (business_id, name, is_default, is_active, created_at) "
+        "SELECT id, 'Principal', :t, :t, CURRENT_TIMESTAMP FROM business"
+    ), {'t': True})
+    conn.execute(sa.text(
+        'INSERT INTO location_stock (business_id, location_id, product_id, stock) '
+        'SELECT p.business_id, l.id, p.id, coalesce(p.stock, 0) FROM product p '
+        'JOIN location l ON l.business_id = p.business_id AND l.is_default = :t'
+    ), {'t': True})
+
+    with op.batch_alter_table('inventory_movement', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('location_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('location_stock_before', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('location_stock_after', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('transfer_pair_id', sa.Integer(), nullable=True))
+
+    with op.batch_alter_table('inventory_movement_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('location_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('location_stock_before', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('location_stock_after', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('transfer_pair_id', sa.Integer(), nullable=True))
+
+    _backfill_movements('inventory_movement')
+    _backfill_movements('inventory_movement_archive')
+
+    with op.batch_alter_table('inventory_movement', schema=None) as batch_op:
+        batch_op.alter_column('location_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('location_stock_before', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('location_stock_after', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index('ix_inventory_movement_location_product_created', ['location_id', 'product_id', 'created_at'], unique=False)
+        batch_op.create_foreign_key('fk_inventory_movement_location_id', 'location', ['location_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('inventory_movement_archive', schema=None) as batch_op:
+        batch_op.drop_column('transfer_pair_id')
+        batch_op.drop_column('location_stock_after')
+        batch_op.drop_column('location_stock_before')
+        batch_op.drop_column('location_id')
+
+    with op.batch_alter_table('inventory_movement', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_inventory_movement_location_id', type_='foreignkey')
+        batch_op.drop_index('ix_inventory_movement_location_product_created')
+        batch_op.drop_column('transfer_pair_id')
+        batch_op.drop_column('location_stock_after')
+        batch_op.drop_column('location_stock_before')
+        batch_op.drop_column('location_id')
+
+    with op.batch_alter_table('location_stock', schema=None) as batch_op:
+        batch_op.drop_index('ix_location_stock_product')
+
+    op.drop_table('location_stock')
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_location_business_id'))
+
+    op.drop_table('location')
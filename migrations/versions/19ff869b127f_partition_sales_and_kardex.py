@@ -0,0 +1,161 @@
+"""Partition sales and kardex by month (Postgres, optional)
+
+Revision ID: 19ff869b127f
+Revises: 64fbcb1fd1da
+Create Date: 2026-10-19 19:12:05.418733
+
+En todas las bases: sale.created_at e inventory_movement.created_at pasan a
+NOT NULL (clave de partición).
+
+En Postgres, solo con `flask db upgrade -x partition=true`: sale e
+inventory_movement pasan a tablas particionadas por RANGE (created_at), una
+partición por mes (<tabla>_pYYYYMM) más <tabla>_default. Los meses futuros los
+crea `flask partitions ensure`. La PK pasa a (id, created_at) y el único de
+client_ref a (business_id, client_ref, created_at); las FK que apuntaban a
+sale.id / inventory_movement.id se quitan (Postgres no las admite hacia una
+tabla particionada sin la clave de partición).
+"""
+from datetime import date, datetime
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '19ff869b127f'
+down_revision = '64fbcb1fd1da'
+branch_labels = None
+depends_on = None
+
+PARTITIONED = ('sale', 'inventory_movement')
+MONTHS_AHEAD = 3
+
+# FKs hacia las tablas particionadas (se recrean al volver a tablas normales)
+REFERENCING_FKS = {
+    'sale': [('sale_item', 'sale_id')],
+    'inventory_movement': [('stock_snapshot', 'movement_id'), ('kardex_issue', 'movement_id')],
+}
+
+
+def _wants_partitioning():
+    return (op.get_bind().dialect.name == 'postgresql'
+            and context.get_x_argument(as_dictionary=True).get('partition') == 'true')
+
+
+def _is_partitioned(conn, table):
+    return bool(conn.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"), {'t': table}
+    ).scalar())
+
+
+def _next_month(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _constraint_defs(conn, table, kind):
+    return conn.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(:t) AND contype = :kind"
+    ), {'t': table, 'kind': kind}).all()
+
+
+def _index_defs(conn, table):
+    # índices que no respaldan una constraint (PK/unique se recrean aparte)
+    return conn.execute(sa.text(
+        "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+        "JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = to_regclass(:t) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)"
+    ), {'t': table}).all()
+
+
+def _swap(conn, table, new_table, create_sql, after_create=None):
+    """Copia `table` a una tabla nueva creada con `create_sql` y la reemplaza,
+    conservando la secuencia del id, las FK salientes y los índices."""
+    fks = _constraint_defs(conn, table, 'f')
+    indexes = _index_defs(conn, table)
+    seq = conn.execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {'t': table}).scalar()
+
+    op.execute(create_sql)
+    if after_create:
+        after_create()
+    op.execute(f'INSERT INTO {new_table} SELECT * FROM {table}')
+
+    if seq:
+        op.execute(f'ALTER SEQUENCE {seq} OWNED BY NONE')
+    # CASCADE también quita las FK de otras tablas hacia esta
+    op.execute(f'DROP TABLE {table} CASCADE')
+    op.execute(f'ALTER TABLE {new_table} RENAME TO {table}')
+    if seq:
+        op.execute(f'ALTER SEQUENCE {seq} OWNED BY {table}.id')
+
+    for name, definition in fks:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+    for name, definition in indexes:
+        # en la tabla particionada el índice del padre sale como "ON ONLY"
+        op.execute(definition.replace(' ON ONLY ', ' ON '))
+
+
+def _partition(conn, table):
+    first = conn.execute(sa.text(f'SELECT min(created_at) FROM {table}')).scalar() or datetime.utcnow()
+    last = date.today()
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+
+    new_table = f'{table}_partitioned'
+
+    def create_partitions():
+        # nombres finales desde ya: al renombrar el padre, las particiones no cambian
+        month = date(first.year, first.month, 1)
+        while month < last:
+            nxt = _next_month(month)
+            op.execute(f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {new_table} "
+                       f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{nxt:%Y-%m-%d}')")
+            month = nxt
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {new_table} DEFAULT')
+
+    _swap(conn, table, new_table,
+          f'CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)',
+          after_create=create_partitions)
+
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)')
+    if table == 'sale':
+        op.execute('ALTER TABLE sale ADD CONSTRAINT uq_sale_business_client_ref '
+                   'UNIQUE (business_id, client_ref, created_at)')
+
+
+def _unpartition(conn, table):
+    new_table = f'{table}_plain'
+    _swap(conn, table, new_table, f'CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS)')
+
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+    if table == 'sale':
+        op.execute('ALTER TABLE sale ADD CONSTRAINT uq_sale_business_client_ref UNIQUE (business_id, client_ref)')
+    for ref_table, column in REFERENCING_FKS[table]:
+        op.execute(f'ALTER TABLE {ref_table} ADD FOREIGN KEY ({column}) REFERENCES {table} (id)')
+
+
+def upgrade():
+    now = datetime.utcnow()
+    for table in PARTITIONED:
+        op.get_bind().execute(sa.text(f'UPDATE {table} SET created_at = :now WHERE created_at IS NULL'), {'now': now})
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+    if _wants_partitioning():
+        conn = op.get_bind()
+        for table in PARTITIONED:
+            if not _is_partitioned(conn, table):
+                _partition(conn, table)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        conn = op.get_bind()
+        for table in PARTITIONED:
+            if _is_partitioned(conn, table):
+                _unpartition(conn, table)
+
+    for table in PARTITIONED:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,94 @@
+"""Retire legacy single-product sales
+
+Revision ID: 1deaf77abbfc
+Revises: 863582c96009
+Create Date: 2026-10-19 12:04:31.554655
+
+Las ventas antiguas de un solo producto (product_id/quantity en sale, sin
+sale_item) pasan a tener su línea en sale_item, y sale pierde esas columnas:
+todas las ventas son ticket + líneas. Igual para sale_archive/sale_item_archive.
+
+El downgrade vuelve a crear las columnas (vacías); las líneas convertidas se
+quedan en sale_item, que es de donde ya leían los reportes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1deaf77abbfc'
+down_revision = '863582c96009'
+branch_labels = None
+depends_on = None
+
+BATCH = 10000
+
+LEGACY_COLUMNS = ('product_id', 'product_name', 'unit_price', 'quantity')
+
+
+def _convert(sale_table, item_table, item_id=None):
+    """Una línea por venta antigua, por lotes de ids de venta."""
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text(f'SELECT max(id) FROM {sale_table}')).scalar() or 0
+
+    target = 'sale_id, product_id, product_name, unit_price, quantity, total'
+    values = ("s.id, s.product_id, coalesce(s.product_name, p.name, ''), "
+              "coalesce(s.unit_price, s.total / nullif(s.quantity, 0), 0), coalesce(s.quantity, 1), s.total")
+    if item_id:
+        target, values = f'id, {target}', f'{item_id}, {values}'
+
+    for lo in range(0, max_id, BATCH):
+        conn.execute(sa.text(
+            f'INSERT INTO {item_table} ({target}) SELECT {values} '
+            f'FROM {sale_table} s LEFT JOIN product p ON p.id = s.product_id '
+            f'WHERE s.id > :lo AND s.id <= :hi AND s.product_id IS NOT NULL '
+            f'AND NOT EXISTS (SELECT 1 FROM {item_table} i WHERE i.sale_id = s.id)'
+        ), {'lo': lo, 'hi': lo + BATCH})
+
+
+def upgrade():
+    # cada lote en su propia transacción: la migración corre en una sola
+    # transacción y, sin esto, los locks de todos los lotes durarían hasta el
+    # final. Si se corta, repetirla salta las ventas que ya tienen línea
+    with op.get_context().autocommit_block():
+        _convert('sale', 'sale_item')
+        # sale_item_archive no tiene secuencia: -id de la venta no choca con los ids de sale_item
+        _convert('sale_archive', 'sale_item_archive', '-s.id')
+
+    # drop_column también quita la FK de sale.product_id
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sale_product_id'))
+        for column in LEGACY_COLUMNS:
+            batch_op.drop_column(column)
+
+    with op.batch_alter_table('sale_archive', schema=None) as batch_op:
+        for column in LEGACY_COLUMNS:
+            batch_op.drop_column(column)
+
+    with op.batch_alter_table('sale_item', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sale_item_product_id'), ['product_id'], unique=False)
+
+    with op.batch_alter_table('sale_item_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sale_item_archive_product_id'), ['product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sale_item_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sale_item_archive_product_id'))
+
+    with op.batch_alter_table('sale_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sale_item_product_id'))
+
+    with op.batch_alter_table('sale_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity', sa.INTEGER(), nullable=True))
+        batch_op.add_column(sa.Column('unit_price', sa.NUMERIC(precision=10, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('product_name', sa.VARCHAR(length=150), nullable=True))
+        batch_op.add_column(sa.Column('product_id', sa.INTEGER(), nullable=True))
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity', sa.INTEGER(), nullable=True))
+        batch_op.add_column(sa.Column('unit_price', sa.NUMERIC(precision=10, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('product_name', sa.VARCHAR(length=150), nullable=True))
+        batch_op.add_column(sa.Column('product_id', sa.INTEGER(), nullable=True))
+        batch_op.create_foreign_key('sale_product_id_fkey', 'product', ['product_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_sale_product_id'), ['product_id'], unique=False)
@@ -0,0 +1,47 @@
+"""Add inventory unit cost and valuation periods
+
+Revision ID: 3e3d14e1d68c
+Revises: 8fbd22f05075
+Create Date: 2026-10-19 11:26:50.204417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e3d14e1d68c'
+down_revision = '8fbd22f05075'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('inventory_movement', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unit_cost', sa.Numeric(precision=10, scale=2), nullable=True))
+
+    op.create_table('valuation_period',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=7), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('avg_cost', sa.Numeric(precision=12, scale=4), nullable=False),
+    sa.Column('value_avg', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('value_fifo', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('cogs_avg', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('cogs_fifo', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('fifo_layers', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('business_id', 'period', 'product_id', name='uq_valuation_period_product')
+    )
+
+
+def downgrade():
+    op.drop_table('valuation_period')
+
+    with op.batch_alter_table('inventory_movement', schema=None) as batch_op:
+        batch_op.drop_column('unit_cost')
@@ -0,0 +1,26 @@
+"""Add business data version
+
+Revision ID: 53451fac84b7
+Revises: 8bc674e36b67
+Create Date: 2026-10-19 16:05:44.702915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '53451fac84b7'
+down_revision = '8bc674e36b67'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('business', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('business', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
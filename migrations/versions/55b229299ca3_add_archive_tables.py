@@ -0,0 +1,98 @@
+"""Add archive tables for sales and kardex
+
+Revision ID: 55b229299ca3
+Revises: 19ff869b127f
+Create Date: 2026-10-19 12:00:53.654738
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '55b229299ca3'
+down_revision = '19ff869b127f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('archived_period',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('sales', sa.Integer(), nullable=False),
+    sa.Column('sale_items', sa.Integer(), nullable=False),
+    sa.Column('movements', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('month')
+    )
+    op.create_table('inventory_movement_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('movement_type', sa.String(length=20), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('stock_before', sa.Integer(), nullable=False),
+    sa.Column('stock_after', sa.Integer(), nullable=False),
+    sa.Column('unit_cost', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('note', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('inventory_movement_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_inventory_movement_archive_business_created', ['business_id', 'created_at'], unique=False)
+
+    op.create_table('sale_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('product_name', sa.String(length=150), nullable=True),
+    sa.Column('unit_price', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('client_ref', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sale_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_sale_archive_business_created', ['business_id', 'created_at'], unique=False)
+
+    op.create_table('sale_item_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('sale_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('product_name', sa.String(length=150), nullable=False),
+    sa.Column('unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sale_item_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sale_item_archive_sale_id'), ['sale_id'], unique=False)
+
+
+SALE_COLUMNS = 'id, business_id, product_id, product_name, unit_price, quantity, total, client_ref, created_at'
+SALE_ITEM_COLUMNS = 'id, sale_id, product_id, product_name, unit_price, quantity, total'
+MOVEMENT_COLUMNS = ('id, business_id, product_id, user_id, movement_type, quantity, '
+                    'stock_before, stock_after, unit_cost, note, created_at')
+
+
+def downgrade():
+    # lo archivado vuelve a las tablas calientes antes de borrar el archivo
+    for table, columns in (('sale', SALE_COLUMNS), ('sale_item', SALE_ITEM_COLUMNS),
+                           ('inventory_movement', MOVEMENT_COLUMNS)):
+        op.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_archive')
+
+    with op.batch_alter_table('sale_item_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sale_item_archive_sale_id'))
+
+    op.drop_table('sale_item_archive')
+    with op.batch_alter_table('sale_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_sale_archive_business_created')
+
+    op.drop_table('sale_archive')
+    with op.batch_alter_table('inventory_movement_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_inventory_movement_archive_business_created')
+
+    op.drop_table('inventory_movement_archive')
+    op.drop_table('archived_period')
\ No newline at end of file
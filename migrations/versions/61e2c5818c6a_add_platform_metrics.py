@@ -0,0 +1,67 @@
+"""Add platform metrics
+
+Revision ID: 61e2c5818c6a
+Revises: f4dc84e3f602
+Create Date: 2026-10-19 11:54:46.994597
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '61e2c5818c6a'
+down_revision = 'f4dc84e3f602'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('platform_daily_metric',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('tenants_total', sa.Integer(), nullable=False),
+    sa.Column('tenants_pro', sa.Integer(), nullable=False),
+    sa.Column('tenants_active', sa.Integer(), nullable=False),
+    sa.Column('trials_active', sa.Integer(), nullable=False),
+    sa.Column('trials_expiring', sa.Integer(), nullable=False),
+    sa.Column('conversions', sa.Integer(), nullable=False),
+    sa.Column('mrr', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('sales_count', sa.Integer(), nullable=False),
+    sa.Column('sales_total', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('tenant_daily_stats',
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('sales_count', sa.Integer(), nullable=False),
+    sa.Column('sales_total', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.PrimaryKeyConstraint('business_id', 'day')
+    )
+    with op.batch_alter_table('tenant_daily_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tenant_daily_stats_day'), ['day'], unique=False)
+
+    op.add_column('business', sa.Column('pro_since', sa.DateTime(), nullable=True))
+
+    # contadores iniciales desde el historial de ventas
+    op.execute(
+        "INSERT INTO tenant_daily_stats (business_id, day, sales_count, sales_total) "
+        "SELECT business_id, date(created_at), count(id), coalesce(sum(total), 0) "
+        "FROM sale WHERE created_at IS NOT NULL GROUP BY business_id, date(created_at)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('business', schema=None) as batch_op:
+        batch_op.drop_column('pro_since')
+
+    # SQLite: la reconstrucción de batch pierde el índice por expresión (f4dc84e3f602)
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('CREATE INDEX IF NOT EXISTS ix_business_name_lower ON business (lower(name))')
+
+    with op.batch_alter_table('tenant_daily_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tenant_daily_stats_day'))
+
+    op.drop_table('tenant_daily_stats')
+    op.drop_table('platform_daily_metric')
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""Add billing access state
+
+Revision ID: 64fbcb1fd1da
+Revises: 61e2c5818c6a
+Create Date: 2026-10-19 11:56:32.120774
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '64fbcb1fd1da'
+down_revision = '61e2c5818c6a'
+branch_labels = None
+depends_on = None
+
+
+def _restore_name_index():
+    # SQLite: batch reconstruye la tabla y no puede reflejar el índice por
+    # expresión de f4dc84e3f602, así que se pierde con la tabla vieja
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('CREATE INDEX IF NOT EXISTS ix_business_name_lower ON business (lower(name))')
+
+
+def upgrade():
+    # sin batch: en SQLite ADD COLUMN no reconstruye la tabla
+    op.add_column('business', sa.Column('access_blocked', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_index(op.f('ix_business_trial_ends_at'), 'business', ['trial_ends_at'], unique=False)
+
+    with op.batch_alter_table('payment_proof', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_payment_proof_status'), ['status'], unique=False)
+
+    # estado inicial; luego lo mantiene `flask billing sweep`
+    op.get_bind().execute(
+        sa.text("UPDATE business SET access_blocked = :blocked WHERE is_pro = :no AND trial_ends_at <= :now"),
+        {"blocked": True, "no": False, "now": datetime.utcnow()}
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('payment_proof', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payment_proof_status'))
+
+    with op.batch_alter_table('business', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_business_trial_ends_at'))
+        batch_op.drop_column('access_blocked')
+
+    _restore_name_index()
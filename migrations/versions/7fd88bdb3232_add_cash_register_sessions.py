@@ -0,0 +1,66 @@
+"""Add cash register sessions
+
+Revision ID: 7fd88bdb3232
+Revises: 1deaf77abbfc
+Create Date: 2026-10-19 12:09:12.411841
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7fd88bdb3232'
+down_revision = '1deaf77abbfc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cash_session',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('opened_by_id', sa.Integer(), nullable=False),
+    sa.Column('closed_by_id', sa.Integer(), nullable=True),
+    sa.Column('opened_at', sa.DateTime(), nullable=False),
+    sa.Column('closed_at', sa.DateTime(), nullable=True),
+    sa.Column('opening_cash', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('sales_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('sales_total', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+    sa.Column('expected_cash', sa.Numeric(precision=12, scale=2), nullable=True),
+    sa.Column('counted_cash', sa.Numeric(precision=12, scale=2), nullable=True),
+    sa.Column('difference', sa.Numeric(precision=12, scale=2), nullable=True),
+    sa.Column('close_note', sa.String(length=255), nullable=True),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.ForeignKeyConstraint(['closed_by_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['opened_by_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('cash_session', schema=None) as batch_op:
+        batch_op.create_index('ix_cash_session_business_opened', ['business_id', 'opened_at'], unique=False)
+        batch_op.create_index('uq_cash_session_open', ['business_id'], unique=True, sqlite_where=sa.text('closed_at IS NULL'), postgresql_where=sa.text('closed_at IS NULL'))
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cash_session_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_sale_cash_session_id'), ['cash_session_id'], unique=False)
+        batch_op.create_foreign_key('fk_sale_cash_session_id', 'cash_session', ['cash_session_id'], ['id'])
+
+    with op.batch_alter_table('sale_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cash_session_id', sa.Integer(), nullable=True))
+
+
+
+def downgrade():
+    with op.batch_alter_table('sale_archive', schema=None) as batch_op:
+        batch_op.drop_column('cash_session_id')
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_sale_cash_session_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_sale_cash_session_id'))
+        batch_op.drop_column('cash_session_id')
+
+    with op.batch_alter_table('cash_session', schema=None) as batch_op:
+        batch_op.drop_index('uq_cash_session_open', sqlite_where=sa.text('closed_at IS NULL'), postgresql_where=sa.text('closed_at IS NULL'))
+        batch_op.drop_index('ix_cash_session_business_opened')
+
+    op.drop_table('cash_session')
@@ -0,0 +1,28 @@
+"""Add sale client_ref for offline ticket sync
+
+Revision ID: 8613386664b7
+Revises: 3e3d14e1d68c
+Create Date: 2026-10-19 13:40:02.871533
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8613386664b7'
+down_revision = '3e3d14e1d68c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_ref', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_sale_business_client_ref', ['business_id', 'client_ref'])
+
+
+def downgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_sale_business_client_ref', type_='unique')
+        batch_op.drop_column('client_ref')
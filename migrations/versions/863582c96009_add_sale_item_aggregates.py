@@ -0,0 +1,72 @@
+"""Add sale item aggregates (items_count, units_count, first_product_name)
+
+Revision ID: 863582c96009
+Revises: 55b229299ca3
+Create Date: 2026-10-19 12:02:12.590512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '863582c96009'
+down_revision = '55b229299ca3'
+branch_labels = None
+depends_on = None
+
+
+BATCH = 10000
+
+
+def _backfill(sale_table, item_table):
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text(f'SELECT max(id) FROM {sale_table}')).scalar() or 0
+
+    items = f'FROM {item_table} i WHERE i.sale_id = {sale_table}.id'
+    for lo in range(0, max_id, BATCH):
+        bounds = {'lo': lo, 'hi': lo + BATCH}
+        conn.execute(sa.text(
+            f'UPDATE {sale_table} SET '
+            f'items_count = (SELECT count(*) {items}), '
+            f'units_count = (SELECT coalesce(sum(i.quantity), 0) {items}), '
+            f'first_product_name = (SELECT i.product_name {items} ORDER BY i.id LIMIT 1) '
+            f'WHERE id > :lo AND id <= :hi AND EXISTS (SELECT 1 {items})'
+        ), bounds)
+        # ventas antiguas de un solo producto (sin SaleItem)
+        conn.execute(sa.text(
+            f'UPDATE {sale_table} SET items_count = 1, units_count = coalesce(quantity, 0), '
+            f'first_product_name = product_name '
+            f'WHERE id > :lo AND id <= :hi AND product_id IS NOT NULL AND NOT EXISTS (SELECT 1 {items})'
+        ), bounds)
+
+
+def upgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('items_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('units_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('first_product_name', sa.String(length=150), nullable=True))
+
+    with op.batch_alter_table('sale_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('items_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('units_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('first_product_name', sa.String(length=150), nullable=True))
+
+    # por lotes de ids, cada uno en su propia transacción: la migración corre
+    # en una sola transacción y, sin esto, los locks de todos los lotes
+    # durarían hasta el final (las columnas nuevas se confirman antes)
+    with op.get_context().autocommit_block():
+        _backfill('sale', 'sale_item')
+        _backfill('sale_archive', 'sale_item_archive')
+
+
+def downgrade():
+    with op.batch_alter_table('sale_archive', schema=None) as batch_op:
+        batch_op.drop_column('first_product_name')
+        batch_op.drop_column('units_count')
+        batch_op.drop_column('items_count')
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_column('first_product_name')
+        batch_op.drop_column('units_count')
+        batch_op.drop_column('items_count')
@@ -0,0 +1,32 @@
+"""Add payment proof hash, size and preview
+
+Revision ID: 8a568c0bfd31
+Revises: 53451fac84b7
+Create Date: 2026-10-19 16:48:21.530177
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a568c0bfd31'
+down_revision = '53451fac84b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payment_proof', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('size_bytes', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('preview_filename', sa.String(length=255), nullable=True))
+        batch_op.create_index(batch_op.f('ix_payment_proof_sha256'), ['sha256'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_proof', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payment_proof_sha256'))
+        batch_op.drop_column('preview_filename')
+        batch_op.drop_column('size_bytes')
+        batch_op.drop_column('sha256')
@@ -0,0 +1,54 @@
+"""Add kardex verification checkpoint and issues
+
+Revision ID: 8fbd22f05075
+Revises: 9769313e1e46
+Create Date: 2026-10-19 10:03:17.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8fbd22f05075'
+down_revision = '9769313e1e46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('kardex_checkpoint',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('last_movement_id', sa.Integer(), nullable=False),
+    sa.Column('checked_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('business_id')
+    )
+    op.create_table('kardex_issue',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('movement_id', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('expected', sa.Integer(), nullable=True),
+    sa.Column('found', sa.Integer(), nullable=True),
+    sa.Column('detected_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.ForeignKeyConstraint(['movement_id'], ['inventory_movement.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('kardex_issue', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_kardex_issue_business_id'), ['business_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_kardex_issue_detected_at'), ['detected_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('kardex_issue', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_kardex_issue_detected_at'))
+        batch_op.drop_index(batch_op.f('ix_kardex_issue_business_id'))
+
+    op.drop_table('kardex_issue')
+    op.drop_table('kardex_checkpoint')
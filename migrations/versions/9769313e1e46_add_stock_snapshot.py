@@ -0,0 +1,50 @@
+"""Add stock snapshot checkpoints
+
+Revision ID: 9769313e1e46
+Revises: 64d10f733eef
+Create Date: 2026-10-19 09:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9769313e1e46'
+down_revision = '64d10f733eef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('movement_id', sa.Integer(), nullable=True),
+    sa.Column('taken_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['business_id'], ['business.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.ForeignKeyConstraint(['movement_id'], ['inventory_movement.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stock_snapshot', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stock_snapshot_business_id'), ['business_id'], unique=False)
+        batch_op.create_index('ix_stock_snapshot_product_taken', ['product_id', 'taken_at'], unique=False)
+
+    # cola de movimientos por producto (desde el snapshot hasta la fecha pedida)
+    with op.batch_alter_table('inventory_movement', schema=None) as batch_op:
+        batch_op.create_index('ix_inventory_movement_product_created', ['product_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inventory_movement', schema=None) as batch_op:
+        batch_op.drop_index('ix_inventory_movement_product_created')
+
+    with op.batch_alter_table('stock_snapshot', schema=None) as batch_op:
+        batch_op.drop_index('ix_stock_snapshot_product_taken')
+        batch_op.drop_index(batch_op.f('ix_stock_snapshot_business_id'))
+
+    op.drop_table('stock_snapshot')
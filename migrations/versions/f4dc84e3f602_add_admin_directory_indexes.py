@@ -0,0 +1,46 @@
+"""Add admin directory indexes
+
+Revision ID: f4dc84e3f602
+Revises: 8a568c0bfd31
+Create Date: 2026-10-19 18:02:44.913260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4dc84e3f602'
+down_revision = '8a568c0bfd31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('business', schema=None) as batch_op:
+        batch_op.create_index('ix_business_name_lower', [sa.text('lower(name)')], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_business_id'), ['business_id'], unique=False)
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.create_index('ix_sale_business_created', ['business_id', 'created_at'], unique=False)
+
+    # Postgres: búsqueda por substring del admin (ILIKE '%q%') con trigramas
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX ix_business_name_trgm ON business USING gin (lower(name) gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_business_name_trgm')
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_index('ix_sale_business_created')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_business_id'))
+
+    with op.batch_alter_table('business', schema=None) as batch_op:
+        batch_op.drop_index('ix_business_name_lower')
@@ -1,6 +1,8 @@
 from app import create_app
+from app.billing.lifecycle import start_scheduler
 
 app = create_app()
+start_scheduler(app)  # solo con BILLING_SCHEDULER=1 y en un worker por máquina (si no, `flask billing sweep` por cron)
 
 if __name__ == "__main__":
     app.run(debug=True)